@@ -4,37 +4,87 @@ Clean backend app for AI Translator
 Features: Text translate, Voice translate, Keywords, Conversation, Practice
 Image translation removed.
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, send_file
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 import base64
 import traceback
-
-from translation_service import TranslationService
-from voice_service import VoiceService
-from practice_service import PracticeService
-from conversation_service import ConversationService
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from upstream import UpstreamError, health as upstream_health
+from language_registry import catalog_response
+from service_container import get_default_services
+from metrics import PROMETHEUS_CONTENT_TYPE, begin_request, end_request, render as render_metrics, span
+from text_analysis import index_document, iter_document
+from audio_cache import AudioCache
+from audio_decode import AudioTooLong
+from audio_transfer import (AUDIO_MAX_UPLOAD_BYTES, MAX_UPLOAD_BYTES, inline_audio as fits_inline, is_raw_audio,
+                            response_format)
+from route_helpers import (AUDIO_MAX_AGE, SSE_HEADERS, TTS_FETCH_WAIT, async_requested, audio_answer, audio_upload,
+                           document_source, flashcard_options, inline_audio_requested, job_status,
+                           raw_audio_upload, submit_job, too_large_message)
+from voice_stream import format_sse, stream_voice_translation
 
 app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 CORS(app)
 
-# Initialize services
-translation_service = TranslationService()
-voice_service = VoiceService()
-practice_service = PracticeService()
-conversation_service = ConversationService()
+# Services are created on first use; APP_FEATURES limits which groups this worker serves
+services = get_default_services()
+
+MAX_BATCH_ITEMS = 1000
+
+
+@app.before_request
+def _start_request_timer():
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_trace = begin_request(rule, request.method)
+
+
+@app.before_request
+def _start_jobs():
+    # Once the app serves (under any WSGI server), queued jobs from earlier runs resume
+    services.start_jobs()
+
+
+@app.after_request
+def _record_request(response):
+    # Streamed responses are timed up to their first byte
+    end_request(g.pop('metrics_trace', None), response.status_code)
+    return response
+
+
+@app.teardown_request
+def _record_failed_request(exc):
+    # Only reached with the trace still set when a view raised past after_request
+    end_request(g.pop('metrics_trace', None), 500)
+
+
+@app.errorhandler(RequestEntityTooLarge)
+@app.errorhandler(AudioTooLong)
+def _upload_too_large(e):
+    return jsonify({'success': False, 'error': too_large_message(e, request.max_content_length)}), 413
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint: request and span latency histograms, provider counters."""
+    return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
 
 
 @app.route('/api/languages', methods=['GET'])
 def get_languages():
     try:
-        langs = translation_service.get_supported_languages()
-        return jsonify({'success': True, 'languages': langs})
+        # The catalog never changes at runtime: serve the pre-serialized body
+        status, headers, body = catalog_response(request.headers)
+        return Response(body, status=status, headers=headers)
     except Exception as e:
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @app.route('/api/translate', methods=['POST'])
+@services.requires('translate')
 def translate_text():
     try:
         data = request.get_json() or {}
@@ -45,117 +95,309 @@ def translate_text():
         if not source_text:
             return jsonify({'success': False, 'error': 'source_text is required'}), 400
 
-        res = translation_service.translate(text=source_text, src_lang=source_lang, dest_lang=target_lang)
+        res = services.translation.translate(text=source_text, src_lang=source_lang, dest_lang=target_lang)
         return jsonify({'success': True, 'translated_text': res.get('translated_text'),
                         'source_language': res.get('source_language'), 'target_language': res.get('target_language')})
+    except UpstreamError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
     except Exception as e:
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/translate/stream', methods=['POST'])
+@services.requires('translate')
+def translate_stream():
+    """Server-sent events: each translated paragraph of a long text, in order, as soon as it's ready."""
+    data = request.get_json(silent=True) or {}
+    source_text = data.get('source_text') or data.get('text') or ''
+    if not source_text:
+        return jsonify({'success': False, 'error': 'source_text is required'}), 400
+    paragraphs = services.translation.iter_translate_document(source_text, data.get('source_lang', 'auto'),
+                                                              data.get('target_lang', 'en'))
+
+    def events():
+        count = 0
+        try:
+            for paragraph in paragraphs:
+                count += 1
+                yield format_sse('paragraph', paragraph)
+            yield format_sse('done', {'success': True, 'paragraphs': count})
+        except Exception as e:
+            traceback.print_exc()
+            yield format_sse('error', {'success': False, 'error': str(e)})
+
+    return Response(events(), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+
+@app.route('/api/translate/batch', methods=['POST'])
+@services.requires('translate')
+def translate_batch():
+    try:
+        data = request.get_json() or {}
+        items = data.get('items') or data.get('texts') or []
+        source_lang = data.get('source_lang', 'auto')
+        target_lang = data.get('target_lang', 'en')
+
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'error': 'texts (or items) must be a non-empty list'}), 400
+        if len(items) > MAX_BATCH_ITEMS:
+            return jsonify({'success': False, 'error': f'at most {MAX_BATCH_ITEMS} texts per batch'}), 400
+
+        results = services.translation.translate_many(items, src_lang=source_lang, dest_lang=target_lang)
+        return jsonify({'success': True, 'results': results})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/translate/cache', methods=['GET'])
+@services.requires('translate')
+def translation_cache_stats():
+    try:
+        return jsonify({'success': True, 'cache': services.translation.cache_stats(),
+                        'inflight': services.translation.inflight_stats(),
+                        'detector': services.translation.detector_stats()})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Provider circuit states and call stats; 'degraded' while any circuit is open."""
+    return jsonify(upstream_health())
+
+
+def _audio_request():
+    """
+    The recording and options for the voice and practice routes
+
+    The recording is the multipart 'audio' field, or the raw request body
+    when it's sent as audio/* or application/octet-stream, with the options
+    in the query string. It is returned unread, for the decoder to stream;
+    reading more than AUDIO_MAX_UPLOAD_BYTES raises RequestEntityTooLarge.
+
+    Returns:
+        tuple: (FileStorage, or None if there is no recording; options mapping)
+    """
+    request.max_content_length = AUDIO_MAX_UPLOAD_BYTES
+    if is_raw_audio(request.mimetype):
+        if request.content_length == 0:
+            return None, request.args
+        return raw_audio_upload(request.stream, request.mimetype, request.args)
+    return audio_upload(request.files, request.form)
+
+
+def _async_requested(options):
+    return async_requested(options, request.headers)
+
+
+def _submit_job(kind, params, source, options):
+    """Queue a background job and answer 202 with it; see route_helpers.submit_job"""
+    return submit_job(services, kind, params, source, options, request.headers, request.remote_addr)
+
+
 @app.route('/api/voice/translate', methods=['POST'])
+@services.requires('voice')
 def voice_translate():
+    """
+    Transcribe, translate and speak a recording
+
+    Answers JSON with base64 audio by default; `response_format=audio` or
+    `multipart` (or the matching Accept header) streams the MP3 instead.
+    With `async=true` it answers 202 with a background job to poll.
+    """
     try:
-        if 'audio' not in request.files:
+        audio_file, options = _audio_request()
+        if audio_file is None:
             return jsonify({'success': False, 'error': 'audio file is required'}), 400
 
-        audio_file = request.files['audio']
-        source_lang = request.form.get('source_lang', 'auto')
-        target_lang = request.form.get('target_lang', 'en')
+        source_lang = options.get('source_lang', 'auto')
+        target_lang = options.get('target_lang', 'en')
+        if _async_requested(options):
+            return _submit_job('voice_translate', {'source_lang': source_lang, 'target_lang': target_lang},
+                               audio_file, options)
+        inline_audio = inline_audio_requested(options)
+        try:
+            answer = response_format(options.get('response_format'), request.accept_mimetypes)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
 
         # Convert speech to text
-        speech_res = voice_service.speech_to_text(audio_file, language=source_lang)
+        speech_res = services.voice.speech_to_text(audio_file, language=source_lang)
         user_text = speech_res.get('text') if isinstance(speech_res, dict) else ''
 
         # Translate
-        trans = translation_service.translate(text=user_text or '', src_lang=source_lang, dest_lang=target_lang)
+        trans = services.translation.translate(text=user_text or '', src_lang=source_lang, dest_lang=target_lang)
         translated_text = trans.get('translated_text', '')
 
         # Create TTS audio for translated text
+        audio_bytes = None
+        audio_url = None
         try:
-            audio_bytes = voice_service.text_to_speech(translated_text, language=target_lang)
-            audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
+            audio_bytes = services.voice.text_to_speech(translated_text, language=target_lang)
+            audio_url = '/api/tts/' + services.voice.audio_key(translated_text, target_lang)
         except Exception as tts_err:
-            audio_b64 = None
-
-        return jsonify({'success': True, 'source_text': user_text, 'translated_text': translated_text, 'audio_base64': audio_b64})
+            audio_bytes = None
+
+        metadata = {'success': True, 'source_text': user_text, 'translated_text': translated_text,
+                    'audio_url': audio_url,
+                    'speech_stats': speech_res.get('vad') if isinstance(speech_res, dict) else None}
+        if answer != 'json':
+            status, headers, body = audio_answer(services, answer, metadata, audio_bytes)
+            return Response(body, status=status, headers=headers)
+
+        # Long clips are left to audio_url rather than inflating the JSON by a third
+        audio_b64 = None
+        if inline_audio and fits_inline(audio_bytes):
+            with span('base64_encode'):
+                audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
+        return jsonify({**metadata, 'audio_base64': audio_b64})
+    except (RequestEntityTooLarge, AudioTooLong) as e:
+        return _upload_too_large(e)
     except Exception as e:
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/voice/translate/stream', methods=['POST'])
+@services.requires('voice')
+def voice_translate_stream():
+    """Server-sent events: transcript, then per-sentence translation and audio as each is ready."""
+    audio, options = _audio_request()
+    if audio is None:
+        return jsonify({'success': False, 'error': 'audio file is required'}), 400
+
+    # Read the upload now (within the cap); the request is gone by the time the stream runs
+    audio = audio.read()
+    source_lang = options.get('source_lang', 'auto')
+    target_lang = options.get('target_lang', 'en')
+    inline_audio = inline_audio_requested(options)
+
+    def events():
+        try:
+            for event, payload in stream_voice_translation(services.voice, services.translation, audio,
+                                                           source_lang=source_lang, target_lang=target_lang,
+                                                           inline_audio=inline_audio):
+                yield format_sse(event, payload)
+        except AudioTooLong as e:
+            yield format_sse('error', {'success': False, 'error': str(e)})
+        except Exception as e:
+            traceback.print_exc()
+            yield format_sse('error', {'success': False, 'error': str(e)})
+
+    return Response(events(), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+
+def _document_source():
+    """The document and options for the keyword and flashcard routes; see route_helpers.document_source"""
+    return document_source(request.files.get('file'), request.form, request.mimetype, request.stream,
+                           request.args, request.get_json(silent=True))
+
+
+def _document_request():
+    """
+    Text and options for the keyword and flashcard routes
+
+    Uploads and raw bodies are streamed into the index rather than read whole.
+
+    Returns:
+        tuple: (text or text chunks, options mapping)
+    """
+    source, filename, content_type, options = _document_source()
+    if isinstance(source, str):
+        return source, options
+    return iter_document(source, filename, content_type), options
+
+
 @app.route('/api/keywords', methods=['POST'])
+@services.requires('vocabulary')
 def extract_keywords():
     try:
-        data = request.get_json() or {}
-        text = data.get('text') or data.get('source_text') or ''
-        if not text:
+        source, options = _document_request()
+        document = index_document(source, language=options.get('language', 'en'))
+        if not document.sentences:
             return jsonify({'success': False, 'error': 'No text provided'}), 400
 
-        # Simple keyword extraction (kept lightweight)
-        import re
-        from collections import Counter
-
-        stopwords = set(['the','and','a','an','is','in','on','at','of','to','for','with','that','this','it','was','were','are','be','by','from','as','or'])
-        words = re.findall(r"\w+", text.lower())
-        candidates = [w for w in words if len(w) > 2 and w not in stopwords]
-        counts = Counter(candidates)
-        most = [w for w,_ in counts.most_common(10)]
-        return jsonify({'success': True, 'keywords': most[:5]})
+        keywords = services.flashcards.extract_keywords(document)
+        return jsonify({'success': True, 'keywords': keywords})
+    except RequestEntityTooLarge as e:
+        return _upload_too_large(e)
     except Exception as e:
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @app.route('/api/flashcards', methods=['POST'])
+@services.requires('vocabulary')
 def generate_flashcards():
+    """With `async=true`, answers 202 with a background job to poll; its cards carry audio_url only."""
     try:
-        data = request.get_json() or {}
-        text = data.get('text') or data.get('source_text') or ''
-        language = data.get('language', 'en')
-        if not text:
+        source, filename, content_type, options = _document_source()
+        language = options.get('language', 'en')
+        if _async_requested(options):
+            if not source:
+                return jsonify({'success': False, 'error': 'No text provided'}), 400
+            return _submit_job('flashcards', {'language': language, 'filename': filename,
+                                              'content_type': content_type}, source, options)
+        if not isinstance(source, str):
+            source = iter_document(source, filename, content_type)
+        document = index_document(source, language=language)
+        if not document.sentences:
             return jsonify({'success': False, 'error': 'No text provided'}), 400
 
-        import re
-        from collections import Counter
-
-        stopwords = set(['the','and','a','an','is','in','on','at','of','to','for','with','that','this','it','was','were','are','be','by','from','as','or'])
-        # split into sentences
-        sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-        words = re.findall(r"\w+", text.lower())
-        candidates = [w for w in words if len(w) > 3 and w not in stopwords]
-        counts = Counter(candidates)
-        top = [w for w,_ in counts.most_common(8)]
-
-        flashcards = []
-        for w in top:
-            # find a sentence containing the word
-            found = None
-            for s in sentences:
-                if w in s.lower():
-                    found = s.strip()
-                    break
-            if not found:
-                found = sentences[0] if sentences else ''
-            front = re.sub(re.escape(w), '____', found, flags=re.IGNORECASE)
-            back = w
-            audio_b64 = None
-            # attempt to generate audio for front using voice_service
-            try:
-                audio_bytes = voice_service.text_to_speech(front, language=language)
-                if audio_bytes:
-                    audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
-            except Exception:
-                audio_b64 = None
-            flashcards.append({'front': front, 'back': back, 'audio_base64': audio_b64})
-
+        defer_audio, deadline = flashcard_options(options)
+        flashcards = services.flashcards.generate_flashcards(document, language=language, deadline=deadline,
+                                                             defer_audio=defer_audio)
         return jsonify({'success': True, 'flashcards': flashcards})
+    except RequestEntityTooLarge as e:
+        return _upload_too_large(e)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@services.requires('voice', 'vocabulary', 'practice')
+def get_job(job_id):
+    """
+    A background job's status, and its result once it has succeeded
+
+    Unfinished jobs answer with Retry-After: 1 for pollers.
+    """
+    try:
+        return job_status(services, job_id)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/tts/<audio_key>', methods=['GET'])
+@services.requires('voice', 'vocabulary')
+def get_tts_audio(audio_key):
+    try:
+        if not AudioCache.is_valid_key(audio_key):
+            return jsonify({'success': False, 'error': 'audio not found'}), 404
+        path = services.voice.get_audio_path(audio_key, timeout=TTS_FETCH_WAIT)
+        if path:
+            # Content-addressed, so the bytes behind a key never change
+            return send_file(path, mimetype='audio/mpeg', conditional=True, max_age=AUDIO_MAX_AGE)
+        audio = services.voice.get_audio(audio_key)
+        if audio is None:
+            return jsonify({'success': False, 'error': 'audio not found'}), 404
+        return Response(audio, mimetype='audio/mpeg')
+    except FutureTimeoutError:
+        resp = jsonify({'success': False, 'error': 'audio is still being generated'})
+        resp.headers['Retry-After'] = '1'
+        return resp, 202
     except Exception as e:
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @app.route('/api/conversation/start', methods=['POST'])
+@services.requires('conversation')
 def start_conversation():
     try:
         data = request.get_json() or {}
@@ -163,7 +405,7 @@ def start_conversation():
         language_pair = data.get('language_pair')
         if not session_id or not language_pair:
             return jsonify({'error': 'session_id and language_pair are required'}), 400
-        conversation_service.start_conversation(session_id, language_pair)
+        services.conversation.start_conversation(session_id, language_pair)
         return jsonify({'success': True})
     except Exception as e:
         traceback.print_exc()
@@ -171,6 +413,7 @@ def start_conversation():
 
 
 @app.route('/api/conversation/add', methods=['POST'])
+@services.requires('conversation')
 def add_conversation_message():
     try:
         data = request.get_json() or {}
@@ -179,7 +422,7 @@ def add_conversation_message():
         direction = data.get('direction')
         if not session_id or not message or not direction:
             return jsonify({'error': 'session_id, message, and direction are required'}), 400
-        result = conversation_service.add_message(session_id, message, direction)
+        result = services.conversation.add_message(session_id, message, direction)
         return jsonify({'success': True, **result})
     except Exception as e:
         traceback.print_exc()
@@ -187,27 +430,61 @@ def add_conversation_message():
 
 
 @app.route('/api/conversation/history/<session_id>', methods=['GET'])
+@services.requires('conversation')
 def get_conversation_history(session_id):
+    """
+    Query parameters:
+        after (or since): next_cursor from an earlier response; only newer messages are returned
+        limit: page size (defaults to DEFAULT_PAGE_SIZE when `after` is given)
+    Without either, the whole history is returned. Send the ETag back as
+    If-None-Match to get 304 when the session has no new messages.
+    """
     try:
-        history = conversation_service.get_history(session_id)
-        return jsonify({'success': True, 'history': history})
+        after = request.args.get('after') or request.args.get('since')
+        limit = request.args.get('limit', type=int)
+        if limit is None and after:
+            limit = services.conversation.DEFAULT_PAGE_SIZE
+        if limit is not None:
+            limit = min(max(limit, 1), services.conversation.MAX_PAGE_SIZE)
+
+        etag = services.conversation.history_etag(session_id, after=after, limit=limit)
+        if request.if_none_match.contains(etag):
+            not_modified = Response('', status=304)
+            not_modified.set_etag(etag)
+            return not_modified
+
+        page = services.conversation.get_history_page(session_id, after=after, limit=limit)
+        resp = jsonify({'success': True, 'history': page['messages'], 'next_cursor': page['next_cursor'],
+                        'has_more': page['has_more']})
+        resp.set_etag(etag)
+        return resp
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/practice/analyze', methods=['POST'])
+@services.requires('practice')
 def practice_analyze():
     try:
-        if 'audio' not in request.files:
+        audio_file, options = _audio_request()
+        if audio_file is None:
             return jsonify({'error': 'Audio file is required'}), 400
-        audio_file = request.files['audio']
-        target_text = request.form.get('target_text') or request.form.get('target') or ''
-        language = request.form.get('language', 'en')
+        target_text = options.get('target_text') or options.get('target') or ''
+        language = options.get('language', 'en')
         if not target_text:
             return jsonify({'error': 'target_text is required'}), 400
-        result = practice_service.analyze_pronunciation(audio_file, target_text, language)
+        if _async_requested(options):
+            return _submit_job('practice_analyze', {'target_text': target_text, 'language': language,
+                                                    'filename': audio_file.filename,
+                                                    'content_type': audio_file.content_type},
+                               audio_file, options)
+        result = services.practice.analyze_pronunciation(audio_file, target_text, language)
         return jsonify({'success': True, **result})
+    except (RequestEntityTooLarge, AudioTooLong) as e:
+        return _upload_too_large(e)
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
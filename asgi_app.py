@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Async (ASGI) serving mode for AI Translator
+Serves the I/O-bound routes of app.py on an asyncio event loop with Quart.
+Blocking service calls run on a bounded thread pool, and each upstream
+(translation, speech recognition, TTS, database) has its own concurrency
+limit, so idle connections no longer pin a worker thread each.
+
+Run: hypercorn asgi_app:app --bind 0.0.0.0:5000
+ or: python asgi_app.py
+"""
+import asyncio
+import base64
+import contextvars
+import functools
+import io
+import os
+import tempfile
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from quart import Quart, Response, g, request, jsonify, send_file
+from werkzeug.exceptions import RequestEntityTooLarge, RequestTimeout
+
+from upstream import UpstreamError, health as upstream_health
+from language_registry import catalog_response
+from service_container import get_default_services
+from metrics import PROMETHEUS_CONTENT_TYPE, begin_request, end_request, render as render_metrics, span
+from text_analysis import index_document, iter_document
+from audio_cache import AudioCache
+from audio_decode import AudioTooLong
+from audio_transfer import (AUDIO_MAX_UPLOAD_BYTES, MAX_UPLOAD_BYTES, SPOOL_BYTES, inline_audio as fits_inline,
+                            is_raw_audio, response_format)
+from route_helpers import (AUDIO_MAX_AGE, DOCUMENT_TYPES, SSE_HEADERS, TTS_FETCH_WAIT, async_requested, audio_answer,
+                           audio_upload, document_source, flashcard_options, inline_audio_requested, job_status,
+                           raw_audio_upload, submit_job, too_large_message)
+from voice_stream import format_sse, stream_voice_translation
+
+# Threads available for blocking service calls across all upstreams
+EXECUTOR_WORKERS = int(os.environ.get('ASGI_EXECUTOR_WORKERS', '64'))
+
+# Concurrent calls allowed per upstream
+UPSTREAM_LIMITS = {
+    'translate': int(os.environ.get('ASGI_LIMIT_TRANSLATE', '32')),
+    'stt': int(os.environ.get('ASGI_LIMIT_STT', '8')),
+    'tts': int(os.environ.get('ASGI_LIMIT_TTS', '16')),
+    'db': int(os.environ.get('ASGI_LIMIT_DB', '8')),
+    # CPU-bound document indexing for /api/flashcards
+    'text': int(os.environ.get('ASGI_LIMIT_TEXT', '4')),
+}
+
+app = Quart(__name__)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
+# Services are created on first use; APP_FEATURES limits which groups this worker serves
+services = get_default_services()
+
+executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix='asgi-blocking')
+_limits = {}
+
+
+async def offload(upstream, fn, *args, **kwargs):
+    """Run a blocking call on the executor, within the upstream's concurrency limit."""
+    semaphore = _limits.get(upstream)
+    if semaphore is None:
+        # Created lazily so they bind to the serving event loop
+        semaphore = _limits[upstream] = asyncio.Semaphore(UPSTREAM_LIMITS[upstream])
+    with span('offload_wait', upstream=upstream):
+        await semaphore.acquire()
+    try:
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the request's context so spans in fn land in its trace
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(executor, functools.partial(context.run, fn, *args, **kwargs))
+    finally:
+        semaphore.release()
+
+
+@app.before_serving
+async def load_services():
+    # Building a service imports its provider libraries; do it before serving, not on the loop mid-request
+    await asyncio.get_running_loop().run_in_executor(executor, services.preload)
+    await asyncio.get_running_loop().run_in_executor(executor, services.start_jobs)
+
+
+@app.before_request
+async def start_request_timer():
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    # The loop thread serves every request at once: spans only, no stack samples
+    g.metrics_trace = begin_request(rule, request.method, sample_stacks=False)
+
+
+@app.after_request
+async def record_request(response):
+    # Streamed responses are timed up to their first byte
+    end_request(g.pop('metrics_trace', None), response.status_code)
+    return response
+
+
+@app.teardown_request
+async def record_failed_request(exc):
+    # Only reached with the trace still set when a view raised past after_request
+    end_request(g.pop('metrics_trace', None), 500)
+
+
+@app.errorhandler(RequestEntityTooLarge)
+@app.errorhandler(AudioTooLong)
+async def upload_too_large(e):
+    return jsonify({'success': False, 'error': too_large_message(e, request.max_content_length)}), 413
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """Prometheus scrape endpoint: request and span latency histograms, provider counters."""
+    return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.after_request
+async def add_cors_headers(response):
+    # Mirrors flask_cors' defaults in app.py: all origins allowed
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+    response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+    return response
+
+
+@app.route('/api/languages', methods=['GET'])
+async def get_languages():
+    try:
+        # The catalog never changes at runtime: serve the pre-serialized body
+        status, headers, body = catalog_response(request.headers)
+        return Response(body, status=status, headers=headers)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/translate', methods=['POST'])
+@services.requires('translate')
+async def translate_text():
+    try:
+        data = await request.get_json(silent=True) or {}
+        source_text = data.get('source_text') or data.get('text') or ''
+        source_lang = data.get('source_lang', 'auto')
+        target_lang = data.get('target_lang', 'en')
+
+        if not source_text:
+            return jsonify({'success': False, 'error': 'source_text is required'}), 400
+
+        res = await offload('translate', services.translation.translate,
+                            text=source_text, src_lang=source_lang, dest_lang=target_lang)
+        return jsonify({'success': True, 'translated_text': res.get('translated_text'),
+                        'source_language': res.get('source_language'), 'target_language': res.get('target_language')})
+    except UpstreamError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/translate/stream', methods=['POST'])
+@services.requires('translate')
+async def translate_stream():
+    """Server-sent events: each translated paragraph of a long text, in order, as soon as it's ready."""
+    data = await request.get_json(silent=True) or {}
+    source_text = data.get('source_text') or data.get('text') or ''
+    if not source_text:
+        return jsonify({'success': False, 'error': 'source_text is required'}), 400
+    paragraphs = services.translation.iter_translate_document(source_text, data.get('source_lang', 'auto'),
+                                                              data.get('target_lang', 'en'))
+
+    async def events():
+        count = 0
+        try:
+            while True:
+                paragraph = await offload('translate', next, paragraphs, None)
+                if paragraph is None:
+                    break
+                count += 1
+                yield format_sse('paragraph', paragraph).encode('utf-8')
+            yield format_sse('done', {'success': True, 'paragraphs': count}).encode('utf-8')
+        except Exception as e:
+            traceback.print_exc()
+            yield format_sse('error', {'success': False, 'error': str(e)}).encode('utf-8')
+
+    response = Response(events(), mimetype='text/event-stream', headers=SSE_HEADERS)
+    response.timeout = None
+    return response
+
+
+@app.route('/api/health', methods=['GET'])
+async def health():
+    """Provider circuit states and call stats; 'degraded' while any circuit is open."""
+    return jsonify(upstream_health())
+
+
+async def _capped_body(limit):
+    """The request body as it arrives, raising RequestEntityTooLarge past `limit` bytes."""
+    size = 0
+    async for piece in request.body:
+        size += len(piece)
+        if size > limit:
+            raise RequestEntityTooLarge()
+        yield piece
+
+
+async def _audio_request():
+    """
+    The recording and options for the voice routes; see _audio_request in app.py
+
+    Quart buffers request bodies, so a raw audio body is spooled into a
+    temporary file (on disk past SPOOL_BYTES) as it arrives rather than
+    collected in memory. Both raw and multipart bodies are capped by the
+    bytes actually received, since a chunked upload declares no length.
+    """
+    request.max_content_length = AUDIO_MAX_UPLOAD_BYTES
+    if request.content_length is not None and request.content_length > AUDIO_MAX_UPLOAD_BYTES:
+        raise RequestEntityTooLarge()
+    if is_raw_audio(request.mimetype):
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        size = 0
+        try:
+            async for piece in _capped_body(AUDIO_MAX_UPLOAD_BYTES):
+                size += len(piece)
+                spool.write(piece)
+        except RequestEntityTooLarge:
+            spool.close()
+            raise
+        if not size:
+            spool.close()
+            return None, request.args
+        spool.seek(0)
+        return raw_audio_upload(spool, request.mimetype, request.args)
+    # Parsed here rather than through request.files, whose only limit is the app-wide MAX_CONTENT_LENGTH
+    parser = request.make_form_data_parser()
+    try:
+        form, files = await asyncio.wait_for(
+            parser.parse(_capped_body(AUDIO_MAX_UPLOAD_BYTES), request.mimetype, request.content_length,
+                         request.mimetype_params),
+            timeout=request.body_timeout)
+    except asyncio.TimeoutError:
+        raise RequestTimeout()
+    return audio_upload(files, form)
+
+
+async def _audio_answer(answer, metadata, audio):
+    """'audio' or 'multipart' answer for /api/voice/translate; see route_helpers.audio_answer"""
+    # Blocking: a cache lookup and a file open
+    status, headers, body = await offload('tts', audio_answer, services, answer, metadata, audio)
+    # Quart pulls each piece of a plain iterator on a worker thread, as the client reads
+    return Response(body, status=status, headers=headers)
+
+
+def _async_requested(options):
+    return async_requested(options, request.headers)
+
+
+async def _submit_job(kind, params, source, options):
+    """Queue a background job and answer 202 with it; see route_helpers.submit_job"""
+    # Stores the input and the job row: disk and database work
+    return await offload('db', submit_job, services, kind, params, source, options, request.headers,
+                         request.remote_addr)
+
+
+@app.route('/api/voice/translate', methods=['POST'])
+@services.requires('voice')
+async def voice_translate():
+    try:
+        audio_file, options = await _audio_request()
+        if audio_file is None:
+            return jsonify({'success': False, 'error': 'audio file is required'}), 400
+
+        source_lang = options.get('source_lang', 'auto')
+        target_lang = options.get('target_lang', 'en')
+        if _async_requested(options):
+            return await _submit_job('voice_translate', {'source_lang': source_lang, 'target_lang': target_lang},
+                                     audio_file, options)
+        inline_audio = inline_audio_requested(options)
+        try:
+            answer = response_format(options.get('response_format'), request.accept_mimetypes)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        # Convert speech to text
+        speech_res = await offload('stt', services.voice.speech_to_text, audio_file, language=source_lang)
+        user_text = speech_res.get('text') if isinstance(speech_res, dict) else ''
+
+        # Translate
+        trans = await offload('translate', services.translation.translate,
+                              text=user_text or '', src_lang=source_lang, dest_lang=target_lang)
+        translated_text = trans.get('translated_text', '')
+
+        # Create TTS audio for translated text
+        audio_bytes = None
+        audio_url = None
+        try:
+            audio_bytes = await offload('tts', services.voice.text_to_speech, translated_text, language=target_lang)
+            audio_url = '/api/tts/' + services.voice.audio_key(translated_text, target_lang)
+        except Exception:
+            audio_bytes = None
+
+        metadata = {'success': True, 'source_text': user_text, 'translated_text': translated_text,
+                    'audio_url': audio_url,
+                    'speech_stats': speech_res.get('vad') if isinstance(speech_res, dict) else None}
+        if answer != 'json':
+            return await _audio_answer(answer, metadata, audio_bytes)
+
+        audio_b64 = None
+        if inline_audio and fits_inline(audio_bytes):
+            with span('base64_encode'):
+                audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
+        return jsonify({**metadata, 'audio_base64': audio_b64})
+    except (RequestEntityTooLarge, AudioTooLong) as e:
+        return await upload_too_large(e)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/voice/translate/stream', methods=['POST'])
+@services.requires('voice')
+async def voice_translate_stream():
+    """Server-sent events: transcript, then per-sentence translation and audio as each is ready."""
+    audio, options = await _audio_request()
+    if audio is None:
+        return jsonify({'success': False, 'error': 'audio file is required'}), 400
+
+    # The upload may be spooled to disk: read it off the event loop
+    audio = await asyncio.get_running_loop().run_in_executor(executor, audio.read)
+    source_lang = options.get('source_lang', 'auto')
+    target_lang = options.get('target_lang', 'en')
+    inline_audio = inline_audio_requested(options)
+    pipeline = stream_voice_translation(services.voice, services.translation, audio, source_lang=source_lang,
+                                        target_lang=target_lang, inline_audio=inline_audio)
+
+    async def events():
+        # The first step is speech recognition; later steps are dominated by
+        # translation calls and waits on the TTS pool
+        upstream = 'stt'
+        try:
+            while True:
+                item = await offload(upstream, next, pipeline, None)
+                if item is None:
+                    break
+                upstream = 'translate'
+                yield format_sse(*item).encode('utf-8')
+        except Exception as e:
+            traceback.print_exc()
+            yield format_sse('error', {'success': False, 'error': str(e)}).encode('utf-8')
+
+    response = Response(events(), mimetype='text/event-stream', headers=SSE_HEADERS)
+    response.timeout = None
+    return response
+
+
+async def _document_source():
+    """Document and options for the flashcard route; see route_helpers.document_source"""
+    files = await request.files
+    raw_body = io.BytesIO(await request.get_data()) if request.mimetype in DOCUMENT_TYPES else None
+    return document_source(files.get('file'), await request.form, request.mimetype, raw_body, request.args,
+                           await request.get_json(silent=True))
+
+
+@app.route('/api/flashcards', methods=['POST'])
+@services.requires('vocabulary')
+async def generate_flashcards():
+    try:
+        source, filename, content_type, options = await _document_source()
+        language = options.get('language', 'en')
+        if _async_requested(options):
+            if not source:
+                return jsonify({'success': False, 'error': 'No text provided'}), 400
+            return await _submit_job('flashcards', {'language': language, 'filename': filename,
+                                                    'content_type': content_type}, source, options)
+        if not isinstance(source, str):
+            source = iter_document(source, filename, content_type)
+        document = await offload('text', index_document, source, language=language)
+        if not document.sentences:
+            return jsonify({'success': False, 'error': 'No text provided'}), 400
+
+        defer_audio, deadline = flashcard_options(options)
+        flashcards = await offload('tts', services.flashcards.generate_flashcards, document, language=language,
+                                   deadline=deadline, defer_audio=defer_audio)
+        return jsonify({'success': True, 'flashcards': flashcards})
+    except RequestEntityTooLarge as e:
+        return await upload_too_large(e)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@services.requires('voice', 'vocabulary', 'practice')
+async def get_job(job_id):
+    """A background job's status and result; unfinished jobs answer with Retry-After: 1"""
+    try:
+        return await offload('db', job_status, services, job_id)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/tts/<audio_key>', methods=['GET'])
+@services.requires('voice', 'vocabulary')
+async def get_tts_audio(audio_key):
+    try:
+        if not AudioCache.is_valid_key(audio_key):
+            return jsonify({'success': False, 'error': 'audio not found'}), 404
+        path = await offload('tts', services.voice.get_audio_path, audio_key, timeout=TTS_FETCH_WAIT)
+        if path:
+            # Content-addressed, so the bytes behind a key never change
+            return await send_file(path, mimetype='audio/mpeg', conditional=True, cache_timeout=AUDIO_MAX_AGE)
+        audio = await offload('tts', services.voice.get_audio, audio_key)
+        if audio is None:
+            return jsonify({'success': False, 'error': 'audio not found'}), 404
+        return Response(audio, mimetype='audio/mpeg')
+    except FutureTimeoutError:
+        resp = jsonify({'success': False, 'error': 'audio is still being generated'})
+        resp.headers['Retry-After'] = '1'
+        return resp, 202
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/conversation/start', methods=['POST'])
+@services.requires('conversation')
+async def start_conversation():
+    try:
+        data = await request.get_json(silent=True) or {}
+        session_id = data.get('session_id')
+        language_pair = data.get('language_pair')
+        if not session_id or not language_pair:
+            return jsonify({'error': 'session_id and language_pair are required'}), 400
+        await offload('db', services.conversation.start_conversation, session_id, language_pair)
+        return jsonify({'success': True})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/conversation/add', methods=['POST'])
+@services.requires('conversation')
+async def add_conversation_message():
+    try:
+        data = await request.get_json(silent=True) or {}
+        session_id = data.get('session_id')
+        message = data.get('message')
+        direction = data.get('direction')
+        if not session_id or not message or not direction:
+            return jsonify({'error': 'session_id, message, and direction are required'}), 400
+        # Dominated by the translation call, so it counts against that limit
+        result = await offload('translate', services.conversation.add_message, session_id, message, direction)
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/conversation/history/<session_id>', methods=['GET'])
+@services.requires('conversation')
+async def get_conversation_history(session_id):
+    """
+    Query parameters:
+        after (or since): next_cursor from an earlier response; only newer messages are returned
+        limit: page size (defaults to DEFAULT_PAGE_SIZE when `after` is given)
+    Without either, the whole history is returned. Send the ETag back as
+    If-None-Match to get 304 when the session has no new messages.
+    """
+    try:
+        after = request.args.get('after') or request.args.get('since')
+        limit = request.args.get('limit', type=int)
+        if limit is None and after:
+            limit = services.conversation.DEFAULT_PAGE_SIZE
+        if limit is not None:
+            limit = min(max(limit, 1), services.conversation.MAX_PAGE_SIZE)
+
+        etag = await offload('db', services.conversation.history_etag, session_id, after=after, limit=limit)
+        if request.if_none_match.contains(etag):
+            not_modified = Response('', status=304)
+            not_modified.set_etag(etag)
+            return not_modified
+
+        page = await offload('db', services.conversation.get_history_page, session_id,
+                           after=after, limit=limit)
+        resp = jsonify({'success': True, 'history': page['messages'], 'next_cursor': page['next_cursor'],
+                        'has_more': page['has_more']})
+        resp.set_etag(etag)
+        return resp
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+if __name__ == '__main__':
+    print('='*60)
+    print('AI TRANSLATOR BACKEND (asgi)')
+    print('Routes: translate, voice translate (+ stream), flashcards, conversation, jobs')
+    print('Listening on http://localhost:5000')
+    print('='*60)
+    app.run(host='0.0.0.0', port=5000)
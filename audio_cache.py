@@ -0,0 +1,160 @@
+"""
+Content-addressed on-disk cache for synthesized audio.
+
+Clips are stored as <root>/<key[:2]>/<key[2:4]>/<key>.mp3, where key is
+VoiceService.audio_key(text, language, slow). An in-memory index tracks sizes
+in LRU order so the store stays under a byte budget. Writes go to a temporary
+file in the same directory and are renamed into place, so readers never see a
+partial clip.
+
+Each process keeps its own index. Workers sharing a directory each enforce the
+budget on what they know about, so the shared total can overshoot slightly.
+"""
+
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+_KEY_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class AudioCache:
+    def __init__(self, root='tts_cache', max_bytes=256 * 1024 * 1024):
+        """
+        Args:
+            root: Directory holding the cached clips
+            max_bytes: Total size the cache is trimmed back to
+        """
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total = 0
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        os.makedirs(self.root, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def is_valid_key(key):
+        return bool(key) and bool(_KEY_RE.match(key))
+
+    def path_for(self, key):
+        return os.path.join(self.root, key[:2], key[2:4], key + '.mp3')
+
+    def contains(self, key):
+        with self._lock:
+            return key in self._index
+
+    def get_path(self, key):
+        """Path of a cached clip, or None on a miss."""
+        if not self.is_valid_key(key):
+            return None
+        with self._lock:
+            if key not in self._index:
+                self._counters['misses'] += 1
+                return None
+            self._index.move_to_end(key)
+            self._counters['hits'] += 1
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            # Removed underneath us, e.g. by another worker's eviction
+            self._forget(key)
+            return None
+        return path
+
+    def get(self, key):
+        """Cached MP3 bytes, or None on a miss."""
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            self._forget(key)
+            return None
+
+    def put(self, key, data):
+        """Atomically store a clip and trim the cache back under max_bytes."""
+        if not self.is_valid_key(key) or not data:
+            return
+        path = self.path_for(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        except OSError as e:
+            print(f"Audio cache write error: {e}")
+            return
+
+        evicted = []
+        with self._lock:
+            self._total += len(data) - self._index.get(key, 0)
+            self._index[key] = len(data)
+            self._index.move_to_end(key)
+            self._counters['stores'] += 1
+            while self._total > self.max_bytes and len(self._index) > 1:
+                old_key, size = self._index.popitem(last=False)
+                self._total -= size
+                self._counters['evictions'] += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self.path_for(old_key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._index)
+            stats['bytes'] = self._total
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+    def _forget(self, key):
+        with self._lock:
+            size = self._index.pop(key, None)
+            if size is not None:
+                self._total -= size
+
+    def _load_index(self):
+        # Rebuild the index from disk, oldest modification first
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if name.endswith('.tmp'):
+                    # Left behind by an interrupted write (recent ones may
+                    # belong to another worker that's still writing)
+                    try:
+                        if time.time() - os.stat(path).st_mtime > 300:
+                            os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                key = name[:-4] if name.endswith('.mp3') else None
+                if not self.is_valid_key(key):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if st.st_size:
+                    found.append((st.st_mtime, key, st.st_size))
+        found.sort()
+        with self._lock:
+            for _, key, size in found:
+                self._index[key] = size
+                self._total += size
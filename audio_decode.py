@@ -0,0 +1,321 @@
+"""
+In-memory audio decoding for speech recognition.
+
+Uploads are identified from their magic bytes and decoded once into 16-bit
+mono PCM: WAV is parsed directly, and compressed containers (WebM, Ogg, MP3,
+...) are piped through ffmpeg, which resamples in the same pass.
+
+A pipe can't seek, and an MP4/M4A recording often keeps its index (the moov
+atom) after the audio, so those containers are spooled to a temporary file
+for ffmpeg to read instead. Any other upload whose piped decode fails gets
+the same second try from a file when it can be read again.
+
+An upload can also be passed as a file object (the multipart upload or the
+raw request body). It is then read in small pieces straight into the WAV
+parser or ffmpeg's stdin, so the encoded recording is never held whole in
+memory, and decoding stops once the audio runs past MAX_AUDIO_SECONDS.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import wave
+
+import numpy as np
+
+# Rate compressed inputs are decoded to, and the rate out-of-range WAVs are resampled to
+RECOGNIZER_RATE = 16000
+# Sample rates the recognizer accepts as-is
+MIN_RATE = 8000
+MAX_RATE = 48000
+# Longest recording decoded: a few MB of compressed audio can expand to hours of PCM
+MAX_AUDIO_SECONDS = float(os.environ.get('AUDIO_MAX_SECONDS', '600'))
+# Piece size when reading an upload stream or ffmpeg's output
+READ_CHUNK = 64 * 1024
+# Containers ffmpeg may need to seek in, decoded from a temporary file rather than a pipe
+SPOOLED_FORMATS = ('mp4',)
+
+
+class AudioTooLong(Exception):
+    """The recording decodes to more than the allowed number of seconds."""
+
+
+class _DecodeFailed(Exception):
+    """ffmpeg ran but couldn't decode its input."""
+
+
+def sniff_format(data):
+    """
+    Identify an audio container from its first bytes
+
+    Returns:
+        str: 'wav', 'webm', 'ogg', 'flac', 'mp3', 'mp4', or None if unknown
+    """
+    head = bytes(data[:12])
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        # EBML header, shared by WebM and Matroska
+        return 'webm'
+    if head[:4] == b'OggS':
+        return 'ogg'
+    if head[:4] == b'fLaC':
+        return 'flac'
+    if head[:3] == b'ID3' or (len(head) > 1 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0):
+        return 'mp3'
+    if head[4:8] == b'ftyp':
+        return 'mp4'
+    return None
+
+
+def decode_audio(data, max_seconds=None):
+    """
+    Decode an uploaded recording to 16-bit mono PCM
+
+    Args:
+        data: Raw bytes of the upload, or a binary file object to stream it from
+        max_seconds: Longest recording accepted; defaults to MAX_AUDIO_SECONDS
+
+    Returns:
+        tuple: (PCM bytes-like object, sample rate)
+
+    Raises:
+        AudioTooLong: If the recording is longer than `max_seconds`
+    """
+    max_seconds = MAX_AUDIO_SECONDS if max_seconds is None else max_seconds
+    if hasattr(data, 'read'):
+        return _decode_stream(data, max_seconds)
+    if not data:
+        raise Exception("Unable to decode audio file - empty upload")
+    fmt = sniff_format(data)
+    if fmt == 'wav':
+        try:
+            return _decode_wav(io.BytesIO(data), max_seconds)
+        except (wave.Error, EOFError, ValueError):
+            # e.g. float or compressed WAV payloads that the wave module can't read
+            pass
+    return _decode_ffmpeg(data, fmt, max_seconds, reopen=lambda: data)
+
+
+def _decode_stream(stream, max_seconds):
+    try:
+        start = stream.tell() if stream.seekable() else None
+    except (AttributeError, OSError):
+        start = None
+    head = _read_head(stream, 12)
+    if not head:
+        raise Exception("Unable to decode audio file - empty upload")
+    fmt = sniff_format(head)
+
+    def reopen():
+        stream.seek(start)
+        return stream
+
+    if fmt == 'wav':
+        try:
+            return _decode_wav(_PrefixedStream(head, stream), max_seconds)
+        except (wave.Error, EOFError, ValueError):
+            if start is None:
+                # The request body can't be rewound for a second decoder
+                raise Exception("Unable to decode audio file - unsupported WAV encoding")
+            return _decode_ffmpeg(reopen(), fmt, max_seconds)
+    return _decode_ffmpeg(_PrefixedStream(head, stream), fmt, max_seconds,
+                          reopen=reopen if start is not None else None)
+
+
+def _read_head(stream, size):
+    head = b''
+    while len(head) < size:
+        piece = stream.read(size - len(head))
+        if not piece:
+            break
+        head += piece
+    return head
+
+
+class _PrefixedStream:
+    """Read-only file object: bytes already taken off the front of a stream, then the rest of it."""
+
+    def __init__(self, head, stream):
+        self._head = head
+        self._stream = stream
+
+    def read(self, size=-1):
+        if not self._head:
+            return self._stream.read(size)
+        if size is None or size < 0:
+            data, self._head = self._head + self._stream.read(), b''
+            return data
+        data, self._head = self._head[:size], self._head[size:]
+        if len(data) < size:
+            data += self._stream.read(size - len(data))
+        return data
+
+
+def _decode_wav(source, max_seconds):
+    with wave.open(source, 'rb') as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        # Streamed WAVs may carry a placeholder frame count, so read one
+        # frame past the limit rather than trusting the header
+        limit = int(max_seconds * rate)
+        frames = wav.readframes(min(wav.getnframes(), limit + 1))
+    if len(frames) > limit * channels * width:
+        raise AudioTooLong(f"Recording is longer than {max_seconds:g} seconds")
+
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype='<i2')
+    elif width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        samples = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8)
+                   | (raw[:, 2].astype(np.int8).astype(np.int32) << 16)) >> 8
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype='<i4') >> 16
+    else:
+        raise ValueError(f"unsupported sample width {width}")
+
+    if channels > 1:
+        # Integer mixdown over strided channel views; reducing along a
+        # 2-wide axis is several times slower than the whole decode
+        samples = samples[:len(samples) - len(samples) % channels]
+        mixed = samples[0::channels].astype(np.int32)
+        for c in range(1, channels):
+            mixed += samples[c::channels]
+        mixed //= channels
+        samples = mixed
+
+    if rate < MIN_RATE or rate > MAX_RATE:
+        samples = resample(samples, rate, RECOGNIZER_RATE)
+        rate = RECOGNIZER_RATE
+    if width == 2 and channels == 1 and samples.dtype == np.dtype('<i2'):
+        # Already 16-bit mono: hand the frames through without a copy
+        return frames, rate
+    return samples.astype('<i2').tobytes(), rate
+
+
+def resample(samples, src_rate, dst_rate):
+    """Linear-interpolation resampling, adequate for speech recognition input."""
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+    duration = len(samples) / float(src_rate)
+    count = max(1, int(round(duration * dst_rate)))
+    positions = np.arange(count) * (src_rate / float(dst_rate))
+    return np.interp(positions, np.arange(len(samples)), samples.astype(np.float32))
+
+
+def _decode_ffmpeg(source, fmt, max_seconds, reopen=None):
+    """
+    Decode bytes or a file object with ffmpeg, keeping at most `max_seconds` of its output
+
+    Args:
+        source: Bytes of the upload, or a file object to stream it from
+        fmt: Container named by sniff_format()
+        max_seconds: Longest recording accepted
+        reopen: Callable returning the whole upload again (its bytes, or the
+            file object rewound) for a second try from a file if the piped
+            decode fails; None if it can't be read twice
+    """
+    if fmt in SPOOLED_FORMATS:
+        return _decode_spooled(source, fmt, max_seconds)
+    try:
+        return _run_ffmpeg(source, fmt, max_seconds)
+    except _DecodeFailed:
+        if reopen is None:
+            raise
+    # Perhaps a container ffmpeg had to seek in that sniff_format() didn't recognize
+    return _decode_spooled(reopen(), fmt, max_seconds)
+
+
+def _decode_spooled(source, fmt, max_seconds):
+    """Write the upload to a temporary file and decode that, so ffmpeg can seek."""
+    fd, path = tempfile.mkstemp(suffix=f'.{fmt or "audio"}')
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                spool.write(source)
+            else:
+                shutil.copyfileobj(source, spool, READ_CHUNK)
+        return _run_ffmpeg(None, fmt, max_seconds, path=path)
+    finally:
+        os.remove(path)
+
+
+def _run_ffmpeg(source, fmt, max_seconds, path=None):
+    """
+    Run ffmpeg on the file at `path`, or else piping `source` to its stdin
+
+    Raises:
+        _DecodeFailed: If ffmpeg exits with an error or decodes nothing
+    """
+    ffmpeg = shutil.which('ffmpeg') or shutil.which('avconv')
+    if not ffmpeg:
+        raise Exception(f"Unable to decode audio file - ffmpeg is required for {fmt or 'this'} input")
+    cmd = [ffmpeg, '-hide_banner', '-loglevel', 'error', '-i', path or 'pipe:0',
+           '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(RECOGNIZER_RATE), 'pipe:1']
+    max_bytes = int(max_seconds * RECOGNIZER_RATE) * 2
+    with tempfile.TemporaryFile() as errors:
+        proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL if path else subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=errors)
+        feed_errors = []
+        feeder = None
+        if not path:
+            # Feed stdin from its own thread while this one drains stdout, so neither pipe fills up and stalls ffmpeg
+            feeder = threading.Thread(target=_feed, args=(proc.stdin, source, feed_errors), name='ffmpeg-feed',
+                                      daemon=True)
+            feeder.start()
+        pcm = bytearray()
+        too_long = False
+        try:
+            while True:
+                piece = proc.stdout.read(READ_CHUNK)
+                if not piece:
+                    break
+                pcm += piece
+                if len(pcm) > max_bytes:
+                    too_long = True
+                    proc.kill()
+                    break
+        finally:
+            proc.stdout.close()
+            proc.wait()
+            if feeder is not None:
+                feeder.join()
+        if feed_errors:
+            # e.g. the upload went over the request size limit mid-stream
+            raise feed_errors[0]
+        if too_long:
+            raise AudioTooLong(f"Recording is longer than {max_seconds:g} seconds")
+        if proc.returncode != 0 or not pcm:
+            errors.seek(0)
+            detail = errors.read().decode('utf-8', 'replace').strip().splitlines()
+            raise _DecodeFailed("Unable to decode audio file - invalid format or corrupted data"
+                                + (f" ({detail[-1]})" if detail else ''))
+    return pcm, RECOGNIZER_RATE
+
+
+def _feed(stdin, source, feed_errors):
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            stdin.write(source)
+        else:
+            while True:
+                piece = source.read(READ_CHUNK)
+                if not piece:
+                    break
+                stdin.write(piece)
+    except (BrokenPipeError, ValueError):
+        # ffmpeg exited early: it failed, or was stopped at the length limit
+        pass
+    except Exception as e:
+        feed_errors.append(e)
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
@@ -0,0 +1,149 @@
+"""
+Bounded-memory audio uploads and responses for the voice and practice routes.
+
+Uploads are capped at AUDIO_MAX_UPLOAD_MB, and everything else at
+MAX_UPLOAD_MB. Both the multipart 'audio' field and a raw body (an audio/*
+or application/octet-stream Content-Type, options in the query string) are
+accepted. The decoder reads either one as a stream.
+
+/api/voice/translate can answer in three shapes, picked by the
+`response_format` option or else the Accept header:
+  json       the default: base64 MP3 inline, up to INLINE_AUDIO_MAX_KB; longer
+             clips are left to `audio_url`
+  audio      the MP3 itself (audio/mpeg), texts in X-Source-Text and
+             X-Translated-Text headers (percent-encoded UTF-8)
+  multipart  multipart/mixed: a JSON part with the texts, then the MP3 part
+Binary bodies are sent from the audio cache's file in CHUNK_BYTES pieces.
+The server pulls the next piece only once the client has taken the last,
+so a slow reader holds one piece in memory rather than the whole clip.
+"""
+
+import json
+import os
+import uuid
+from urllib.parse import quote
+
+MB = 1024 * 1024
+# Largest recording accepted by the audio routes
+AUDIO_MAX_UPLOAD_BYTES = int(float(os.environ.get('AUDIO_MAX_UPLOAD_MB', '20')) * MB)
+# Largest request body of any route, documents for /api/flashcards included
+MAX_UPLOAD_BYTES = int(float(os.environ.get('MAX_UPLOAD_MB', '50')) * MB)
+# Longest clip inlined as base64 in a JSON answer
+INLINE_AUDIO_MAX_BYTES = int(float(os.environ.get('INLINE_AUDIO_MAX_KB', '1024')) * 1024)
+# Piece size for binary audio bodies; clips up to this size go out in one write
+CHUNK_BYTES = 64 * 1024
+# Raw request bodies buffered by the ASGI app spill to disk past this size
+SPOOL_BYTES = 1 * MB
+
+RESPONSE_FORMATS = {'json': 'application/json', 'audio': 'audio/mpeg', 'multipart': 'multipart/mixed'}
+# Custom headers the browser's fetch() may read across origins
+EXPOSED_HEADERS = 'X-Source-Text, X-Translated-Text, X-Audio-Url'
+
+
+def is_raw_audio(mimetype):
+    """Whether a request body is the recording itself rather than a form."""
+    return bool(mimetype) and (mimetype.startswith('audio/') or mimetype == 'application/octet-stream')
+
+
+def response_format(value, accept_mimetypes):
+    """
+    Answer shape for /api/voice/translate
+
+    Args:
+        value: The `response_format` option, if given
+        accept_mimetypes: The request's parsed Accept header
+
+    Returns:
+        str: 'json', 'audio' or 'multipart'
+
+    Raises:
+        ValueError: On an unknown `response_format`
+    """
+    if value:
+        value = value.strip().lower()
+        if value not in RESPONSE_FORMATS:
+            raise ValueError(f"response_format must be one of {', '.join(RESPONSE_FORMATS)}")
+        return value
+    # JSON wins ties, so '*/*' and missing Accept headers keep the JSON answer
+    best = accept_mimetypes.best_match(list(RESPONSE_FORMATS.values()), default='application/json')
+    return next(name for name, mimetype in RESPONSE_FORMATS.items() if mimetype == best)
+
+
+def inline_audio(audio):
+    """Whether a clip is small enough to inline as base64 in a JSON answer."""
+    return audio is not None and len(audio) <= INLINE_AUDIO_MAX_BYTES
+
+
+def open_audio(path=None, data=None):
+    """
+    MP3 body in CHUNK_BYTES pieces, from a file on disk or bytes in memory
+
+    The file is opened here rather than on the first piece, so a clip
+    evicted from the cache fails before any response headers are sent.
+
+    Returns:
+        tuple: (iterator of bytes pieces, total size)
+
+    Raises:
+        OSError: If the file can't be opened
+    """
+    if path is not None:
+        f = open(path, 'rb')
+        return _iter_file(f), os.fstat(f.fileno()).st_size
+    return _iter_bytes(memoryview(data)), len(data)
+
+
+def _iter_file(f):
+    with f:
+        while True:
+            piece = f.read(CHUNK_BYTES)
+            if not piece:
+                return
+            yield piece
+
+
+def _iter_bytes(view):
+    for offset in range(0, len(view), CHUNK_BYTES):
+        yield view[offset:offset + CHUNK_BYTES].tobytes()
+
+
+def audio_headers(metadata, size):
+    """Headers of an 'audio' answer: the texts ride along percent-encoded."""
+    headers = {'Content-Length': str(size), 'Access-Control-Expose-Headers': EXPOSED_HEADERS,
+               'X-Source-Text': quote(metadata.get('source_text') or '', safe=''),
+               'X-Translated-Text': quote(metadata.get('translated_text') or '', safe='')}
+    if metadata.get('audio_url'):
+        headers['X-Audio-Url'] = metadata['audio_url']
+    return headers
+
+
+def multipart_body(metadata, audio=None):
+    """
+    A 'multipart' answer: a JSON part, then the MP3 part when there is audio
+
+    Args:
+        metadata: Texts and stats for the JSON part
+        audio: (pieces, size) from open_audio, or None
+
+    Returns:
+        tuple: (body iterator, Content-Type, Content-Length)
+    """
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\nContent-Type: application/json\r\n\r\n'.encode('ascii')
+            + json.dumps(metadata, ensure_ascii=False).encode('utf-8') + b'\r\n')
+    closing = f'--{boundary}--\r\n'.encode('ascii')
+    length = len(head) + len(closing)
+    if audio is not None:
+        pieces, size = audio
+        audio_head = f'--{boundary}\r\nContent-Type: audio/mpeg\r\nContent-Length: {size}\r\n\r\n'.encode('ascii')
+        length += len(audio_head) + size + 2
+
+    def parts():
+        yield head
+        if audio is not None:
+            yield audio_head
+            yield from pieces
+            yield b'\r\n'
+        yield closing
+
+    return parts(), f'multipart/mixed; boundary={boundary}', length
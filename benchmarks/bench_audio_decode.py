@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Decode cost of speech_to_text uploads: legacy temp-file pipeline vs. in-memory.
+
+The legacy variant reproduces the old VoiceService path (save the upload, try
+pydub decodes, export a second WAV, read it back through sr.AudioFile). The
+in-memory variant is audio_decode.decode_audio plus sr.AudioData. Recognition
+itself is not called. Each (variant, format) pair runs in a fresh subprocess
+so its peak RSS can be reported on its own; request_peak_mb is the high-water
+mark above the RSS measured just before the first request.
+
+WebM and MP3 fixtures are encoded with ffmpeg and skipped if it isn't on PATH.
+
+Run: python benchmarks/bench_audio_decode.py [--seconds 10] [--iterations 20]
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.harness import print_table, summarize
+
+FORMATS = ['wav', 'webm', 'mp3']
+ENCODERS = {'webm': ['-c:a', 'libopus', '-f', 'webm'], 'mp3': ['-c:a', 'libmp3lame', '-f', 'mp3']}
+
+
+def make_wav(seconds, rate=44100, channels=2):
+    t = np.arange(int(seconds * rate)) / float(rate)
+    tone = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * np.random.default_rng(0).standard_normal(len(t))
+    samples = (np.clip(tone, -1, 1) * 32767).astype('<i2')
+    samples = np.repeat(samples[:, None], channels, axis=1)
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.tobytes())
+    return buf.getvalue()
+
+
+def make_fixtures(seconds, workdir):
+    wav = make_wav(seconds)
+    paths = {'wav': os.path.join(workdir, 'sample.wav')}
+    with open(paths['wav'], 'wb') as f:
+        f.write(wav)
+    ffmpeg = shutil.which('ffmpeg')
+    for fmt, args in ENCODERS.items():
+        if not ffmpeg:
+            print(f'ffmpeg not found, skipping {fmt}')
+            continue
+        out = os.path.join(workdir, 'sample.' + fmt)
+        proc = subprocess.run([ffmpeg, '-hide_banner', '-loglevel', 'error', '-y', '-i', paths['wav']] + args + [out])
+        if proc.returncode == 0:
+            paths[fmt] = out
+        else:
+            print(f'could not encode {fmt}, skipping')
+    return paths
+
+
+class _Upload:
+    """Minimal stand-in for werkzeug's FileStorage."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.data)
+
+    def read(self):
+        return self.data
+
+
+def legacy_decode(upload):
+    import speech_recognition as sr
+    from pydub import AudioSegment
+    temp_audio_path = temp_wav_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.tmp') as tmp_file:
+            upload.save(tmp_file.name)
+            temp_audio_path = tmp_file.name
+        try:
+            segment = AudioSegment.from_file(temp_audio_path, format='wav')
+        except Exception:
+            try:
+                segment = AudioSegment.from_file(temp_audio_path, format='webm')
+            except Exception:
+                segment = AudioSegment.from_file(temp_audio_path)
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as wav_file:
+            segment.export(wav_file.name, format='wav')
+            temp_wav_path = wav_file.name
+        with sr.AudioFile(temp_wav_path) as source:
+            return sr.Recognizer().record(source)
+    finally:
+        for path in (temp_audio_path, temp_wav_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def in_memory_decode(upload):
+    import speech_recognition as sr
+    from audio_decode import decode_audio
+    pcm, rate = decode_audio(upload.read())
+    return sr.AudioData(pcm, rate, 2)
+
+
+VARIANTS = {'legacy': legacy_decode, 'in-memory': in_memory_decode}
+
+
+def memory_kb(field):
+    """VmRSS/VmHWM from /proc (ru_maxrss is inherited across fork, so it can't isolate a child)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child(variant, path, iterations):
+    # Import everything either variant needs so imports don't count as request memory
+    import speech_recognition  # noqa: F401
+    import pydub  # noqa: F401
+    import audio_decode  # noqa: F401
+    with open(path, 'rb') as f:
+        data = f.read()
+    fn = VARIANTS[variant]
+    base_rss = memory_kb('VmRSS')
+    latencies = []
+    for i in range(iterations + 1):
+        started = time.perf_counter()
+        fn(_Upload(data))
+        if i:  # the first call warms up caches
+            latencies.append(time.perf_counter() - started)
+    peak_rss = memory_kb('VmHWM')
+    print(json.dumps({'latencies': latencies, 'peak_rss_mb': peak_rss / 1024.0,
+                      'request_peak_mb': (peak_rss - base_rss) / 1024.0, 'input_kb': len(data) / 1024.0}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10.0, help='fixture duration')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--child', nargs=2, metavar=('VARIANT', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], args.iterations)
+        return
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        fixtures = make_fixtures(args.seconds, workdir)
+        for fmt in FORMATS:
+            if fmt not in fixtures:
+                continue
+            for variant in VARIANTS:
+                proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--iterations', str(args.iterations),
+                                       '--child', variant, fixtures[fmt]], capture_output=True, text=True)
+                if proc.returncode != 0:
+                    print(f'{variant}/{fmt} failed: {proc.stderr.strip().splitlines()[-1:]}')
+                    continue
+                result = json.loads(proc.stdout.strip().splitlines()[-1])
+                row = summarize(result['latencies'])
+                row.update({'format': fmt, 'variant': variant, 'input_kb': result['input_kb'],
+                            'peak_rss_mb': result['peak_rss_mb'], 'request_peak_mb': result['request_peak_mb']})
+                rows.append(row)
+
+    print_table(rows, ['format', 'variant', 'input_kb', 'requests', 'mean_ms', 'p50_ms', 'p99_ms',
+                       'peak_rss_mb', 'request_peak_mb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+BM25 keyword ranking against the corpus index: vectorized NumPy vs. a per-word Python loop.
+
+Fills a CorpusIndex with `--documents` Zipf-distributed texts, then ranks
+the vocabulary of a `--words`-word document both ways and checks they agree.
+The table also shows how long the corpus took to build, the snapshot's
+size and write time, and how long a restart takes to load it.
+
+Run: python benchmarks/bench_corpus_index.py [--documents 20000] [--words 50000]
+"""
+import argparse
+import itertools
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.harness import print_table, summarize
+from corpus_index import B, K1, CorpusIndex
+from text_analysis import index_document
+
+
+def make_texts(count, words_per_text, vocabulary_size, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f'w{i}x' for i in range(vocabulary_size)]
+    cumulative = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(vocabulary_size)))
+    return [' '.join(rng.choices(vocabulary, cum_weights=cumulative, k=words_per_text)) + '.' for _ in range(count)]
+
+
+def loop_bm25(corpus, words, counts, length):
+    average = corpus.total_length / corpus.documents
+    scores = []
+    for word, tf in zip(words, counts):
+        term = corpus.vocabulary.get(word)
+        df = int(corpus._df[term]) if term is not None else 0
+        idf = math.log1p((corpus.documents - df + 0.5) / (df + 0.5))
+        scores.append(idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / average)))
+    return scores
+
+
+def timed(fn, iterations):
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = fn()
+        latencies.append(time.perf_counter() - started)
+    return latencies, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--documents', type=int, default=20000)
+    parser.add_argument('--words', type=int, default=50000, help='words in the ranked document')
+    parser.add_argument('--vocabulary', type=int, default=200000)
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'corpus_index.npz')
+        corpus = CorpusIndex(path, snapshot_interval=float('inf'))
+        texts = make_texts(args.documents, 40, args.vocabulary)
+        started = time.perf_counter()
+        for text in texts:
+            corpus.add_text(text)
+        rows.append({'case': 'build corpus', 'requests': args.documents,
+                     'mean_ms': (time.perf_counter() - started) / args.documents * 1000})
+
+        document = index_document(make_texts(1, args.words, args.vocabulary, seed=1)[0])
+        words, counts, length = document.words, document.term_counts(), document.word_count
+        vector_latencies, vector = timed(lambda: corpus.bm25(words, counts, length), args.iterations)
+        loop_latencies, loop = timed(lambda: loop_bm25(corpus, words, counts.tolist(), length), args.iterations)
+        agree = bool(np.allclose(vector, loop))
+        for name, latencies in (('rank numpy', vector_latencies), ('rank loop', loop_latencies)):
+            row = summarize(latencies)
+            row.update({'case': name, 'terms': len(words), 'agree': agree})
+            rows.append(row)
+
+        latencies, _ = timed(lambda: (setattr(corpus, '_dirty', True), corpus.snapshot()), 3)
+        row = summarize(latencies)
+        row.update({'case': 'snapshot', 'terms': len(corpus.words), 'size_mb': os.path.getsize(path) / 1e6})
+        rows.append(row)
+        latencies, restored = timed(lambda: CorpusIndex(path), 3)
+        row = summarize(latencies)
+        row.update({'case': 'load', 'terms': len(restored.words), 'agree': restored.stats() == corpus.stats()})
+        rows.append(row)
+
+    print_table(rows, ['case', 'requests', 'terms', 'mean_ms', 'p95_ms', 'size_mb', 'agree'])
+
+
+if __name__ == '__main__':
+    main()
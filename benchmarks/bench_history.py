@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Conversation history reads on a large session: full scan vs. indexed keyset pages vs. polling.
+
+Builds a database with one session of `--messages` messages among `--others`
+messages from other sessions, then times:
+  full-noindex  get_history with the per-session indexes dropped (the old query plan)
+  full          get_history, the whole session in one response
+  page          a keyset page of `--limit` messages from the middle of the session
+  poll-new      since=<latest cursor> after one new message arrived
+  poll-304      the ETag check a poller makes when nothing changed
+
+Run: python benchmarks/bench_history.py [--messages 100000] [--others 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import print_table, summarize
+from conversation_service import ConversationService, encode_cursor
+from storage import Storage
+
+SESSION = 'big-session'
+
+
+def populate(storage, messages, others):
+    sessions = [SESSION] * messages + [f'other-{i % 50}' for i in range(others)]
+    random.Random(0).shuffle(sessions)
+    # One second apart, formatted like datetime.now().isoformat()
+    rows = [(session, f'message {i}', f'mensaje {i}', 'a_to_b',
+             time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(1.7e9 + i)) + '.000000')
+            for i, session in enumerate(sessions)]
+    with storage.transaction() as conn:
+        conn.execute("INSERT INTO conversations (session_id, language_pair) VALUES (?, 'en-es')", (SESSION,))
+        conn.executemany('''
+            INSERT INTO conversation_messages (conversation_id, message_text, translated_text, direction, timestamp)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+
+
+def timed(fn, iterations):
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = fn()
+        latencies.append(time.perf_counter() - started)
+    return latencies, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100000, help='messages in the measured session')
+    parser.add_argument('--others', type=int, default=100000, help='messages in other sessions')
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # ConversationService's own TranslationService opens translator.db in the cwd
+        os.chdir(workdir)
+        storage = Storage(os.path.join(workdir, 'translator.db'))
+        populate(storage, args.messages, args.others)
+        service = ConversationService(storage=storage)
+
+        with storage.connection() as conn:
+            ids = [row[0] for row in conn.execute('SELECT id FROM conversation_messages WHERE conversation_id = ? '
+                                                  'ORDER BY id', (SESSION,))]
+        middle = encode_cursor(ids[len(ids) // 2])
+        latest = service.latest_cursor(SESSION)
+
+        cases = [
+            ('full', lambda: service.get_history(SESSION), max(3, args.iterations // 5)),
+            ('page', lambda: service.get_history_page(SESSION, after=middle, limit=args.limit)['messages'],
+             args.iterations),
+            ('poll-304', lambda: [service.history_etag(SESSION, after=latest, limit=args.limit)], args.iterations),
+        ]
+        for name, fn, iterations in cases:
+            latencies, result = timed(fn, iterations)
+            row = summarize(latencies)
+            row.update({'case': name, 'returned': len(result)})
+            rows.append(row)
+
+        with storage.transaction() as conn:
+            conn.execute('''
+                INSERT INTO conversation_messages (conversation_id, message_text, translated_text, direction, timestamp)
+                VALUES (?, 'new', 'nuevo', 'a_to_b', '9999-01-01T00:00:00.000000')
+            ''', (SESSION,))
+        latencies, result = timed(lambda: service.get_history_page(SESSION, after=latest, limit=args.limit)['messages'],
+                                  args.iterations)
+        row = summarize(latencies)
+        row.update({'case': 'poll-new', 'returned': len(result)})
+        rows.append(row)
+
+        with storage.transaction() as conn:
+            conn.execute('DROP INDEX idx_conversation_messages_session_time')
+            conn.execute('DROP INDEX idx_conversation_messages_session_id')
+        latencies, result = timed(lambda: service.get_history(SESSION), max(3, args.iterations // 5))
+        row = summarize(latencies)
+        row.update({'case': 'full-noindex', 'returned': len(result)})
+        rows.insert(0, row)
+        storage.close()
+        os.chdir(cwd)
+
+    print_table(rows, ['case', 'returned', 'requests', 'mean_ms', 'p50_ms', 'p95_ms'])
+
+
+if __name__ == '__main__':
+    main()
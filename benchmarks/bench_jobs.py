@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Background job queue: scheduling fairness, priorities, deduplication and crash recovery.
+
+Runs job_queue.JobQueue in-process against a scratch translator.db, with a
+handler that sleeps `--job-ms` instead of doing audio work. Scenarios:
+  fairness    tenant 'bulk' queues `--backlog` jobs, then tenant 'small' queues
+              `--small` jobs; the small tenant's wait (queued to started) with
+              the fair scheduler vs. plain FIFO across tenants
+  priority    `--backlog` priority-0 jobs, then `--small` priority-5 jobs from
+              the same tenant: wait of each class
+  dedup       `--duplicates` identical submissions from concurrent clients:
+              handler runs and time until all of them have a result
+  recovery    a queue is stopped mid-job without finishing it, as if its
+              process died; time until a new queue (lease `--lease` s)
+              claims the job again, and until it has finished
+  submit      submit latency with a `--input-kb` input, and queued-to-started
+              latency on an idle queue
+
+Run: python benchmarks/bench_jobs.py [--workers 4] [--job-ms 50] [--backlog 40] [--small 4]
+         [--duplicates 20] [--input-kb 1024] [--lease 1.0]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import print_table, run_load, summarize
+from job_queue import JobQueue
+from storage import Storage
+
+
+class FifoQueue(JobQueue):
+    """Oldest job first, whoever it belongs to: the baseline for fairness."""
+
+    def _pick_tenant(self, waiting, running):
+        return min(waiting, key=lambda row: row[2])[0]
+
+
+class Recorder:
+    """Sleeping handler that records when each job started and how often it ran."""
+
+    def __init__(self, job_ms):
+        self.job_ms = job_ms
+        self.started = {}
+        self.runs = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, params, input_path):
+        with self.lock:
+            self.runs += 1
+            self.started.setdefault(params['name'], time.time())
+        time.sleep(params.get('ms', self.job_ms) / 1000.0)
+        return {'name': params['name']}
+
+
+def wait_done(queue, job_ids, timeout=120.0):
+    """Seconds until every job has finished."""
+    started = time.perf_counter()
+    pending = set(job_ids)
+    while pending and time.perf_counter() - started < timeout:
+        pending = {job_id for job_id in pending if queue.get(job_id)['finished_at'] is None}
+        time.sleep(0.005)
+    if pending:
+        raise RuntimeError(f'{len(pending)} jobs still unfinished after {timeout:.0f}s')
+    return time.perf_counter() - started
+
+
+def open_queue(workdir, cls=JobQueue, **options):
+    recorder = Recorder(options.pop('job_ms'))
+    storage = Storage(os.path.join(workdir, 'translator.db'))
+    queue = cls({'work': recorder}, storage=storage, input_dir=os.path.join(workdir, 'inputs'), **options)
+    return queue, recorder, storage
+
+
+def waits_ms(recorder, submitted, names):
+    return [(recorder.started[name] - submitted[name]) * 1000 for name in names]
+
+
+def scenario_fairness(args, cls):
+    with tempfile.TemporaryDirectory() as workdir:
+        queue, recorder, storage = open_queue(workdir, cls, workers=args.workers, job_ms=args.job_ms)
+        submitted, ids = {}, []
+        for tenant, count in (('bulk', args.backlog), ('small', args.small)):
+            for i in range(count):
+                name = f'{tenant}-{i}'
+                submitted[name] = time.time()
+                ids.append(queue.submit('work', {'name': name}, tenant=tenant)['id'])
+        wait_done(queue, ids)
+        queue.close()
+        storage.close()
+    small = waits_ms(recorder, submitted, [f'small-{i}' for i in range(args.small)])
+    bulk = waits_ms(recorder, submitted, [f'bulk-{i}' for i in range(args.backlog)])
+    return {'scenario': 'fairness', 'variant': 'fair' if cls is JobQueue else 'fifo',
+            'small_p50_ms': statistics.median(small), 'small_max_ms': max(small),
+            'other_p50_ms': statistics.median(bulk), 'other_max_ms': max(bulk)}
+
+
+def scenario_priority(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        queue, recorder, storage = open_queue(workdir, workers=args.workers, job_ms=args.job_ms)
+        submitted, ids = {}, []
+        for priority, count in ((0, args.backlog), (5, args.small)):
+            for i in range(count):
+                name = f'p{priority}-{i}'
+                submitted[name] = time.time()
+                ids.append(queue.submit('work', {'name': name}, priority=priority)['id'])
+        wait_done(queue, ids)
+        queue.close()
+        storage.close()
+    high = waits_ms(recorder, submitted, [f'p5-{i}' for i in range(args.small)])
+    low = waits_ms(recorder, submitted, [f'p0-{i}' for i in range(args.backlog)])
+    return {'scenario': 'priority', 'variant': 'priority 5 vs 0',
+            'small_p50_ms': statistics.median(high), 'small_max_ms': max(high),
+            'other_p50_ms': statistics.median(low), 'other_max_ms': max(low)}
+
+
+def scenario_dedup(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        queue, recorder, storage = open_queue(workdir, workers=args.workers, job_ms=args.job_ms * 4)
+        upload = os.urandom(args.input_kb * 1024)
+        ids = []
+        started = time.perf_counter()
+        run_load(lambda i: ids.append(queue.submit('work', {'name': 'same'}, upload, tenant=f't{i % 4}')['id']),
+                 args.duplicates, concurrency=min(args.duplicates, 8))
+        wait_done(queue, ids)
+        elapsed = time.perf_counter() - started
+        deduplicated = sum(queue.get(job_id)['deduplicated'] for job_id in ids)
+        queue.close()
+        storage.close()
+    return {'scenario': 'dedup', 'submissions': len(ids), 'handler_runs': recorder.runs,
+            'deduplicated': deduplicated, 'all_done_ms': elapsed * 1000}
+
+
+def scenario_recovery(args):
+    class ShortLease(JobQueue):
+        LEASE_SECONDS = args.lease
+
+    with tempfile.TemporaryDirectory() as workdir:
+        first, _, storage = open_queue(workdir, ShortLease, workers=1, job_ms=args.job_ms)
+        job_id = first.submit('work', {'name': 'crash', 'ms': args.lease * 2000}, b'input')['id']
+        while first.get(job_id)['status'] != 'running':
+            time.sleep(0.005)
+        # Stop renewing leases and claiming, leaving the job running as a dead process would
+        crashed = time.perf_counter()
+        first.close(wait=False)
+        first.owner += ':dead'
+
+        second, _, second_storage = open_queue(workdir, ShortLease, workers=1, job_ms=args.job_ms)
+        while second.get(job_id)['attempts'] < 2:
+            time.sleep(0.005)
+        reclaimed = time.perf_counter() - crashed
+        wait_done(second, [job_id])
+        job = second.get(job_id)
+        second.close()
+        second_storage.close()
+        storage.close()
+    return {'scenario': 'recovery', 'status': job['status'], 'attempts': job['attempts'],
+            'reclaimed_ms': reclaimed * 1000, 'done_ms': (time.perf_counter() - crashed) * 1000}
+
+
+def scenario_submit(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        queue, recorder, storage = open_queue(workdir, workers=args.workers, job_ms=0)
+        upload = os.urandom(args.input_kb * 1024)
+        submitted = {}
+        ids = []
+
+        def submit(i):
+            submitted[f's{i}'] = time.time()
+            ids.append(queue.submit('work', {'name': f's{i}'}, upload)['id'])
+
+        latencies, errors, _ = run_load(submit, 50)
+        wait_done(queue, ids)
+        queue.close()
+        storage.close()
+    claims = waits_ms(recorder, submitted, list(submitted))
+    return {'scenario': 'submit', 'input_kb': args.input_kb, 'submit_p50_ms': summarize(latencies)['p50_ms'],
+            'submit_p99_ms': summarize(latencies)['p99_ms'], 'claim_p50_ms': statistics.median(claims),
+            'errors': len(errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--job-ms', type=float, default=50.0, help='handler run time')
+    parser.add_argument('--backlog', type=int, default=40, help='jobs queued ahead')
+    parser.add_argument('--small', type=int, default=4, help='jobs queued behind the backlog')
+    parser.add_argument('--duplicates', type=int, default=20)
+    parser.add_argument('--input-kb', type=int, default=1024)
+    parser.add_argument('--lease', type=float, default=1.0, help='lease seconds in the recovery scenario')
+    args = parser.parse_args()
+
+    scheduling = [scenario_fairness(args, FifoQueue), scenario_fairness(args, JobQueue), scenario_priority(args)]
+    print_table(scheduling, ['scenario', 'variant', 'small_p50_ms', 'small_max_ms', 'other_p50_ms', 'other_max_ms'])
+    print()
+    print_table([scenario_dedup(args)], ['scenario', 'submissions', 'handler_runs', 'deduplicated', 'all_done_ms'])
+    print()
+    print_table([scenario_recovery(args)], ['scenario', 'status', 'attempts', 'reclaimed_ms', 'done_ms'])
+    print()
+    print_table([scenario_submit(args)], ['scenario', 'input_kb', 'submit_p50_ms', 'submit_p99_ms', 'claim_p50_ms',
+                                          'errors'])
+
+
+if __name__ == '__main__':
+    main()
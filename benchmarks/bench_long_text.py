@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Translating a document beyond the provider's 5000-character limit: one call vs. chunked, sequential vs. parallel.
+
+A synthetic Markdown-ish document of `--paragraphs` paragraphs goes to a
+local stub translation server that adds `--latency` seconds per request.
+  single      the whole text in one provider call, which is what translate() used to do
+  sequential  iter_translate_document with one worker
+  parallel    iter_translate_document with `--workers` workers
+The table shows total time, time until the first paragraph is available,
+upstream requests, and whether every newline and list marker survived.
+
+Run: python benchmarks/bench_long_text.py [--paragraphs 200] [--latency 0.2] [--workers 8]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import print_table
+from benchmarks.stubs import StubTranslationServer
+from translation_cache import TranslationCache
+from translation_service import TranslationService
+from translator_pool import TranslatorPool
+
+
+def make_document(paragraphs, seed=0):
+    rng = random.Random(seed)
+    words = 'the river carries light across every valley toward distant quiet towns'.split()
+    blocks = []
+    for i in range(paragraphs):
+        sentences = [' '.join(rng.choices(words, k=rng.randint(6, 16))).capitalize() + '.'
+                     for _ in range(rng.randint(3, 12))]
+        if i % 5 == 0:
+            blocks.append(f'## Section {i // 5 + 1}')
+        if i % 7 == 3:
+            blocks.append('\n'.join(f'- {sentence}' for sentence in sentences[:4]))
+        else:
+            blocks.append(' '.join(sentences))
+    return '\n\n'.join(blocks) + '\n'
+
+
+def layout(text):
+    """The document with its words removed: newlines, markers and blank lines."""
+    return [line[:2] if line[:2] in ('- ', '##') else bool(line.strip()) for line in text.split('\n')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--paragraphs', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    document = make_document(args.paragraphs)
+    rows = []
+    with StubTranslationServer(latency=args.latency) as server:
+        for variant, workers in (('single', None), ('sequential', 1), ('parallel', args.workers)):
+            service = TranslationService(cache=TranslationCache(db_path=None),
+                                         pool=TranslatorPool(base_url=server.base_url))
+            before = server.requests
+            started = time.perf_counter()
+            first = None
+            error = None
+            translated = ''
+            try:
+                if workers is None:
+                    translated = service.pool.translate(document, 'en', 'es')
+                else:
+                    for paragraph in service.iter_translate_document(document, 'en', 'es', max_workers=workers):
+                        if first is None:
+                            first = time.perf_counter() - started
+                        translated += paragraph['translated_text']
+            except Exception as e:
+                error = type(e).__name__
+            rows.append({'variant': variant, 'chars': len(document), 'elapsed_s': time.perf_counter() - started,
+                         'first_paragraph_s': first, 'requests': server.requests - before,
+                         'layout_kept': layout(translated) == layout(document) if translated else None,
+                         'error': error})
+
+    print_table(rows, ['variant', 'chars', 'requests', 'first_paragraph_s', 'elapsed_s', 'layout_kept', 'error'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Cost of the request/span instrumentation: metrics on vs. off.
+
+  span        one `with span(...)` block, recording into a histogram
+  languages   GET /api/languages through the Flask test client (no I/O, so
+              the request hooks are the largest share they can ever be)
+  translate   POST /api/translate against the local stub provider with
+              `--latency` seconds per call and unique text (cache misses)
+  render      one /metrics scrape with every series the runs above created
+
+The Flask app is imported in a scratch directory so its databases don't touch
+the repo. Set METRICS_PROFILE_SLOW_MS to include the sampling profiler.
+
+Run: python benchmarks/bench_metrics.py [--requests 2000] [--rounds 10] [--spans 200000] [--latency 0.005]
+"""
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import print_table, run_load, summarize
+from benchmarks.stubs import StubTranslationServer
+import metrics
+
+
+def time_spans(count):
+    started = time.perf_counter()
+    for _ in range(count):
+        with metrics.span('bench'):
+            pass
+    return (time.perf_counter() - started) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--spans', type=int, default=200000)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    rows = []
+    counter = itertools.count()
+    with StubTranslationServer(latency=args.latency) as server:
+        os.environ['TRANSLATOR_BASE_URL'] = server.base_url
+        os.chdir(tempfile.mkdtemp(prefix='bench_metrics_'))
+        from app import app
+        client = app.test_client()
+
+        def languages(i):
+            client.get('/api/languages')
+
+        def translate(i):
+            client.post('/api/translate', json={'text': f'phrase {next(counter)}', 'source_lang': 'en',
+                                                'target_lang': 'es'})
+
+        # Alternate off/on rounds so drift in machine load hits both alike
+        latencies = {}
+        elapsed = {}
+        for _ in range(args.rounds):
+            for enabled in (False, True):
+                metrics.ENABLED = enabled
+                for case, fn in (('languages', languages), ('translate', translate)):
+                    fn(0)  # warm up
+                    taken, _, seconds = run_load(fn, args.requests // args.rounds)
+                    latencies.setdefault((case, enabled), []).extend(taken)
+                    elapsed[(case, enabled)] = elapsed.get((case, enabled), 0.0) + seconds
+
+    for enabled in (False, True):
+        metrics.ENABLED = enabled
+        rows.append({'case': 'span', 'metrics': 'on' if enabled else 'off', 'requests': args.spans,
+                     'per_call_us': time_spans(args.spans) * 1e6})
+    for (case, enabled), taken in latencies.items():
+        row = summarize(taken, elapsed[(case, enabled)])
+        row.update({'case': case, 'metrics': 'on' if enabled else 'off'})
+        rows.append(row)
+
+    # Per-case cost of turning metrics on, in microseconds at the median (the mean is at the mercy of GC pauses)
+    baseline = {row['case']: row.get('p50_ms') for row in rows if row['metrics'] == 'off'}
+    for row in rows:
+        if row['metrics'] == 'on' and baseline[row['case']] is not None:
+            row['overhead_us'] = (row['p50_ms'] - baseline[row['case']]) * 1000
+
+    started = time.perf_counter()
+    body = metrics.render()
+    rows.append({'case': 'render', 'metrics': 'on', 'requests': 1,
+                 'mean_ms': (time.perf_counter() - started) * 1000,
+                 'series': body.count('_count{')})
+
+    print_table(rows, ['case', 'metrics', 'requests', 'per_call_us', 'mean_ms', 'p50_ms', 'p99_ms', 'overhead_us',
+                       'series'])
+
+
+if __name__ == '__main__':
+    main()
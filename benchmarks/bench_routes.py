@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Every route of app.py, offline: throughput, tail latency and server memory per route.
+
+The Flask app runs in a subprocess, in a scratch working directory so its
+databases and caches start empty. Translation, speech recognition and TTS
+go to local stand-ins (benchmarks.stubs) with the latency distribution and
+faults given on the command line. Each scenario drives one route from
+`--concurrency` client threads for `--requests` requests and records:
+  rps, p50/p95/p99      throughput and latency of successful requests
+  errors                failed requests (non-2xx/304, or an SSE 'error' event)
+  translate/stt/tts     calls that reached each stub provider
+  rss_mb, rss_delta_mb  server resident memory after the scenario, and its change
+  peak_rss_mb           server high-water mark so far
+
+Results are written as JSON with the git commit, so runs can be compared
+across commits: `--compare <earlier.json>` prints the change per route.
+
+Run: python benchmarks/bench_routes.py [--requests 200] [--concurrency 16] [--latency 0.05] [--sigma 0.5]
+         [--error-rate 0.01] [--only translate,keywords] [--output routes.json] [--compare earlier.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import wave
+from datetime import datetime, timezone
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import requests
+
+from benchmarks.bench_long_text import make_document
+from benchmarks.harness import ROOT, print_table, run_load, summarize
+from benchmarks.load_asgi import free_port, wait_for
+from benchmarks.stubs import StubSpeechServer, StubTranslationServer, StubTTSServer, redirect_gtts
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+SESSION_ID = 'bench-session'
+COLUMNS = ['route', 'requests', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'translate', 'stt', 'tts',
+           'rss_mb', 'rss_delta_mb', 'peak_rss_mb']
+
+
+def serve(port, tts_url):
+    redirect_gtts(tts_url)
+    from app import app
+    app.run(host='127.0.0.1', port=port, threaded=True)
+
+
+def make_recording(seconds=3.0, rate=16000):
+    """Mono WAV: two tone bursts with a pause between them, so VAD finds two chunks."""
+    t = np.arange(int(seconds * rate)) / rate
+    samples = 6000 * np.sin(2 * np.pi * 180 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    samples[int(len(t) * 0.45):int(len(t) * 0.6)] = 0
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.astype('<i2').tobytes())
+    return buf.getvalue()
+
+
+def memory_mb(pid):
+    """Current and peak resident memory of a process, from /proc (None elsewhere)."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None, None
+    return int(fields['VmRSS'].split()[0]) / 1024, int(fields['VmHWM'].split()[0]) / 1024
+
+
+def scenarios(base, fixtures):
+    """(name, call) per route; call(session, i) returns the response."""
+    document = fixtures['document']
+    audio = fixtures['audio']
+
+    def post_audio(path, session, data):
+        return session.post(base + path, files={'audio': ('speech.wav', audio, 'audio/wav')}, data=data)
+
+    return [
+        ('GET /api/languages', lambda s, i: s.get(base + '/api/languages')),
+        ('GET /api/languages (etag)', lambda s, i: s.get(base + '/api/languages',
+                                                         headers={'If-None-Match': fixtures['languages_etag']})),
+        ('POST /api/translate', lambda s, i: s.post(base + '/api/translate', json={
+            'text': f'benchmark phrase number {i}', 'source_lang': 'en', 'target_lang': 'es'})),
+        ('POST /api/translate (cached)', lambda s, i: s.post(base + '/api/translate', json={
+            'text': 'the same benchmark phrase', 'source_lang': 'en', 'target_lang': 'es'})),
+        ('POST /api/translate (long)', lambda s, i: s.post(base + '/api/translate', json={
+            'text': f'{i} {document}', 'source_lang': 'en', 'target_lang': 'es'})),
+        ('POST /api/translate/stream', lambda s, i: s.post(base + '/api/translate/stream', json={
+            'text': f'{i} {document}', 'source_lang': 'en', 'target_lang': 'es'})),
+        ('POST /api/translate/batch', lambda s, i: s.post(base + '/api/translate/batch', json={
+            'texts': [f'batch {i} item {j}' for j in range(20)], 'source_lang': 'en', 'target_lang': 'es'})),
+        ('GET /api/translate/cache', lambda s, i: s.get(base + '/api/translate/cache')),
+        ('GET /api/health', lambda s, i: s.get(base + '/api/health')),
+        ('GET /metrics', lambda s, i: s.get(base + '/metrics')),
+        ('POST /api/voice/translate', lambda s, i: post_audio('/api/voice/translate', s, {
+            'source_lang': 'en', 'target_lang': 'es' if i % 2 else 'fr'})),
+        ('POST /api/voice/translate/stream', lambda s, i: post_audio('/api/voice/translate/stream', s, {
+            'source_lang': 'en', 'target_lang': 'de'})),
+        ('POST /api/keywords', lambda s, i: s.post(base + '/api/keywords', json={'text': document})),
+        ('POST /api/keywords (upload)', lambda s, i: s.post(base + '/api/keywords', files={
+            'file': ('document.txt', document.encode('utf-8'), 'text/plain')})),
+        ('POST /api/flashcards', lambda s, i: s.post(base + '/api/flashcards', json={
+            'text': f'Variant {i}. {document}', 'audio_deadline': 5})),
+        ('GET /api/tts/<audio_key>', lambda s, i: s.get(base + fixtures['audio_url'])),
+        ('POST /api/conversation/start', lambda s, i: s.post(base + '/api/conversation/start', json={
+            'session_id': f'bench-start-{i}', 'language_pair': 'en-es'})),
+        ('POST /api/conversation/add', lambda s, i: s.post(base + '/api/conversation/add', json={
+            'session_id': SESSION_ID, 'message': f'conversation message {i}',
+            'direction': 'a_to_b' if i % 2 else 'b_to_a'})),
+        ('GET /api/conversation/history', lambda s, i: s.get(
+            base + f'/api/conversation/history/{SESSION_ID}', params={'limit': 50})),
+        ('POST /api/practice/analyze', lambda s, i: post_audio('/api/practice/analyze', s, {
+            'target_text': 'Hello from the stub recognizer', 'language': 'en'})),
+    ]
+
+
+def prepare(base, document):
+    """Requests whose answers later scenarios need: an ETag, an audio URL, a conversation."""
+    fixtures = {'document': document, 'audio': make_recording()}
+    fixtures['languages_etag'] = requests.get(base + '/api/languages').headers.get('ETag', '')
+    flashcards = requests.post(base + '/api/flashcards', json={'text': document, 'audio_deadline': 10}).json()
+    fixtures['audio_url'] = next((card['audio_url'] for card in flashcards.get('flashcards', [])
+                                  if card.get('audio_url')), '/api/tts/' + '0' * 64)
+    requests.post(base + '/api/conversation/start', json={'session_id': SESSION_ID, 'language_pair': 'en-es'})
+    for i in range(100):
+        requests.post(base + '/api/conversation/add', json={'session_id': SESSION_ID, 'message': f'seed {i}',
+                                                            'direction': 'a_to_b'})
+    return fixtures
+
+
+def drive(call, requests_count, concurrency):
+    local = threading.local()
+
+    def one(i):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        resp = call(session, i)
+        if resp.status_code not in (200, 304) or b'event: error' in resp.content:
+            raise RuntimeError(resp.status_code)
+
+    return run_load(one, requests_count, concurrency)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(rows, path):
+    with open(path) as f:
+        earlier_run = json.load(f)
+    earlier = {row['route']: row for row in earlier_run['results']}
+    changes = []
+    for row in rows:
+        before = earlier.get(row['route'])
+        if not before:
+            continue
+        change = {'route': row['route']}
+        for key in ('rps', 'p50_ms', 'p99_ms', 'peak_rss_mb'):
+            if before.get(key) and row.get(key) is not None:
+                change[key + '_change_%'] = (row[key] / before[key] - 1) * 100
+        changes.append(change)
+    print(f'\nChange against {path} (commit {earlier_run.get("commit")}):')
+    print_table(changes, ['route', 'rps_change_%', 'p50_ms_change_%', 'p99_ms_change_%', 'peak_rss_mb_change_%'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--tts-url', help=argparse.SUPPRESS)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--warmup', type=int, default=5, help='unrecorded requests per route first')
+    parser.add_argument('--latency', type=float, default=0.05, help='median stub provider latency, seconds')
+    parser.add_argument('--sigma', type=float, default=0.5, help='lognormal latency spread (0 = fixed)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of provider calls answering 503')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='share of provider calls with extra delay')
+    parser.add_argument('--slow-latency', type=float, default=1.0, help='extra delay of slow calls, seconds')
+    parser.add_argument('--paragraphs', type=int, default=20, help='size of the document used by text routes')
+    parser.add_argument('--only', help='comma-separated substrings; run matching routes only')
+    parser.add_argument('--output', help='JSON results path (default: benchmarks/results/routes-<commit>-<time>.json)')
+    parser.add_argument('--compare', help='earlier JSON results to compare against')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.tts_url)
+        return
+
+    options = {'latency': args.latency, 'sigma': args.sigma}
+    stubs = {'translate': StubTranslationServer(**options), 'stt': StubSpeechServer(**options),
+             'tts': StubTTSServer(**options)}
+    for stub in stubs.values():
+        stub.start()
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        port = free_port()
+        pythonpath = os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))
+        env = dict(os.environ, PYTHONPATH=pythonpath, TRANSLATOR_BASE_URL=stubs['translate'].base_url,
+                   SPEECH_RECOGNITION_ENDPOINT=stubs['stt'].base_url)
+        log_path = os.path.join(workdir, 'server.log')
+        with open(log_path, 'wb') as log:
+            proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port),
+                                     '--tts-url', stubs['tts'].base_url],
+                                    cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        base = f'http://127.0.0.1:{port}'
+        try:
+            try:
+                wait_for(base + '/api/languages')
+            except RuntimeError:
+                with open(log_path, errors='replace') as f:
+                    print(f.read()[-4000:])
+                raise
+            fixtures = prepare(base, make_document(args.paragraphs))
+            for stub in stubs.values():
+                stub.set_faults(args.error_rate, args.slow_rate, args.slow_latency)
+
+            selected = [s for s in scenarios(base, fixtures)
+                        if not args.only or any(part in s[0] for part in args.only.split(','))]
+            for route, call in selected:
+                drive(call, args.warmup, 1)
+                for stub in stubs.values():
+                    stub.reset_counters()
+                rss_before, _ = memory_mb(proc.pid)
+                latencies, errors, elapsed = drive(call, args.requests, args.concurrency)
+                rss, peak = memory_mb(proc.pid)
+                row = summarize(latencies, elapsed)
+                # Throughput counts completed requests, failed or not
+                row.update({'route': route, 'requests': args.requests, 'errors': len(errors),
+                            'rps': args.requests / elapsed, 'rss_mb': rss, 'peak_rss_mb': peak,
+                            'rss_delta_mb': rss - rss_before if rss is not None else None})
+                row.update({name: stub.requests for name, stub in stubs.items()})
+                rows.append(row)
+                print(f'{route}: {row["rps"]:.1f} req/s, p99 {row["p99_ms"]:.1f} ms, {len(errors)} errors',
+                      flush=True)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+            for stub in stubs.values():
+                stub.stop()
+
+    commit = git_commit()
+    print()
+    print_table(rows, COLUMNS)
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f'routes-{(commit or "unknown")[:10]}-{stamp}.json')
+    with open(output, 'w') as f:
+        json.dump({'commit': commit, 'created': datetime.now(timezone.utc).isoformat(),
+                   'python': platform.python_version(), 'platform': platform.platform(),
+                   'cpus': os.cpu_count(), 'args': {k: v for k, v in vars(args).items()
+                                                    if k not in ('serve', 'port', 'tts_url')},
+                   'results': rows}, f, indent=2)
+    print(f'\nResults written to {output}')
+    if args.compare:
+        compare(rows, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Cold start of app.py: eager service construction vs. the lazy service container.
+
+Each run is a fresh interpreter in a scratch directory, with the translator
+pointed at the local stub server. It records:
+  import_ms         `import app`, services included when they are preloaded
+  first_request_ms  the first POST /api/translate after that, including any lazy service creation
+  process_ms        interpreter start to exit, as the parent sees it
+  modules, rss_mb   modules imported and peak resident memory at that point
+Variants:
+  eager             APP_PRELOAD=1 with every feature group: what app.py did before
+  lazy              every group enabled, services created on first use
+  translate         APP_FEATURES=translate, lazy
+  translate+preload APP_FEATURES=translate APP_PRELOAD=1: a slim worker that warms up before serving
+
+Run: python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import ROOT, print_table
+from benchmarks.stubs import StubTranslationServer
+
+VARIANTS = (
+    ('eager', {'APP_FEATURES': 'all', 'APP_PRELOAD': '1'}),
+    ('lazy', {'APP_FEATURES': 'all', 'APP_PRELOAD': ''}),
+    ('translate', {'APP_FEATURES': 'translate', 'APP_PRELOAD': ''}),
+    ('translate+preload', {'APP_FEATURES': 'translate', 'APP_PRELOAD': '1'}),
+)
+
+
+def child():
+    started = time.perf_counter()
+    import app
+    imported = time.perf_counter()
+    response = app.app.test_client().post('/api/translate', json={'text': 'cold start', 'source_lang': 'en',
+                                                                  'target_lang': 'es'})
+    answered = time.perf_counter()
+    import resource
+    print(json.dumps({'import_ms': (imported - started) * 1000, 'first_request_ms': (answered - imported) * 1000,
+                      'status': response.status_code, 'modules': len(sys.modules),
+                      'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                      'services': app.services.loaded()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    rows = []
+    pythonpath = os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))
+    with StubTranslationServer() as stub:
+        for name, env_overrides in VARIANTS:
+            env = dict(os.environ, PYTHONPATH=pythonpath, TRANSLATOR_BASE_URL=stub.base_url, **env_overrides)
+            runs = []
+            for _ in range(args.runs):
+                with tempfile.TemporaryDirectory() as workdir:
+                    started = time.perf_counter()
+                    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], cwd=workdir,
+                                         env=env, capture_output=True, text=True, check=True).stdout
+                    result = json.loads(out.strip().splitlines()[-1])
+                    # Includes interpreter exit; the child reports its own timings above
+                    result['process_ms'] = (time.perf_counter() - started) * 1000
+                    runs.append(result)
+            row = {'variant': name, 'status': runs[-1]['status'], 'services': ','.join(runs[-1]['services'])}
+            for key in ('import_ms', 'first_request_ms', 'process_ms', 'modules', 'rss_mb'):
+                row[key] = statistics.median(run[key] for run in runs)
+            rows.append(row)
+
+    print_table(rows, ['variant', 'import_ms', 'first_request_ms', 'process_ms', 'modules', 'rss_mb', 'status',
+                       'services'])
+    print(f'medians of {args.runs} runs')
+
+
+if __name__ == '__main__':
+    main()
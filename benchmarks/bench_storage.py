@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Concurrent writers on conversation storage: per-call connections vs. the pooled WAL store.
+
+`--writers` threads each add `--messages` messages via ConversationService.add_message,
+with translation replaced by a sleep of `--latency` seconds. The 'legacy'
+variant reproduces the old code path: a fresh sqlite3 connection per call in
+the default rollback-journal mode, held open (with its read cursor) across
+the translation. The 'pooled' variant is ConversationService on storage.Storage.
+
+Run: python benchmarks/bench_storage.py [--writers 32] [--messages 50] [--latency 0.05]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import print_table, run_load, summarize
+from conversation_service import ConversationService
+from storage import MIGRATIONS, Storage
+
+SESSIONS = 8
+
+
+class _StubTranslation:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def translate(self, text, src_lang, dest_lang):
+        time.sleep(self.latency)
+        return {'translated_text': f'[{dest_lang}] {text}'}
+
+    def _normalize_code(self, code):
+        return (code or '').lower()
+
+
+class _LegacyConversations:
+    """ConversationService as it was: connect per call, translate inside the open connection."""
+
+    def __init__(self, db_path, translation_service):
+        self.db_path = db_path
+        self.translation_service = translation_service
+        conn = sqlite3.connect(db_path)
+        for step in MIGRATIONS:
+            for statement in step:
+                conn.execute(statement)
+        conn.commit()
+        conn.close()
+
+    def start_conversation(self, session_id, language_pair):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('INSERT OR REPLACE INTO conversations (session_id, language_pair) VALUES (?, ?)',
+                     (session_id, language_pair))
+        conn.commit()
+        conn.close()
+
+    def add_message(self, session_id, message, direction):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute('SELECT language_pair FROM conversations WHERE session_id = ?', (session_id,))
+        lang_a, lang_b = c.fetchone()[0].split('-')
+        result = self.translation_service.translate(text=message, src_lang=lang_a, dest_lang=lang_b)
+        c.execute('''
+            INSERT INTO conversation_messages
+            (conversation_id, message_text, translated_text, direction, timestamp)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (session_id, message, result['translated_text'], direction, datetime.now().isoformat()))
+        conn.commit()
+        conn.close()
+
+
+def build(variant, db_path, latency):
+    stub = _StubTranslation(latency)
+    if variant == 'legacy':
+        return _LegacyConversations(db_path, stub)
+    service = ConversationService(storage=Storage(db_path))
+    service.translation_service = stub
+    return service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, default=32)
+    parser.add_argument('--messages', type=int, default=50, help='messages per writer')
+    parser.add_argument('--latency', type=float, default=0.05, help='stub translation seconds')
+    args = parser.parse_args()
+
+    rows = []
+    cwd = os.getcwd()
+    for variant in ('legacy', 'pooled'):
+        with tempfile.TemporaryDirectory() as workdir:
+            # ConversationService's own TranslationService opens translator.db in the cwd
+            os.chdir(workdir)
+            db_path = os.path.join(workdir, 'translator.db')
+            service = build(variant, db_path, args.latency)
+            for s in range(SESSIONS):
+                service.start_conversation(f'session-{s}', 'en-es')
+
+            def write(i):
+                service.add_message(f'session-{i % SESSIONS}', f'message {i}', 'a_to_b')
+
+            latencies, errors, elapsed = run_load(write, args.writers * args.messages, args.writers)
+            conn = sqlite3.connect(db_path)
+            stored = conn.execute('SELECT COUNT(*) FROM conversation_messages').fetchone()[0]
+            conn.close()
+            os.chdir(cwd)
+        row = summarize(latencies, elapsed)
+        row.update({'variant': variant, 'writers': args.writers, 'errors': len(errors), 'stored': stored})
+        if errors:
+            row['first_error'] = str(errors[0])[:60]
+        rows.append(row)
+
+    print_table(rows, ['variant', 'writers', 'requests', 'errors', 'stored', 'rps', 'p50_ms', 'p95_ms', 'p99_ms',
+                       'first_error'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Keyword and flashcard extraction on multi-megabyte documents: per-request rescans vs. a one-pass index.
+
+A synthetic document of `--megabytes` of Zipf-distributed words is run
+through the old implementation (regex split over the whole text, then a
+substring scan of every sentence for each top word) and through
+text_analysis.index_document fed from a byte stream in 64 KiB reads. Both
+produce the same top words. The table shows time, peak traced memory, and
+cards whose sentence only contains the word inside a longer word
+('cat' in 'category').
+
+Run: python benchmarks/bench_text_analysis.py [--megabytes 8] [--iterations 3]
+"""
+import argparse
+import io
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+from collections import Counter
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import print_table, summarize
+from text_analysis import index_document, iter_text, stopwords_for
+
+_LEGACY_STOPWORDS = set(stopwords_for('en'))
+
+
+def make_document(megabytes, seed=0):
+    """Sentences of Zipf-distributed words, with stems that are prefixes of longer words."""
+    rng = random.Random(seed)
+    stems = [''.join(rng.choice('abcdefghijklmnoprstuvw') for _ in range(rng.randint(4, 7))) for _ in range(3000)]
+    # Common words get longer relatives ('cate' -> 'category'-style collisions)
+    vocabulary = stems + [stem + suffix for stem in stems[:300] for suffix in ('gory', 'ment', 'ness')]
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    rng.shuffle(vocabulary)
+    sentences = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        words = rng.choices(vocabulary, weights, k=rng.randint(6, 24))
+        sentence = ' '.join(words).capitalize() + rng.choice('..!?')
+        sentences.append(sentence)
+        size += len(sentence) + 1
+    return ' '.join(sentences)
+
+
+def legacy_cards(text):
+    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    words = re.findall(r"\w+", text.lower())
+    candidates = [w for w in words if len(w) > 3 and w not in _LEGACY_STOPWORDS]
+    top = [w for w, _ in Counter(candidates).most_common(8)]
+    cards = []
+    for w in top:
+        found = None
+        for s in sentences:
+            if w in s.lower():
+                found = s.strip()
+                break
+        cards.append((w, found or (sentences[0] if sentences else '')))
+    return cards
+
+
+def indexed_cards(data):
+    index = index_document(iter_text(io.BytesIO(data)))
+    return [(w, index.first_sentence(w)) for w in index.top_words(8, min_length=4)]
+
+
+def substring_only(cards):
+    return sum(1 for w, sentence in cards if not re.search(r'(?<!\w)' + re.escape(w) + r'(?!\w)', sentence, re.I))
+
+
+def measure(fn, arg, iterations):
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = fn(arg)
+        latencies.append(time.perf_counter() - started)
+    tracemalloc.start()
+    fn(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return latencies, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--megabytes', type=float, default=8)
+    parser.add_argument('--iterations', type=int, default=3)
+    args = parser.parse_args()
+
+    text = make_document(args.megabytes)
+    data = text.encode('utf-8')
+    rows = []
+    for name, fn, arg in (('legacy', legacy_cards, text), ('indexed', indexed_cards, data)):
+        latencies, peak, cards = measure(fn, arg, args.iterations)
+        row = summarize(latencies)
+        row.update({'variant': name, 'doc_mb': len(data) / 1e6, 'peak_mb': peak / 1e6,
+                    'top_words': ' '.join(w for w, _ in cards), 'substring_only': substring_only(cards)})
+        rows.append(row)
+
+    print_table(rows, ['variant', 'doc_mb', 'requests', 'mean_ms', 'peak_mb', 'substring_only', 'top_words'])
+
+
+if __name__ == '__main__':
+    main()
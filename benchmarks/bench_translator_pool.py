@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Per-request overhead of a new GoogleTranslator per call vs. the pooled clients.
+
+Both variants talk to a local stub translation server, so the numbers show
+client construction and connection setup cost rather than network latency.
+
+Run: python benchmarks/bench_translator_pool.py [--requests 500] [--concurrency 8]
+"""
+import argparse
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deep_translator import GoogleTranslator
+
+from benchmarks.harness import print_table, run_load, summarize
+from benchmarks.stubs import StubTranslationServer
+from translator_pool import TranslatorPool
+
+PAIRS = [('en', 'es'), ('en', 'fr'), ('es', 'en'), ('auto', 'de')]
+
+
+def per_call_clients(base_url):
+    def call(i):
+        source, target = PAIRS[i % len(PAIRS)]
+        client = GoogleTranslator(source=source, target=target)
+        client._base_url = base_url
+        return client.translate(f'hello number {i}')
+    return call
+
+
+def pooled_clients(pool):
+    def call(i):
+        source, target = PAIRS[i % len(PAIRS)]
+        return pool.translate(f'hello number {i}', source, target)
+    return call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.0, help='stub latency in seconds')
+    args = parser.parse_args()
+
+    rows = []
+    with StubTranslationServer(latency=args.latency) as stub:
+        pool = TranslatorPool(base_url=stub.base_url)
+        variants = [('per-call', per_call_clients(stub.base_url)), ('pooled', pooled_clients(pool))]
+        for concurrency in (1, args.concurrency):
+            for name, fn in variants:
+                stub.reset_counters()
+                latencies, errors, elapsed = run_load(fn, args.requests, concurrency)
+                row = summarize(latencies, elapsed)
+                row.update({'variant': name, 'concurrency': concurrency, 'errors': len(errors),
+                            'connections': stub.connections})
+                rows.append(row)
+        pool.close()
+
+    print_table(rows, ['variant', 'concurrency', 'requests', 'errors', 'connections',
+                       'mean_ms', 'p50_ms', 'p99_ms', 'rps'])
+
+
+if __name__ == '__main__':
+    main()
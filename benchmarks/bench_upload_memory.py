@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Server memory per concurrent /api/voice/translate request, by upload and answer shape.
+
+Each (variant, concurrency) pair gets a fresh Flask server in a subprocess,
+with local stub providers, so its memory high-water mark is its own. After one
+warm-up request, `concurrency` clients each send `--rounds` requests at
+once while the server's resident memory is sampled every few milliseconds:
+  baseline_mb     RSS after the warm-up request
+  peak_mb         highest RSS sampled during the run
+  per_request_mb  (peak - baseline) / concurrency
+Variants:
+  json-inline     multipart upload, JSON answer with the whole clip as base64
+                  (INLINE_AUDIO_MAX_KB raised past the clip size): the old shape
+  json            multipart upload, JSON answer; clips over INLINE_AUDIO_MAX_KB
+                  are left to audio_url
+  audio           raw audio/* body streamed into the decoder, MP3 answer
+  multipart       raw audio/* body, multipart/mixed answer (JSON part + MP3 part)
+The recording is `--seconds` of speech-like WAV, or Opus with `--codec opus`
+(needs ffmpeg). The stub TTS returns `--tts-bytes-per-char` bytes per
+character, so clips can be made large. `--read-delay` slows the client's reads
+of binary answers to show that a slow reader doesn't make the server buffer.
+
+Run: python benchmarks/bench_upload_memory.py [--seconds 120] [--codec wav|opus] [--concurrency 1,4,16]
+         [--rounds 3] [--tts-bytes-per-char 20000] [--read-delay 0.0] [--only audio,json]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.bench_routes import make_recording, memory_mb
+from benchmarks.harness import ROOT, print_table
+from benchmarks.load_asgi import free_port, wait_for
+from benchmarks.stubs import StubSpeechServer, StubTranslationServer, StubTTSServer, redirect_gtts
+
+VARIANTS = (
+    ('json-inline', {'INLINE_AUDIO_MAX_KB': str(1024 * 1024)}),
+    ('json', {}),
+    ('audio', {}),
+    ('multipart', {}),
+)
+SAMPLE_INTERVAL = 0.005
+
+
+def serve(port, tts_url):
+    redirect_gtts(tts_url)
+    from app import app
+    app.run(host='127.0.0.1', port=port, threaded=True)
+
+
+def encode(wav, codec):
+    if codec == 'wav':
+        return wav, 'audio/wav'
+    out = subprocess.run(['ffmpeg', '-hide_banner', '-loglevel', 'error', '-f', 'wav', '-i', 'pipe:0',
+                          '-c:a', 'libopus', '-b:a', '32k', '-f', 'ogg', 'pipe:1'],
+                         input=wav, capture_output=True, check=True).stdout
+    return out, 'audio/ogg'
+
+
+def send(base, variant, upload, content_type, read_delay):
+    """One request; returns (seconds taken, answer bytes received)."""
+    started = time.perf_counter()
+    params = {'source_lang': 'en', 'target_lang': 'es'}
+    if variant in ('json-inline', 'json'):
+        resp = requests.post(base + '/api/voice/translate', data=params,
+                             files={'audio': ('speech', upload, content_type)})
+        received = len(resp.content)
+    else:
+        resp = requests.post(base + '/api/voice/translate', params={**params, 'response_format': variant},
+                             data=upload, headers={'Content-Type': content_type}, stream=True)
+        received = 0
+        for piece in resp.iter_content(64 * 1024):
+            received += len(piece)
+            if read_delay:
+                time.sleep(read_delay)
+    if resp.status_code != 200:
+        raise RuntimeError(f'{variant}: HTTP {resp.status_code}')
+    return time.perf_counter() - started, received
+
+
+def sample_rss(pid, stop, samples):
+    while not stop.is_set():
+        rss, _ = memory_mb(pid)
+        if rss is not None:
+            samples.append(rss)
+        time.sleep(SAMPLE_INTERVAL)
+
+
+def run(variant, env_overrides, concurrency, args, stubs, upload, content_type):
+    with tempfile.TemporaryDirectory() as workdir:
+        port = free_port()
+        pythonpath = os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))
+        env = dict(os.environ, PYTHONPATH=pythonpath, TRANSLATOR_BASE_URL=stubs['translate'].base_url,
+                   SPEECH_RECOGNITION_ENDPOINT=stubs['stt'].base_url, **env_overrides)
+        with open(os.path.join(workdir, 'server.log'), 'wb') as log:
+            proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port),
+                                     '--tts-url', stubs['tts'].base_url],
+                                    cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        base = f'http://127.0.0.1:{port}'
+        try:
+            wait_for(base + '/api/languages')
+            _, answer_bytes = send(base, variant, upload, content_type, 0.0)
+            baseline, _ = memory_mb(proc.pid)
+
+            samples = []
+            stop = threading.Event()
+            sampler = threading.Thread(target=sample_rss, args=(proc.pid, stop, samples), daemon=True)
+            sampler.start()
+            latencies = []
+            errors = []
+
+            def client():
+                for _ in range(args.rounds):
+                    try:
+                        latencies.append(send(base, variant, upload, content_type, args.read_delay)[0])
+                    except Exception as e:
+                        errors.append(e)
+
+            clients = [threading.Thread(target=client) for _ in range(concurrency)]
+            for thread in clients:
+                thread.start()
+            for thread in clients:
+                thread.join()
+            stop.set()
+            sampler.join()
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    peak = max(samples) if samples else baseline
+    return {'variant': variant, 'concurrency': concurrency, 'upload_kb': len(upload) / 1024,
+            'answer_kb': answer_bytes / 1024, 'baseline_mb': baseline, 'peak_mb': peak,
+            'per_request_mb': (peak - baseline) / concurrency,
+            'p50_ms': statistics.median(latencies) * 1000 if latencies else None, 'errors': len(errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--tts-url', help=argparse.SUPPRESS)
+    parser.add_argument('--seconds', type=float, default=120.0, help='length of the uploaded recording')
+    parser.add_argument('--codec', choices=('wav', 'opus'), default='wav')
+    parser.add_argument('--concurrency', default='1,4,16', help='comma-separated concurrent client counts')
+    parser.add_argument('--rounds', type=int, default=3, help='requests per client')
+    parser.add_argument('--tts-bytes-per-char', type=int, default=20000, help='size of the stub TTS clips')
+    parser.add_argument('--read-delay', type=float, default=0.0, help='client pause per 64 KB of binary answer')
+    parser.add_argument('--only', help='comma-separated variant names')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.tts_url)
+        return
+
+    upload, content_type = encode(make_recording(args.seconds), args.codec)
+    stubs = {'translate': StubTranslationServer(), 'stt': StubSpeechServer(),
+             'tts': StubTTSServer(bytes_per_char=args.tts_bytes_per_char)}
+    for stub in stubs.values():
+        stub.start()
+    rows = []
+    try:
+        for variant, env_overrides in VARIANTS:
+            if args.only and variant not in args.only.split(','):
+                continue
+            for concurrency in (int(c) for c in args.concurrency.split(',')):
+                row = run(variant, env_overrides, concurrency, args, stubs, upload, content_type)
+                print(f'{variant} x{concurrency}: peak {row["peak_mb"]:.1f} MB, '
+                      f'{row["per_request_mb"]:.2f} MB per request', flush=True)
+                rows.append(row)
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+
+    print()
+    print_table(rows, ['variant', 'concurrency', 'upload_kb', 'answer_kb', 'baseline_mb', 'peak_mb',
+                       'per_request_mb', 'p50_ms', 'errors'])
+
+
+if __name__ == '__main__':
+    main()
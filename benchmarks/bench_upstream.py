@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Translation calls during provider faults: the old fallback chain vs. the resilient upstream layer.
+
+Each phase points a TranslationService at the fault-injecting stub server:
+  tail     healthy, but `--tail-rate` of requests take an extra second
+  outage   every request answers HTTP 503
+  hang     every request takes longer than the client timeout
+'legacy' calls the pooled client directly with the old nested fallbacks
+(no deadline, no backoff, no breaker). 'upstream' goes through
+upstream.Upstream with hedging, a circuit breaker and a `--deadline`
+second deadline. Every request uses new text, so the cache never answers.
+
+Run: python benchmarks/bench_upstream.py [--requests 200] [--concurrency 16] [--deadline 1.0]
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import print_table, run_load, summarize
+from benchmarks.stubs import StubTranslationServer
+from translation_cache import TranslationCache
+from translation_service import CLIENT_ERRORS, TranslationService
+from translator_pool import TranslatorPool
+from upstream import Upstream
+
+# Client-side HTTP timeout; the hang phase sleeps past it
+CLIENT_TIMEOUT = 2.0
+
+
+class _LegacyTranslation:
+    """TranslationService._translate_uncached as it was: retry and fallback back to back, no deadline."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def translate(self, text, src_lang, dest_lang):
+        try:
+            return self.pool.translate(text, src_lang, dest_lang)
+        except Exception:
+            return self.pool.translate(text, 'auto', dest_lang)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--tail-rate', type=float, default=0.05)
+    parser.add_argument('--deadline', type=float, default=1.0)
+    args = parser.parse_args()
+
+    phases = [
+        ('tail', {'slow_rate': args.tail_rate, 'slow_latency': 1.0}),
+        ('outage', {'error_rate': 1.0}),
+        ('hang', {'slow_rate': 1.0, 'slow_latency': CLIENT_TIMEOUT + 1.0}),
+    ]
+    counter = itertools.count()
+    rows = []
+    with StubTranslationServer(latency=args.latency, jitter=args.latency / 2) as server:
+        for phase, faults in phases:
+            for variant in ('legacy', 'upstream'):
+                pool = TranslatorPool(base_url=server.base_url, timeout=CLIENT_TIMEOUT)
+                if variant == 'legacy':
+                    service = _LegacyTranslation(pool)
+                    translate = lambda i: service.translate(f'phrase {next(counter)}', 'en', 'es')
+                else:
+                    upstream = Upstream('translate', deadline=args.deadline, permanent=CLIENT_ERRORS)
+                    service = TranslationService(cache=TranslationCache(db_path=None), pool=pool, upstream=upstream)
+                    # Warm the latency window so hedging is active from the start
+                    server.set_faults()
+                    for _ in range(upstream.MIN_HEDGE_SAMPLES):
+                        service.translate(f'warmup {next(counter)}', 'en', 'es')
+                    translate = lambda i: service.translate(f'phrase {next(counter)}', 'en', 'es')
+
+                durations = []  # failed calls too: how long a caller waited either way
+
+                def timed(i):
+                    started = time.perf_counter()
+                    try:
+                        translate(i)
+                    finally:
+                        durations.append(time.perf_counter() - started)
+
+                server.set_faults(**faults)
+                server.reset_counters()
+                _, errors, elapsed = run_load(timed, args.requests, args.concurrency)
+                row = summarize(durations, elapsed)
+                row.update({'phase': phase, 'variant': variant, 'errors': len(errors),
+                            'upstream_requests': server.requests})
+                if variant == 'upstream':
+                    stats = upstream.stats()
+                    row.update({'hedges': stats['hedges'], 'rejected': stats['rejected'],
+                                'circuit': stats['circuit']})
+                rows.append(row)
+        server.set_faults()
+
+    print_table(rows, ['phase', 'variant', 'requests', 'errors', 'upstream_requests', 'hedges', 'rejected',
+                       'circuit', 'elapsed_s', 'p50_ms', 'p99_ms'])
+    print('p50/p99 include failed calls: the time a caller waited for an answer or an error')
+
+
+if __name__ == '__main__':
+    main()
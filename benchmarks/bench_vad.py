@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Speech-to-text latency with and without VAD trimming and chunking.
+
+A synthetic recording (tone bursts with pauses between them, plus leading and
+trailing silence) goes through VoiceService.speech_to_text against a stub
+recognizer whose latency grows with the audio it is sent, roughly like the
+hosted API. The 'whole' variant disables VAD, so the full recording is sent
+in one request as before.
+
+Run: python benchmarks/bench_vad.py [--seconds 120] [--silence 0.3] [--iterations 5]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import wave
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.harness import print_table, summarize
+import voice_service
+from voice_service import VoiceService
+from audio_cache import AudioCache
+
+RATE = 16000
+
+
+def make_recording(seconds, silence_fraction, seed=0):
+    """Alternating speech-like bursts and pauses; silence_fraction of the total is quiet."""
+    rng = np.random.default_rng(seed)
+    parts = [rng.standard_normal(RATE) * 30]
+    total = 1.0
+    while total < seconds:
+        burst = rng.uniform(2.0, 8.0)
+        t = np.arange(int(burst * RATE)) / float(RATE)
+        envelope = 0.6 + 0.4 * np.sin(2 * np.pi * rng.uniform(2, 5) * t)
+        parts.append(6000 * envelope * np.sin(2 * np.pi * rng.uniform(120, 260) * t))
+        pause = burst * silence_fraction / (1 - silence_fraction)
+        parts.append(rng.standard_normal(int(pause * RATE)) * 30)
+        total += burst + pause
+    samples = np.clip(np.concatenate(parts), -32768, 32767).astype('<i2')
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(samples.tobytes())
+    return buf.getvalue()
+
+
+def stub_recognizer(base, per_second):
+    def recognize_google(audio_data, language=None):
+        seconds = len(audio_data.frame_data) / float(audio_data.sample_rate * audio_data.sample_width)
+        time.sleep(base + per_second * seconds)
+        return 'words'
+    return recognize_google
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=120.0, help='recording duration')
+    parser.add_argument('--silence', type=float, default=0.3, help='fraction of the recording that is silent')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--base-latency', type=float, default=0.15, help='stub seconds per request')
+    parser.add_argument('--per-second', type=float, default=0.02, help='stub seconds per audio second')
+    args = parser.parse_args()
+
+    data = make_recording(args.seconds, args.silence)
+    rows = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        service = VoiceService(audio_cache=AudioCache(cache_dir))
+        service.recognizer.recognize_google = stub_recognizer(args.base_latency, args.per_second)
+        split = voice_service.split_for_recognition
+        for variant in ('whole', 'vad'):
+            voice_service.split_for_recognition = split if variant == 'vad' else (lambda s, r: [(0, len(s))])
+            latencies = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                result = service.speech_to_text(data)
+                latencies.append(time.perf_counter() - started)
+            stats = result['vad']
+            row = summarize(latencies)
+            row.update({'variant': variant, 'audio_s': stats['input_seconds'], 'sent_s': stats['speech_seconds'],
+                        'saved_s': stats['seconds_saved'], 'chunks': stats['chunks'],
+                        'max_chunk_ms': max(stats['chunk_latency_ms'])})
+            rows.append(row)
+        voice_service.split_for_recognition = split
+
+    print_table(rows, ['variant', 'audio_s', 'sent_s', 'saved_s', 'chunks', 'mean_ms', 'p50_ms', 'max_chunk_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-audio: sequential voice translation vs. the streaming pipeline.
+
+Every upstream is a local stand-in: translation goes to the stub translation
+server, and VoiceService's recognizer and gTTS synthesis are replaced with
+sleeps (synthesis time grows with the text length). The 'sequential' variant
+reproduces /api/voice/translate: recognize, translate the whole transcript,
+synthesize it, and only then return, so its first audio arrives at the end.
+The 'stream' variant drives voice_stream.stream_voice_translation and records
+when the first 'audio' event is yielded.
+
+Run: python benchmarks/bench_voice_stream.py [--sentences 6] [--iterations 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import print_table, summarize
+from benchmarks.stubs import StubTranslationServer
+from audio_cache import AudioCache
+from translation_cache import TranslationCache
+from translation_service import TranslationService
+from translator_pool import TranslatorPool
+from voice_service import VoiceService
+from voice_stream import stream_voice_translation
+
+SENTENCE = 'This is sentence number {i} of recording {run}, and it has a few more words in it.'
+
+
+def stub_voice(cache_dir, stt_latency, tts_base, tts_per_char):
+    service = VoiceService(audio_cache=AudioCache(cache_dir))
+    transcript = {}
+
+    def speech_to_text(audio, language='en'):
+        time.sleep(stt_latency)
+        return {'text': transcript['text'], 'language': language}
+
+    def synthesize(text, language, slow):
+        time.sleep(tts_base + tts_per_char * len(text))
+        return b'ID3' + text.encode('utf-8')
+
+    service.speech_to_text = speech_to_text
+    service._synthesize = synthesize
+    return service, transcript
+
+
+def run_sequential(voice, translation, target):
+    started = time.perf_counter()
+    speech = voice.speech_to_text(b'', language='en')
+    text = translation.translate(text=speech['text'], src_lang='en', dest_lang=target)['translated_text']
+    voice.text_to_speech(text, language=target)
+    total = time.perf_counter() - started
+    return total, total
+
+
+def run_stream(voice, translation, target):
+    started = time.perf_counter()
+    first_audio = None
+    for event, _ in stream_voice_translation(voice, translation, b'', source_lang='en', target_lang=target):
+        if event == 'audio' and first_audio is None:
+            first_audio = time.perf_counter() - started
+    return first_audio, time.perf_counter() - started
+
+
+VARIANTS = {'sequential': run_sequential, 'stream': run_stream}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sentences', type=int, default=6)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--stt-latency', type=float, default=0.5)
+    parser.add_argument('--mt-latency', type=float, default=0.15, help='stub translation latency per call')
+    parser.add_argument('--tts-base', type=float, default=0.25, help='stub synthesis seconds per call')
+    parser.add_argument('--tts-per-char', type=float, default=0.004)
+    args = parser.parse_args()
+
+    rows = []
+    with StubTranslationServer(latency=args.mt_latency) as stub, tempfile.TemporaryDirectory() as workdir:
+        translation = TranslationService(cache=TranslationCache(db_path=os.path.join(workdir, 'cache.db')),
+                                         pool=TranslatorPool(base_url=stub.base_url))
+        voice, transcript = stub_voice(os.path.join(workdir, 'tts'), args.stt_latency,
+                                       args.tts_base, args.tts_per_char)
+        for variant, fn in VARIANTS.items():
+            first, totals = [], []
+            for run in range(args.iterations):
+                # Fresh text every run so neither cache short-circuits the upstreams
+                transcript['text'] = ' '.join(SENTENCE.format(i=i, run=f'{variant}-{run}')
+                                              for i in range(args.sentences))
+                ttfa, total = fn(voice, translation, 'es')
+                first.append(ttfa)
+                totals.append(total)
+            row = {'variant': variant, 'sentences': args.sentences}
+            row.update({'ttfa_' + k: v for k, v in summarize(first).items() if k.endswith('_ms')})
+            row['total_mean_ms'] = summarize(totals)['mean_ms']
+            rows.append(row)
+
+    print_table(rows, ['variant', 'sentences', 'ttfa_mean_ms', 'ttfa_p50_ms', 'ttfa_p95_ms', 'total_mean_ms'])
+
+
+if __name__ == '__main__':
+    main()
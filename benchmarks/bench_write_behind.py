@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Conversation message throughput: one commit per message vs. write-behind batches.
+
+`--writers` threads add messages through ConversationService.add_message with
+an instant stub translator, so the database write dominates. Each variant
+runs on its own fresh database. After the run the service is closed, then
+the stored row count is checked against the number acknowledged. A second
+check reads each session's history straight after writing it, confirming
+read-your-writes with the queue on.
+
+Run: python benchmarks/bench_write_behind.py [--writers 16] [--messages 2000]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_storage import _StubTranslation
+from benchmarks.harness import print_table, run_load, summarize
+from conversation_service import ConversationService
+from storage import Storage
+
+SESSIONS = 64
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--messages', type=int, default=2000, help='messages per writer')
+    args = parser.parse_args()
+
+    rows = []
+    cwd = os.getcwd()
+    for variant in ('per-message', 'write-behind'):
+        with tempfile.TemporaryDirectory() as workdir:
+            # ConversationService's own TranslationService opens translator.db in the cwd
+            os.chdir(workdir)
+            db_path = os.path.join(workdir, 'conversations.db')
+            service = ConversationService(storage=Storage(db_path), write_behind=(variant == 'write-behind'))
+            service.translation_service = _StubTranslation(0)
+            for s in range(SESSIONS):
+                service.start_conversation(f'session-{s}', 'en-es')
+
+            def write(i):
+                service.add_message(f'session-{i % SESSIONS}', f'message {i}', 'a_to_b')
+
+            latencies, errors, elapsed = run_load(write, args.writers * args.messages, args.writers)
+
+            # Read-your-writes: a message is in the history as soon as add_message returns
+            stale = 0
+            for s in range(SESSIONS):
+                service.add_message(f'session-{s}', f'check {s}', 'b_to_a')
+                if service.get_history_page(f'session-{s}', limit=None)['messages'][-1]['original'] != f'check {s}':
+                    stale += 1
+
+            flushes = service.message_writer.stats()['flushes'] if service.message_writer else None
+            if service.message_writer:
+                service.message_writer.close()
+            service.storage.close()
+            conn = sqlite3.connect(db_path)
+            stored = conn.execute('SELECT COUNT(*) FROM conversation_messages').fetchone()[0]
+            conn.close()
+            os.chdir(cwd)
+        row = summarize(latencies, elapsed)
+        row.update({'variant': variant, 'writers': args.writers, 'errors': len(errors), 'flushes': flushes,
+                    'acked': len(latencies) + SESSIONS, 'stored': stored, 'stale_reads': stale})
+        rows.append(row)
+
+    print_table(rows, ['variant', 'writers', 'requests', 'errors', 'acked', 'stored', 'flushes', 'stale_reads',
+                       'rps', 'p50_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Timing helpers shared by the benchmark scripts.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Repository root, for scripts that launch the backend in a subprocess
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed=None):
+    """Summarize a list of per-request latencies (seconds) as milliseconds."""
+    count = len(latencies)
+    summary = {
+        'requests': count,
+        'mean_ms': (sum(latencies) / count * 1000) if count else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+    if elapsed:
+        summary['elapsed_s'] = elapsed
+        summary['rps'] = count / elapsed
+    return summary
+
+
+def run_load(fn, requests, concurrency=1):
+    """
+    Call fn(i) for i in range(requests) from `concurrency` threads
+
+    Returns:
+        tuple: (latencies, errors, elapsed seconds)
+    """
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def one(i):
+        started = time.perf_counter()
+        try:
+            fn(i)
+        except Exception as e:
+            with lock:
+                errors.append(e)
+            return
+        took = time.perf_counter() - started
+        with lock:
+            latencies.append(took)
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        for i in range(requests):
+            one(i)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(requests)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def print_table(rows, columns):
+    widths = [max(len(str(c)), *(len(_fmt(r.get(c))) for r in rows)) for c in columns]
+    print('  '.join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(_fmt(row.get(c)).ljust(w) for c, w in zip(columns, widths)))
+
+
+def _fmt(value):
+    if isinstance(value, float):
+        return f'{value:.2f}'
+    return '' if value is None else str(value)
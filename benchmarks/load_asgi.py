@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Load test: Flask app (app.py) vs. the async serving mode (asgi_app.py).
+
+Each server runs in its own subprocess with the translator pointed at a local
+stub translation server (TRANSLATOR_BASE_URL), in a scratch working directory
+so translator.db doesn't touch the repo. The driver then POSTs unique texts to
+/api/translate from `--concurrency` client threads and reports requests/sec
+and tail latency.
+
+Run: python benchmarks/load_asgi.py [--requests 2000] [--concurrency 64] [--latency 0.1]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from benchmarks.harness import ROOT, print_table, run_load, summarize
+from benchmarks.stubs import StubTranslationServer
+
+
+def serve(mode, port):
+    if mode == 'flask':
+        from app import app
+        app.run(host='127.0.0.1', port=port, threaded=True)
+    else:
+        import asyncio
+        from hypercorn.asyncio import serve as hypercorn_serve
+        from hypercorn.config import Config
+        from asgi_app import app
+        config = Config()
+        config.bind = [f'127.0.0.1:{port}']
+        config.accesslog = None
+        asyncio.run(hypercorn_serve(app, config))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f'server at {url} did not start')
+
+
+def start_server(mode, stub_url, workdir):
+    port = free_port()
+    pythonpath = os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))
+    env = dict(os.environ, TRANSLATOR_BASE_URL=stub_url, PYTHONPATH=pythonpath)
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(port)],
+                            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    try:
+        wait_for(base + '/api/languages')
+    except RuntimeError:
+        proc.kill()
+        raise
+    return proc, base
+
+
+def drive(base, requests_count, concurrency, tag):
+    local = threading.local()
+
+    def call(i):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        resp = session.post(base + '/api/translate', timeout=60,
+                            json={'text': f'load test phrase {tag} {i}', 'source_lang': 'en', 'target_lang': 'es'})
+        if resp.status_code != 200:
+            raise RuntimeError(resp.status_code)
+
+    return run_load(call, requests_count, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--serve', choices=['flask', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.1, help='stub upstream latency in seconds')
+    parser.add_argument('--modes', default='flask,asgi')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    rows = []
+    with StubTranslationServer(latency=args.latency) as stub:
+        for mode in args.modes.split(','):
+            with tempfile.TemporaryDirectory() as workdir:
+                proc, base = start_server(mode, stub.base_url, workdir)
+                try:
+                    drive(base, min(50, args.requests), args.concurrency, 'warmup-' + mode)
+                    stub.reset_counters()
+                    latencies, errors, elapsed = drive(base, args.requests, args.concurrency, mode)
+                finally:
+                    proc.terminate()
+                    proc.wait(timeout=10)
+            row = summarize(latencies, elapsed)
+            row.update({'mode': mode, 'concurrency': args.concurrency, 'errors': len(errors),
+                        'upstream_calls': stub.requests})
+            rows.append(row)
+
+    print_table(rows, ['mode', 'concurrency', 'requests', 'errors', 'upstream_calls',
+                       'rps', 'p50_ms', 'p95_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Load test for in-flight coalescing of identical translation requests.
+
+Each burst releases `--clients` threads at once, all asking for the same new
+phrase, against a slow local stub translation server. The run is repeated with
+coalescing disabled, and the stub's request count shows how many upstream
+calls each variant made.
+
+Run: python benchmarks/load_single_flight.py [--bursts 20] [--clients 50]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import print_table, summarize
+from benchmarks.stubs import StubTranslationServer
+from translation_cache import TranslationCache
+from translation_service import TranslationService
+from translator_pool import TranslatorPool
+
+
+class _NoCoalescing:
+    """Stands in for SingleFlight so every caller goes upstream."""
+
+    def do(self, key, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    def stats(self):
+        return {}
+
+
+def run_bursts(service, bursts, clients, tag):
+    latencies = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    for b in range(bursts):
+        barrier = threading.Barrier(clients)
+        phrase = f'popular phrase {tag} {b}'
+
+        def client():
+            barrier.wait()
+            t0 = time.perf_counter()
+            service.translate(phrase, 'en', 'es')
+            with lock:
+                latencies.append(time.perf_counter() - t0)
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    return latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bursts', type=int, default=20)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.2, help='stub latency in seconds')
+    args = parser.parse_args()
+
+    rows = []
+    with StubTranslationServer(latency=args.latency) as stub:
+        pool = TranslatorPool(base_url=stub.base_url, pool_maxsize=args.clients)
+        for name in ('uncoalesced', 'single-flight'):
+            service = TranslationService(cache=TranslationCache(db_path=None), pool=pool)
+            if name == 'uncoalesced':
+                service.inflight = _NoCoalescing()
+            stub.reset_counters()
+            latencies, elapsed = run_bursts(service, args.bursts, args.clients, name)
+            row = summarize(latencies, elapsed)
+            row.update({'variant': name, 'upstream_calls': stub.requests,
+                        'collapsed': service.inflight_stats().get('collapsed', 0)})
+            rows.append(row)
+        pool.close()
+
+    print_table(rows, ['variant', 'requests', 'upstream_calls', 'collapsed', 'p50_ms', 'p99_ms', 'rps'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+Local stand-ins for the remote providers, used by the benchmark scripts.
+
+Each server adds configurable latency: a fixed part, uniform jitter, or a
+lognormal spread around the median (`sigma`), plus injected tail latency
+and HTTP 503 errors (set_faults).
+"""
+
+import base64
+import html
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler, latency=0.0, jitter=0.0, sigma=0.0):
+        super().__init__(address, handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.sigma = sigma
+        # Fault injection, changeable while serving: see StubTranslationServer.set_faults
+        self.error_rate = 0.0
+        self.slow_rate = 0.0
+        self.slow_latency = 0.0
+        self.requests = 0
+        self.connections = 0
+        self.counter_lock = threading.Lock()
+
+    def count(self, name):
+        with self.counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def simulate_latency(self):
+        delay = self.latency * random.lognormvariate(0, self.sigma) if self.sigma else self.latency
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)
+        if self.slow_rate and random.random() < self.slow_rate:
+            delay += self.slow_latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up (timeouts, hedged calls) close the socket mid-response
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def inject_error(self):
+        return bool(self.error_rate) and random.random() < self.error_rate
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep the connection alive between requests
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; without this, Nagle plus
+    # delayed ACKs add ~40ms to every response on a reused connection
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def begin(self):
+        """Count the request and apply latency; False if an injected error was sent instead."""
+        self.server.count('requests')
+        self.server.simulate_latency()
+        if self.server.inject_error():
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return False
+        return True
+
+    def reply(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _TranslateHandler(_StubHandler):
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        text = query.get('q', [''])[0]
+        target = query.get('tl', ['en'])[0]
+        if not self.begin():
+            return
+        # Each line is translated on its own, as the provider does with a '\n'-packed batch
+        translated = '\n'.join(f'[{target}] {line}' for line in text.split('\n'))
+        body = (f'<html><body><div class="result-container">'
+                f'{html.escape(translated)}</div></body></html>').encode('utf-8')
+        self.reply(body, 'text/html; charset=utf-8')
+
+
+class _SpeechHandler(_StubHandler):
+    def do_POST(self):
+        audio = self.read_body()
+        if not self.begin():
+            return
+        result = {'result': [{'alternative': [{'transcript': self.server.transcript, 'confidence': 0.9}],
+                              'final': True}], 'result_index': 0}
+        # The v2 API streams an empty result first, then the transcript
+        body = ('{"result":[]}\n' + json.dumps(result) + '\n').encode('utf-8')
+        self.reply(body if audio else b'{"result":[]}\n', 'application/json; charset=utf-8')
+
+
+class _TTSHandler(_StubHandler):
+    def do_POST(self):
+        request = self.read_body()
+        if not self.begin():
+            return
+        # Clip size grows with the text, like real speech; content is filler
+        audio = b'ID3' + bytes(self.server.bytes_per_char * max(1, len(request) // 4))
+        clip = base64.b64encode(audio).decode('ascii')
+        body = f')]}}\'\n\n[["wrb.fr","jQ1olc","[\\"{clip}\\"]",null,null,null,"generic"]]\n'
+        self.reply(body.encode('utf-8'), 'application/json; charset=utf-8')
+
+
+class _StubServer:
+    handler = None
+
+    def __init__(self, latency=0.0, jitter=0.0, sigma=0.0, host='127.0.0.1', port=0):
+        """
+        Args:
+            latency: Seconds added to every request; the median when `sigma` is set
+            jitter: Extra uniformly random seconds, up to this much
+            sigma: Spread of a lognormal latency distribution around `latency`
+        """
+        self.httpd = _StubHTTPServer((host, port), self.handler, latency=latency, jitter=jitter, sigma=sigma)
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    @property
+    def connections(self):
+        return self.httpd.connections
+
+    def set_faults(self, error_rate=0.0, slow_rate=0.0, slow_latency=0.0):
+        """
+        Inject faults into the following requests
+
+        Args:
+            error_rate: Share of requests answered with HTTP 503
+            slow_rate: Share of requests delayed by an extra `slow_latency` seconds
+            slow_latency: Extra delay for slow requests, in seconds
+        """
+        self.httpd.error_rate = error_rate
+        self.httpd.slow_rate = slow_rate
+        self.httpd.slow_latency = slow_latency
+
+    def reset_counters(self):
+        with self.httpd.counter_lock:
+            self.httpd.requests = 0
+            self.httpd.connections = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StubTranslationServer(_StubServer):
+    """
+    Serves the same HTML shape as translate.google.com/m, echoing each line
+    of the input prefixed with the target language, e.g. 'hello' -> '[es] hello'
+    and 'a\\nb' -> '[es] a\\n[es] b'.
+    """
+    handler = _TranslateHandler
+
+    @property
+    def base_url(self):
+        return self.address + '/m'
+
+
+class StubSpeechServer(_StubServer):
+    """
+    Answers like Google's speech API v2 with a fixed transcript; point
+    VoiceService at it with SPEECH_RECOGNITION_ENDPOINT=<base_url>.
+    """
+    handler = _SpeechHandler
+
+    def __init__(self, transcript='Hello from the stub recognizer. This is a second sentence.', **options):
+        super().__init__(**options)
+        self.httpd.transcript = transcript
+
+    @property
+    def base_url(self):
+        return self.address + '/speech-api/v2/recognize'
+
+
+class StubTTSServer(_StubServer):
+    """
+    Answers gTTS' batchexecute requests with a filler clip; see redirect_gtts.
+    """
+    handler = _TTSHandler
+
+    def __init__(self, bytes_per_char=200, **options):
+        super().__init__(**options)
+        self.httpd.bytes_per_char = bytes_per_char
+
+    @property
+    def base_url(self):
+        return self.address
+
+
+def redirect_gtts(base_url):
+    """Send gTTS requests made in this process to `base_url` instead of translate.google.com."""
+    import gtts.tts
+    gtts.tts._translate_url = lambda tld='com', path='': f'{base_url}/{path}'
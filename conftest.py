@@ -0,0 +1,10 @@
+"""Shared pytest setup: every test runs in its own scratch directory with default settings."""
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def default_settings(tmp_path, monkeypatch):
+    # The apps keep translator.db, tts_cache/ and job_inputs/ in the working directory
+    monkeypatch.chdir(tmp_path)
+    for name in ('APP_FEATURES', 'APP_PRELOAD'):
+        monkeypatch.delenv(name, raising=False)
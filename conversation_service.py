@@ -3,16 +3,83 @@ Conversation Service for real-time bidirectional translation
 Manages conversation sessions and message history
 """
 
-import sqlite3
+import base64
+import hashlib
+import os
 from datetime import datetime
 try:
     from .translation_service import TranslationService
+    from .storage import get_default_storage
+    from .write_behind import WriteBehindWriter
+    from .session_registry import SessionRegistry, parse_language_pair
+    from .corpus_index import get_default_corpus
+    from .metrics import span
 except Exception:
     from translation_service import TranslationService
+    from storage import get_default_storage
+    from write_behind import WriteBehindWriter
+    from session_registry import SessionRegistry, parse_language_pair
+    from corpus_index import get_default_corpus
+    from metrics import span
+
+INSERT_MESSAGE = '''
+    INSERT INTO conversation_messages
+    (conversation_id, message_text, translated_text, direction, timestamp)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+
+def encode_cursor(message_id):
+    """
+    Opaque keyset cursor for the message with this id
+
+    Pages are keyed on the AUTOINCREMENT id alone: writers allocate it inside
+    their write transaction, so ids follow commit order. Timestamps are taken
+    before the insert and can commit out of order, which would let a poller
+    step past a message it never saw.
+    """
+    return base64.urlsafe_b64encode(str(message_id).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Inverse of encode_cursor; also takes the older "timestamp|id" cursors
+
+    Returns:
+        int: Message id
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        return int(raw.rsplit('|', 1)[-1])
+    except Exception:
+        raise ValueError(f"Invalid history cursor: {cursor}")
+
 
 class ConversationService:
-    def __init__(self):
-        self.translation_service = TranslationService()
+    # Page size used when a caller paginates without giving a limit
+    DEFAULT_PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 1000
+
+    def __init__(self, storage=None, write_behind=None, corpus=None, translation_service=None):
+        """
+        Args:
+            storage: Storage to use (defaults to the shared translator.db)
+            write_behind: Acknowledge messages before they are written and insert
+                them in batches; defaults to the CONVERSATION_WRITE_BEHIND env var
+            corpus: CorpusIndex each message is counted into (defaults to the shared one)
+            translation_service: TranslationService for messages; pass the app's
+                so they share one cache (defaults to a new one)
+        """
+        self.translation_service = translation_service if translation_service is not None else TranslationService()
+        self.storage = storage if storage is not None else get_default_storage()
+        if write_behind is None:
+            write_behind = os.environ.get('CONVERSATION_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+        self.message_writer = WriteBehindWriter(self.storage, INSERT_MESSAGE) if write_behind else None
+        self.sessions = SessionRegistry()
+        self.corpus = corpus if corpus is not None else get_default_corpus()
     
     def start_conversation(self, session_id, language_pair):
         """
@@ -23,14 +90,13 @@ class ConversationService:
             language_pair: Language pair (e.g., 'en-es')
         """
         try:
-            conn = sqlite3.connect('translator.db')
-            c = conn.cursor()
-            c.execute('''
-                INSERT OR REPLACE INTO conversations (session_id, language_pair)
-                VALUES (?, ?)
-            ''', (session_id, language_pair))
-            conn.commit()
-            conn.close()
+            languages = self._normalize_languages(language_pair)
+            with span('db', query='start_conversation'), self.storage.transaction() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO conversations (session_id, language_pair)
+                    VALUES (?, ?)
+                ''', (session_id, language_pair))
+            self.sessions.put(session_id, languages)
         except Exception as e:
             raise Exception(f"Error starting conversation: {str(e)}")
     
@@ -48,16 +114,7 @@ class ConversationService:
         """
         try:
             # Get language pair from conversation
-            conn = sqlite3.connect('translator.db')
-            c = conn.cursor()
-            c.execute('SELECT language_pair FROM conversations WHERE session_id = ?', (session_id,))
-            result = c.fetchone()
-            
-            if not result:
-                raise Exception("Conversation session not found")
-            
-            language_pair = result[0]
-            lang_a, lang_b = language_pair.split('-')
+            lang_a, lang_b = self._session_languages(session_id)
             
             # Determine translation direction
             if direction == 'a_to_b':
@@ -67,7 +124,7 @@ class ConversationService:
                 source_lang = lang_b
                 target_lang = lang_a
             
-            # Translate message
+            # Translate message, outside any transaction so writers don't queue behind the network
             translation_result = self.translation_service.translate(
                 text=message,
                 src_lang=source_lang,
@@ -78,14 +135,14 @@ class ConversationService:
             timestamp = datetime.now().isoformat()
             
             # Save message to database
-            c.execute('''
-                INSERT INTO conversation_messages 
-                (conversation_id, message_text, translated_text, direction, timestamp)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (session_id, message, translated_message, direction, timestamp))
-            
-            conn.commit()
-            conn.close()
+            row = (session_id, message, translated_message, direction, timestamp)
+            if self.message_writer is not None:
+                self.message_writer.enqueue(session_id, row)
+            else:
+                with span('db', query='insert_message'), self.storage.transaction() as conn:
+                    conn.execute(INSERT_MESSAGE, row)
+            # Conversation messages feed the keyword ranking's document frequencies
+            self.corpus.add_text(message)
             
             return {
                 'translated_message': translated_message,
@@ -98,44 +155,118 @@ class ConversationService:
     def get_history(self, session_id):
         """
         Get conversation history
-        
+
         Args:
             session_id: Conversation session ID
-        
+
         Returns:
             list: Conversation messages
         """
+        return self.get_history_page(session_id)['messages']
+
+    def get_history_page(self, session_id, after=None, limit=None):
+        """
+        Get conversation messages in the order they were stored, one keyset page at a time
+
+        Args:
+            session_id: Conversation session ID
+            after: Cursor of the last message already seen; only later messages are returned
+            limit: Maximum messages to return, or None for all of them
+
+        Returns:
+            dict: 'messages', 'next_cursor' (cursor of the last message returned,
+            or `after` if there were none) and 'has_more'
+
+        Raises:
+            ValueError: If `after` is not a valid cursor
+        """
+        position = decode_cursor(after) if after else None
         try:
-            conn = sqlite3.connect('translator.db')
-            c = conn.cursor()
-            c.execute('''
-                SELECT message_text, translated_text, direction, timestamp
+            self._sync_session(session_id)
+            query = '''
+                SELECT id, message_text, translated_text, direction, timestamp
                 FROM conversation_messages
                 WHERE conversation_id = ?
-                ORDER BY timestamp ASC
-            ''', (session_id,))
-            
-            rows = c.fetchall()
-            conn.close()
-            
+            '''
+            params = [session_id]
+            if position is not None:
+                query += ' AND id > ?'
+                params.append(position)
+            query += ' ORDER BY id ASC'
+            if limit is not None:
+                # One extra row tells us whether another page follows
+                query += ' LIMIT ?'
+                params.append(limit + 1)
+
+            with span('db', query='history_page'), self.storage.connection() as conn:
+                rows = conn.execute(query, params).fetchall()
+
+            has_more = limit is not None and len(rows) > limit
+            if has_more:
+                rows = rows[:limit]
+
             history = []
             for row in rows:
                 history.append({
-                    'original': row[0],
-                    'translated': row[1],
-                    'direction': row[2],
-                    'timestamp': row[3]
+                    'original': row[1],
+                    'translated': row[2],
+                    'direction': row[3],
+                    'timestamp': row[4]
                 })
-            
-            return history
-        
-        except Exception as e:
-            raise Exception(f"Error getting history: {str(e)}")
 
+            next_cursor = encode_cursor(rows[-1][0]) if rows else after
+            return {'messages': history, 'next_cursor': next_cursor, 'has_more': has_more}
 
+        except Exception as e:
+            raise Exception(f"Error getting history: {str(e)}")
 
+    def latest_cursor(self, session_id):
+        """
+        Cursor of the session's newest message, read from the index alone
 
+        Returns:
+            str: Cursor, or None if the session has no messages
+        """
+        try:
+            self._sync_session(session_id)
+            with span('db', query='latest_cursor'), self.storage.connection() as conn:
+                row = conn.execute('''
+                    SELECT MAX(id) FROM conversation_messages
+                    WHERE conversation_id = ?
+                ''', (session_id,)).fetchone()
+            return encode_cursor(row[0]) if row[0] is not None else None
+        except Exception as e:
+            raise Exception(f"Error getting history: {str(e)}")
 
+    def history_etag(self, session_id, after=None, limit=None):
+        """
+        Validator for a history response: changes whenever the session gets a
+        new message, without reading the messages themselves
+        """
+        latest = self.latest_cursor(session_id)
+        return hashlib.sha1(f"{latest}|{after}|{limit}".encode('utf-8')).hexdigest()
 
+    def _session_languages(self, session_id):
+        # Normalized (lang_a, lang_b), from the registry or loaded into it on a miss
+        languages = self.sessions.get(session_id)
+        if languages is not None:
+            return languages
+        with span('db', query='session_languages'), self.storage.connection() as conn:
+            result = conn.execute('SELECT language_pair FROM conversations WHERE session_id = ?',
+                                  (session_id,)).fetchone()
+        if not result:
+            raise Exception("Conversation session not found")
+        languages = self._normalize_languages(result[0])
+        self.sessions.put(session_id, languages)
+        return languages
 
+    def _normalize_languages(self, language_pair):
+        lang_a, lang_b = parse_language_pair(language_pair)
+        normalize = self.translation_service._normalize_code
+        return normalize(lang_a), normalize(lang_b)
 
+    def _sync_session(self, session_id):
+        # Read-your-writes: queued messages for this session are written before it is read
+        if self.message_writer is not None:
+            with span('db', query='write_behind_sync'):
+                self.message_writer.sync(session_id)
@@ -0,0 +1,194 @@
+"""
+Corpus-wide document frequencies for keyword ranking.
+
+Every text that passes through keyword and flashcard extraction, plus each
+conversation message, is counted as one document. For each word the index
+keeps the number of documents containing it (its document frequency, DF).
+Keywords are then ranked by BM25, which favours words frequent in the
+document at hand but rare across the corpus, instead of by raw frequency.
+
+Frequencies live in a growable int32 array indexed by term id, and scoring
+is vectorized over a document's whole vocabulary. The index is snapshotted
+to an .npz file at most every `snapshot_interval` seconds, and at exit. Each
+process keeps its own counts; with several workers the last snapshot
+written wins, which is fine for statistics that only steer ranking.
+"""
+
+import atexit
+import itertools
+import os
+import threading
+import time
+
+import numpy as np
+
+try:
+    from .text_analysis import WORD
+except Exception:
+    from text_analysis import WORD
+
+# BM25 term-frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+
+class CorpusIndex:
+    def __init__(self, path=None, snapshot_interval=60.0, max_terms=500000):
+        """
+        Args:
+            path: .npz snapshot loaded at start and rewritten periodically (None keeps it in memory)
+            snapshot_interval: Fewest seconds between snapshots
+            max_terms: Vocabulary size after which new words are no longer tracked
+        """
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.max_terms = max_terms
+        self.vocabulary = {}  # word -> term id
+        self.words = []  # term id -> word
+        self.documents = 0
+        self.total_length = 0  # words across all documents, for the average length
+        self._df = np.zeros(1024, dtype=np.int32)
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._dirty = False
+        self._last_snapshot = time.monotonic()
+        if path and os.path.exists(path):
+            self._load(path)
+        if path:
+            atexit.register(self.snapshot)
+
+    def add_document(self, words, length):
+        """
+        Count one document
+
+        Args:
+            words: The document's distinct words, lowercased
+            length: Number of words in the document, repeats included
+        """
+        with self._lock:
+            new = [w for w in words if w not in self.vocabulary]
+            room = self.max_terms - len(self.words)
+            if new and room > 0:
+                new = new[:room]
+                self.vocabulary.update(zip(new, range(len(self.words), len(self.words) + len(new))))
+                self.words.extend(new)
+                if len(self.words) > len(self._df):
+                    grown = np.zeros(max(len(self.words), 2 * len(self._df)), dtype=np.int32)
+                    grown[:len(self._df)] = self._df
+                    self._df = grown
+            ids = self._ids(words)
+            self._df[ids[ids >= 0]] += 1
+            self.documents += 1
+            self.total_length += length
+            self._dirty = True
+            due = time.monotonic() - self._last_snapshot >= self.snapshot_interval
+        if due and self.path:
+            self.snapshot()
+
+    def add_text(self, text):
+        """Tokenize and count one short text, such as a conversation message."""
+        words = WORD.findall(text.lower())
+        if words:
+            self.add_document(set(words), len(words))
+
+    def add_index(self, index):
+        """Count a document already tokenized into a text_analysis.DocumentIndex."""
+        if index.word_count:
+            self.add_document(index.words, index.word_count)
+
+    def document_frequency(self, words):
+        """Number of documents containing each word, as an array"""
+        with self._lock:
+            ids = self._ids(words)
+            return np.where(ids >= 0, self._df[np.maximum(ids, 0)], 0)
+
+    def bm25(self, words, counts, length):
+        """
+        BM25 weight of each word within one document
+
+        Args:
+            words: The document's distinct words
+            counts: Occurrences of each word in the document (array aligned with words)
+            length: Number of words in the document
+
+        Returns:
+            numpy.ndarray: One score per word; 0 for words that never occur
+        """
+        df = self.document_frequency(words)
+        with self._lock:
+            documents, total_length = self.documents, self.total_length
+        idf = np.log1p((documents - df + 0.5) / (df + 0.5))
+        average = total_length / documents if documents else max(length, 1)
+        tf = np.asarray(counts, dtype=np.float64)
+        return idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / average))
+
+    def stats(self):
+        with self._lock:
+            return {'documents': self.documents, 'terms': len(self.words),
+                    'average_length': self.total_length / self.documents if self.documents else 0.0}
+
+    def snapshot(self):
+        """Write the index to `path` if it changed since the last snapshot."""
+        if not self.path:
+            return
+        with self._snapshot_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                words = '\n'.join(self.words).encode('utf-8')
+                df = self._df[:len(self.words)].copy()
+                header = np.array([self.documents, self.total_length], dtype=np.int64)
+                self._dirty = False
+                self._last_snapshot = time.monotonic()
+            # Written aside and renamed so a crash never leaves a torn snapshot
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'wb') as f:
+                    np.savez(f, words=np.frombuffer(words, dtype=np.uint8), df=df, header=header)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"Corpus index snapshot error: {e}")
+                with self._lock:
+                    self._dirty = True
+
+    def _load(self, path):
+        try:
+            with np.load(path) as data:
+                words = data['words'].tobytes().decode('utf-8')
+                df = data['df']
+                documents, total_length = (int(v) for v in data['header'])
+        except Exception as e:
+            print(f"Corpus index snapshot unreadable, starting empty: {e}")
+            return
+        self.words = words.split('\n') if words else []
+        self.vocabulary = {w: i for i, w in enumerate(self.words)}
+        self._df = np.zeros(max(1024, 2 * len(self.words)), dtype=np.int32)
+        self._df[:len(df)] = df
+        self.documents = documents
+        self.total_length = total_length
+
+    def _ids(self, words):
+        """Term ids of `words`, -1 where untracked; call with the lock held"""
+        return np.fromiter(map(self.vocabulary.get, words, itertools.repeat(-1)), dtype=np.int64)
+
+
+_default_corpora = {}
+_default_corpora_lock = threading.Lock()
+
+
+def get_default_corpus(path=None):
+    """
+    Process-wide CorpusIndex per snapshot file, shared by every service
+
+    Args:
+        path: Snapshot file; defaults to CORPUS_INDEX_PATH, else corpus_index.npz
+            in the working directory, next to translator.db
+    """
+    if path is None:
+        path = os.environ.get('CORPUS_INDEX_PATH', 'corpus_index.npz')
+    key = os.path.abspath(path)
+    with _default_corpora_lock:
+        corpus = _default_corpora.get(key)
+        if corpus is None:
+            corpus = _default_corpora[key] = CorpusIndex(path)
+        return corpus
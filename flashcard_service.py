@@ -0,0 +1,111 @@
+"""
+Flashcard Service for vocabulary practice
+Extracts keywords from free text and turns them into cloze-style flashcards
+"""
+
+import base64
+from concurrent.futures import wait
+
+try:
+    from .corpus_index import get_default_corpus
+    from .text_analysis import DocumentIndex, cloze, index_document
+except Exception:
+    from corpus_index import get_default_corpus
+    from text_analysis import DocumentIndex, cloze, index_document
+
+
+class FlashcardService:
+    # Seconds a request waits for card audio before returning without it
+    AUDIO_DEADLINE = 5.0
+    AUDIO_URL_PREFIX = '/api/tts/'
+
+    def __init__(self, voice_service, corpus=None):
+        """
+        Args:
+            voice_service: VoiceService used for card audio, or a no-argument
+                callable returning it, called on the first card that needs audio
+                (so keyword extraction never loads the speech libraries)
+            corpus: CorpusIndex keywords are ranked against (defaults to the shared one)
+        """
+        self._voice_service = voice_service
+        self.corpus = corpus if corpus is not None else get_default_corpus()
+
+    @property
+    def voice_service(self):
+        if callable(self._voice_service):
+            self._voice_service = self._voice_service()
+        return self._voice_service
+
+    @staticmethod
+    def _index(text, language):
+        if isinstance(text, DocumentIndex):
+            return text
+        return index_document(text, language=language)
+
+    def _ranked_words(self, index, limit, min_length):
+        """Count the document into the corpus, then rank its words by BM25 against it"""
+        self.corpus.add_index(index)
+        weights = self.corpus.bm25(index.words, index.term_counts(), index.word_count)
+        return index.top_words(limit, min_length=min_length, weights=weights)
+
+    def extract_keywords(self, text, limit=5, language='en'):
+        """
+        Extract the words most distinctive of the text
+
+        Words are ranked by BM25: frequent in this text, rare across the
+        texts seen before it.
+
+        Args:
+            text: Source text, text chunks, or a DocumentIndex
+            limit: Number of keywords to return
+            language: Language whose stopwords are skipped
+
+        Returns:
+            list: Keywords, best first
+        """
+        return self._ranked_words(self._index(text, language), limit, min_length=3)
+
+    def generate_flashcards(self, text, language='en', deadline=None, defer_audio=False, inline_audio=True):
+        """
+        Build flashcards that blank out a keyword in a sentence using it
+
+        Card audio is synthesized concurrently on the voice service's TTS
+        pool. Cards whose audio misses the deadline come back with
+        'audio_base64' set to None; every card carries an 'audio_url' that
+        serves the audio once it's ready.
+
+        Args:
+            text: Source text, text chunks, or a DocumentIndex
+            language: Language of the text, used for stopwords and card audio
+            deadline: Seconds to wait for audio (defaults to AUDIO_DEADLINE)
+            defer_audio: Return immediately and leave all audio to 'audio_url'
+            inline_audio: Include 'audio_base64'; with False, still wait for the
+                audio but return only 'audio_url' (for callers that store the cards)
+
+        Returns:
+            list: Flashcards with 'front', 'back', 'audio_base64' (unless
+            inline_audio is False) and 'audio_url'
+        """
+        index = self._index(text, language)
+        cards = []
+        for w in self._ranked_words(index, 8, min_length=4):
+            # Every indexed word has a sentence in the index
+            front = cloze(index.first_sentence(w), w)
+            back = w
+            key, future = self.voice_service.text_to_speech_async(front, language=language)
+            cards.append((front, back, key, future))
+
+        if not defer_audio and cards:
+            wait([future for _, _, _, future in cards],
+                 timeout=self.AUDIO_DEADLINE if deadline is None else deadline)
+
+        flashcards = []
+        for front, back, key, future in cards:
+            card = {'front': front, 'back': back, 'audio_url': self.AUDIO_URL_PREFIX + key}
+            if inline_audio:
+                audio_b64 = None
+                if not defer_audio and future.done() and future.exception() is None and future.result():
+                    audio_b64 = base64.b64encode(future.result()).decode('utf-8')
+                card['audio_base64'] = audio_b64
+            flashcards.append(card)
+        return flashcards
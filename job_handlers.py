@@ -0,0 +1,90 @@
+"""
+What the background jobs of job_queue.py run.
+
+Each handler takes the service container, the job's parameters and the path
+of its stored input, and returns the JSON result that GET /api/jobs/<id>
+serves. Results are kept in translator.db, so audio is never inlined: the
+answer carries `audio_url`s into the TTS cache instead of base64.
+
+The TTS cache evicts, so a result can outlive its audio. A submission that
+reuses an earlier job's result runs the kind's `refresh_<kind>` first, which
+starts synthesizing whatever audio the result links to and the cache no
+longer has; its `audio_url` serves the clip once it's ready.
+"""
+
+from werkzeug.datastructures import FileStorage
+
+try:
+    from .text_analysis import index_document, iter_document
+except Exception:
+    from text_analysis import index_document, iter_document
+
+# A job has no client waiting on it, so flashcards wait this long for their audio
+FLASHCARD_AUDIO_DEADLINE = 30.0
+
+
+def voice_translate(services, params, input_path):
+    """Transcribe, translate and speak a recording, like POST /api/voice/translate."""
+    source_lang = params.get('source_lang', 'auto')
+    target_lang = params.get('target_lang', 'en')
+    with open(input_path, 'rb') as f:
+        speech_res = services.voice.speech_to_text(f, language=source_lang)
+    user_text = speech_res.get('text') if isinstance(speech_res, dict) else ''
+    trans = services.translation.translate(text=user_text or '', src_lang=source_lang, dest_lang=target_lang)
+    translated_text = trans.get('translated_text', '')
+
+    audio_url = None
+    try:
+        services.voice.text_to_speech(translated_text, language=target_lang)
+        audio_url = '/api/tts/' + services.voice.audio_key(translated_text, target_lang)
+    except Exception as tts_err:
+        print(f"[WARN] Job speech synthesis failed: {tts_err}")
+    return {'source_text': user_text, 'translated_text': translated_text, 'audio_url': audio_url,
+            'speech_stats': speech_res.get('vad') if isinstance(speech_res, dict) else None}
+
+
+def flashcards(services, params, input_path):
+    """
+    Flashcards for a stored document, like POST /api/flashcards
+
+    Raises:
+        Exception: If the document has no text
+    """
+    language = params.get('language', 'en')
+    with open(input_path, 'rb') as f:
+        document = index_document(iter_document(f, params.get('filename') or '', params.get('content_type') or ''),
+                                  language=language)
+    if not document.sentences:
+        raise Exception("No text provided")
+    cards = services.flashcards.generate_flashcards(document, language=language, deadline=FLASHCARD_AUDIO_DEADLINE,
+                                                    inline_audio=False)
+    return {'flashcards': cards}
+
+
+def practice_analyze(services, params, input_path):
+    """Score a recording against its target text, like POST /api/practice/analyze."""
+    with open(input_path, 'rb') as f:
+        audio_file = FileStorage(f, filename=params.get('filename') or 'audio', name='audio',
+                                 content_type=params.get('content_type'))
+        return services.practice.analyze_pronunciation(audio_file, params['target_text'],
+                                                       params.get('language', 'en'))
+
+
+def _resynthesize(services, text, language):
+    # Only clips the cache lost are synthesized again; the rest are served as they are
+    if services.voice.audio_cache.contains(services.voice.audio_key(text, language)):
+        return
+    services.voice.text_to_speech_async(text, language=language)
+
+
+def refresh_voice_translate(services, params, result):
+    """Bring back the spoken translation of a reused voice_translate result."""
+    if result.get('audio_url'):
+        _resynthesize(services, result['translated_text'], params.get('target_lang', 'en'))
+
+
+def refresh_flashcards(services, params, result):
+    """Bring back the card audio of a reused flashcards result."""
+    language = params.get('language', 'en')
+    for card in result.get('flashcards', []):
+        _resynthesize(services, card['front'], language)
@@ -0,0 +1,537 @@
+"""
+Persistent background jobs for slow audio work.
+
+A job is a kind (e.g. 'voice_translate'), JSON parameters and an optional
+input file. Submitting stores the input under `input_dir` and the job in the
+jobs table of translator.db, then returns at once. A pool of worker threads
+runs the job, and clients poll GET /api/jobs/<id> or pass a webhook URL.
+
+Scheduling: the next job comes from the tenant with the highest-priority
+queued job. Tenants at the same priority take turns: the one with the fewest
+jobs running goes first, and ties go to the one served longest ago. A
+tenant already running `max_per_tenant` jobs waits while any other tenant
+has work, whatever the priorities.
+
+Durability: a claimed job carries a lease that this process renews while
+the job runs. If the process dies, the lease runs out and the job is claimed
+again, on restart or by another process sharing the database. A job that has
+been claimed MAX_ATTEMPTS times is failed instead. Finished jobs are purged
+after `retention_hours`.
+
+Deduplication: jobs are keyed by a SHA-256 over the kind, the parameters and
+the input bytes.
+  - A submission identical to a job that succeeded finishes at once with
+    that job's result, after the kind's refresher (if any) has restored
+    what the result refers to.
+  - A submission identical to a job still queued or running waits for that
+    job and finishes with it.
+Every submission keeps its own id and webhook.
+
+Webhooks: the finished job's JSON is POSTed from a small, fixed pool of
+threads, with WEBHOOK_ATTEMPTS tries per delivery and no redirects followed.
+Webhook URLs come from clients, so hosts that resolve to loopback, private,
+link-local or other non-public addresses are refused, both on submit and
+again before each delivery, unless JOB_WEBHOOK_ALLOW_PRIVATE is set. With a
+webhook secret set, the body is signed with HMAC-SHA256 in X-Signature.
+Delivery is at least once: deliveries not confirmed before a restart are
+sent again.
+
+Several processes can share the database. Claims are atomic, and each process
+claims only the kinds it has handlers for.
+"""
+
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import requests
+
+try:
+    from .storage import get_default_storage
+    from .metrics import span
+except Exception:
+    from storage import get_default_storage
+    from metrics import span
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+MIN_PRIORITY = -10
+MAX_PRIORITY = 10
+
+# Columns returned by get(), in order
+JOB_COLUMNS = ('id', 'kind', 'status', 'priority', 'duplicate_of', 'result', 'error', 'attempts', 'webhook_url',
+               'webhook_status', 'created_at', 'started_at', 'finished_at')
+
+
+class WebhookRejected(Exception):
+    """The receiver answered with a client error: retrying won't help."""
+
+
+def check_webhook_url(url, allow_private=False):
+    """
+    Refuse webhook URLs the server must not call on a client's behalf
+
+    Raises:
+        ValueError: If the URL isn't http(s), its host doesn't resolve, or
+            (unless `allow_private`) it resolves to a non-public address
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError("webhook_url must be an http or https URL")
+    if allow_private:
+        return
+    try:
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)}
+    except (OSError, ValueError):
+        raise ValueError(f"webhook_url host can't be resolved: {parsed.hostname}")
+    for address in addresses:
+        # Drop an IPv6 zone id (fe80::1%eth0) before parsing
+        if not ipaddress.ip_address(address.split('%', 1)[0]).is_global:
+            raise ValueError("webhook_url must point to a public address")
+
+
+class JobQueue:
+    # Seconds a claim lasts unless renewed; renewed every third of that while the job runs
+    LEASE_SECONDS = 60.0
+    # Claims of one job before it is failed, e.g. because it keeps taking its process down
+    MAX_ATTEMPTS = 3
+    # Longest the dispatcher goes without looking for jobs, e.g. queued by other processes
+    POLL_INTERVAL = 1.0
+    # How often finished jobs past retention are deleted, in seconds
+    PURGE_INTERVAL = 600.0
+    # Threads delivering webhooks, whatever the number of receivers
+    WEBHOOK_WORKERS = 2
+    # Tries per webhook delivery, and the backoff before the second one (doubled after)
+    WEBHOOK_ATTEMPTS = 3
+    WEBHOOK_BACKOFF = 1.0
+    WEBHOOK_TIMEOUT = 10.0
+    READ_CHUNK = 64 * 1024
+
+    def __init__(self, handlers, storage=None, input_dir='job_inputs', workers=None, max_per_tenant=None,
+                 retention_hours=None, webhook_secret=None, allow_private_webhooks=None, refreshers=None):
+        """
+        Args:
+            handlers: kind -> fn(params, input_path) returning the job's JSON-able
+                result; raising fails the job with the exception's message
+            storage: Storage holding the jobs table (defaults to the shared translator.db)
+            input_dir: Directory holding submitted inputs until their job finishes
+            workers: Jobs run at once; defaults to JOB_WORKERS, else 4. With 0 this
+                process only accepts jobs and leaves running them to others
+            max_per_tenant: Jobs one tenant may run at once while others wait;
+                defaults to JOB_MAX_PER_TENANT, else half the workers
+            retention_hours: Hours finished jobs are kept; defaults to
+                JOB_RETENTION_HOURS, else a week
+            webhook_secret: Key for webhook signatures; defaults to JOB_WEBHOOK_SECRET
+            allow_private_webhooks: Accept webhook URLs on loopback and private
+                addresses; defaults to JOB_WEBHOOK_ALLOW_PRIVATE, else False
+            refreshers: kind -> fn(params, result), run before a submission reuses
+                a succeeded job's result, to restore anything the result refers
+                to that may have expired since (such as cached audio)
+        """
+        self.handlers = dict(handlers)
+        self.refreshers = dict(refreshers or {})
+        self.storage = storage if storage is not None else get_default_storage()
+        self.input_dir = os.path.abspath(input_dir)
+        self.workers = int(os.environ.get('JOB_WORKERS', '4')) if workers is None else workers
+        if max_per_tenant is None:
+            max_per_tenant = int(os.environ.get('JOB_MAX_PER_TENANT', '0')) or max(1, self.workers // 2)
+        self.max_per_tenant = max_per_tenant
+        if retention_hours is None:
+            retention_hours = float(os.environ.get('JOB_RETENTION_HOURS', str(7 * 24)))
+        self.retention = retention_hours * 3600
+        secret = webhook_secret if webhook_secret is not None else os.environ.get('JOB_WEBHOOK_SECRET', '')
+        self.webhook_secret = secret.encode('utf-8') if secret else None
+        if allow_private_webhooks is None:
+            allow_private_webhooks = os.environ.get('JOB_WEBHOOK_ALLOW_PRIVATE', '').lower() in ('1', 'true', 'yes')
+        self.allow_private_webhooks = allow_private_webhooks
+        # Identifies this process's claims in a database other processes may share
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        os.makedirs(self.input_dir, exist_ok=True)
+
+        self._cond = threading.Condition()
+        self._signalled = False
+        self._closed = False
+        self._active = 0
+        self._last_served = {}  # tenant -> monotonic time of its last claim
+        self._counters = {'submitted': 0, 'deduplicated': 0, 'succeeded': 0, 'failed': 0, 'reclaimed': 0,
+                          'webhooks_delivered': 0, 'webhooks_failed': 0}
+        self._session = requests.Session()
+        self._webhook_executor = ThreadPoolExecutor(max_workers=self.WEBHOOK_WORKERS, thread_name_prefix='webhook')
+        self._executor = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='job')
+        self._dispatcher = None
+        if self.workers > 0:
+            self._resume_webhooks()
+            self._dispatcher = threading.Thread(target=self._dispatch, name='job-dispatcher', daemon=True)
+            self._dispatcher.start()
+
+    def submit(self, kind, params, source=None, tenant='default', priority=0, webhook_url=None):
+        """
+        Queue a job
+
+        The input is written to disk before the job is stored, so an
+        acknowledged job survives a restart.
+
+        Args:
+            kind: Job kind; one of the handler names
+            params: JSON-able parameters passed to the handler
+            source: Input as bytes, str, or a binary file object read in
+                pieces; None for jobs without one
+            tenant: Who the job is for, for fair scheduling
+            priority: Higher runs first, between MIN_PRIORITY and MAX_PRIORITY
+            webhook_url: Public http(s) URL to POST the finished job to
+
+        Returns:
+            dict: The job, as get() returns it
+
+        Raises:
+            ValueError: On an unknown kind, a priority that isn't an integer,
+                or a webhook URL that check_webhook_url() refuses
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        try:
+            priority = min(max(int(priority), MIN_PRIORITY), MAX_PRIORITY)
+        except (TypeError, ValueError):
+            raise ValueError(f"priority must be an integer from {MIN_PRIORITY} to {MAX_PRIORITY}")
+        if webhook_url:
+            check_webhook_url(webhook_url, self.allow_private_webhooks)
+
+        job_id = uuid.uuid4().hex
+        params_json = json.dumps(params, sort_keys=True, separators=(',', ':'))
+        input_path, input_digest = self._store_input(job_id, source)
+        content_hash = hashlib.sha256(f"{kind}\x1f{params_json}\x1f{input_digest}".encode('utf-8')).hexdigest()
+        now = time.time()
+
+        with span('db', query='submit_job'), self.storage.transaction() as conn:
+            original = conn.execute(
+                f'''SELECT id, status, result FROM jobs
+                    WHERE content_hash = ? AND duplicate_of IS NULL AND status IN (?, ?, ?)
+                    ORDER BY status = ? DESC, created_at DESC LIMIT 1''',
+                (content_hash, QUEUED, RUNNING, SUCCEEDED, SUCCEEDED)).fetchone()
+            status, duplicate_of, result, finished_at = QUEUED, None, None, None
+            if original is not None:
+                duplicate_of = original[0]
+                if original[1] == SUCCEEDED:
+                    status, result, finished_at = SUCCEEDED, original[2], now
+            conn.execute(
+                '''INSERT INTO jobs (id, kind, tenant, priority, params, content_hash, input_path, status,
+                                     duplicate_of, result, webhook_url, webhook_status, created_at, finished_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (job_id, kind, tenant, priority, params_json, content_hash,
+                 None if duplicate_of else input_path, status, duplicate_of, result, webhook_url or None,
+                 'pending' if webhook_url else None, now, finished_at))
+
+        with self._cond:
+            self._counters['submitted'] += 1
+            if duplicate_of:
+                self._counters['deduplicated'] += 1
+            else:
+                self._signalled = True
+                self._cond.notify_all()
+        if duplicate_of:
+            # The original's input or result serves this job
+            self._remove_input(input_path)
+        if status == SUCCEEDED and kind in self.refreshers:
+            try:
+                self.refreshers[kind](params, json.loads(result))
+            except Exception as e:
+                print(f"[WARN] Refreshing reused {kind} result {duplicate_of} failed: {e}")
+        if status == SUCCEEDED and webhook_url:
+            self._deliver_webhooks([job_id])
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """
+        A job's state, and its result once it has succeeded
+
+        Returns:
+            dict: 'id', 'kind', 'status' (queued, running, succeeded or failed),
+            'priority', 'deduplicated', 'result', 'error', 'attempts', 'webhook'
+            and ISO timestamps; None for an unknown id
+        """
+        with self.storage.connection() as conn:
+            row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        job['deduplicated'] = job.pop('duplicate_of') is not None
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        url, status = job.pop('webhook_url'), job.pop('webhook_status')
+        job['webhook'] = {'url': url, 'status': status} if url else None
+        for key in ('created_at', 'started_at', 'finished_at'):
+            if job[key] is not None:
+                job[key] = datetime.fromtimestamp(job[key], timezone.utc).isoformat()
+        return job
+
+    def stats(self):
+        """Jobs per status in the database, and this process's counters."""
+        with self.storage.connection() as conn:
+            by_status = dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        with self._cond:
+            stats = dict(self._counters)
+            stats['active'] = self._active
+        stats.update({'workers': self.workers, 'kinds': sorted(self.handlers), 'jobs': by_status})
+        return stats
+
+    def close(self, wait=True):
+        """
+        Stop claiming jobs
+
+        Args:
+            wait: Let running jobs finish; otherwise they stay claimed until
+                their lease runs out and are picked up again
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        self._executor.shutdown(wait=wait)
+        self._webhook_executor.shutdown(wait=wait)
+
+    def _store_input(self, job_id, source):
+        # Returns (path or None, hex digest of the input)
+        digest = hashlib.sha256()
+        if source is None:
+            return None, digest.hexdigest()
+        path = os.path.join(self.input_dir, job_id)
+        partial = path + '.part'
+        try:
+            with open(partial, 'wb') as f:
+                if isinstance(source, str):
+                    source = source.encode('utf-8')
+                if isinstance(source, (bytes, bytearray, memoryview)):
+                    digest.update(source)
+                    f.write(source)
+                else:
+                    while True:
+                        piece = source.read(self.READ_CHUNK)
+                        if not piece:
+                            break
+                        digest.update(piece)
+                        f.write(piece)
+            os.replace(partial, path)
+        except BaseException:
+            # e.g. the upload went over its size limit mid-stream
+            self._remove_input(partial)
+            raise
+        return path, digest.hexdigest()
+
+    @staticmethod
+    def _remove_input(path):
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _dispatch(self):
+        next_maintenance = 0.0
+        next_purge = time.monotonic() + self.PURGE_INTERVAL
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                free = self._active < self.workers
+            now = time.monotonic()
+            try:
+                if now >= next_maintenance:
+                    next_maintenance = now + self.LEASE_SECONDS / 3
+                    self._renew_leases()
+                    self._fail_abandoned()
+                if now >= next_purge:
+                    next_purge = now + self.PURGE_INTERVAL
+                    self._purge()
+                job = self._claim() if free else None
+            except Exception as e:
+                # e.g. the database stayed locked past busy_timeout; try again on the next round
+                print(f"[WARN] Job dispatcher: {e}")
+                job = None
+            if job is not None:
+                with self._cond:
+                    self._active += 1
+                self._executor.submit(self._run, *job)
+                continue
+            with self._cond:
+                if not self._signalled and not self._closed:
+                    self._cond.wait(timeout=min(self.POLL_INTERVAL, self.LEASE_SECONDS / 3))
+                self._signalled = False
+
+    def _claimable(self):
+        # WHERE clause and its parameters for jobs this process may claim now
+        marks = ', '.join('?' * len(self.handlers))
+        clause = (f"duplicate_of IS NULL AND kind IN ({marks}) AND "
+                  f"(status = ? OR (status = ? AND lease_until < ? AND attempts < ?))")
+        return clause, (*self.handlers, QUEUED, RUNNING, time.time(), self.MAX_ATTEMPTS)
+
+    def _claim(self):
+        """Take the next job by priority and tenant fairness: (id, kind, tenant, params, input path) or None."""
+        clause, args = self._claimable()
+        now = time.time()
+        # Most polls find nothing: look before taking the write lock
+        with self.storage.connection() as conn:
+            if conn.execute(f'SELECT 1 FROM jobs WHERE {clause} LIMIT 1', args).fetchone() is None:
+                return None
+        with self.storage.transaction() as conn:
+            waiting = conn.execute(f'''SELECT tenant, MAX(priority), MIN(created_at) FROM jobs WHERE {clause}
+                                       GROUP BY tenant''', args).fetchall()
+            if not waiting:
+                return None
+            # Counted across every process sharing the database
+            running = dict(conn.execute('SELECT tenant, COUNT(*) FROM jobs WHERE status = ? AND lease_until >= ? '
+                                        'GROUP BY tenant', (RUNNING, now)).fetchall())
+            tenant = self._pick_tenant(waiting, running)
+            job_id, kind, params, input_path, status = conn.execute(
+                f'''SELECT id, kind, params, input_path, status FROM jobs
+                    WHERE {clause} AND tenant = ? ORDER BY priority DESC, created_at, id LIMIT 1''',
+                (*args, tenant)).fetchone()
+            conn.execute('''UPDATE jobs SET status = ?, owner = ?, lease_until = ?, attempts = attempts + 1,
+                                            started_at = ? WHERE id = ?''',
+                         (RUNNING, self.owner, now + self.LEASE_SECONDS, now, job_id))
+        with self._cond:
+            self._last_served[tenant] = time.monotonic()
+            if status == RUNNING:
+                self._counters['reclaimed'] += 1
+        return job_id, kind, tenant, params, input_path
+
+    def _pick_tenant(self, waiting, running):
+        """
+        Tenant to serve next
+
+        Args:
+            waiting: (tenant, highest queued priority, oldest created_at) rows
+            running: tenant -> jobs running now
+        """
+        with self._cond:
+            last_served = dict(self._last_served)
+        return min(waiting, key=lambda row: (running.get(row[0], 0) >= self.max_per_tenant, -row[1],
+                                             running.get(row[0], 0), last_served.get(row[0], 0.0)))[0]
+
+    def _run(self, job_id, kind, tenant, params, input_path):
+        try:
+            try:
+                with span('job', kind=kind):
+                    result = self.handlers[kind](json.loads(params), input_path)
+                status, error = SUCCEEDED, None
+            except Exception as e:
+                print(f"[WARN] Job {job_id} ({kind}) failed: {e}")
+                status, result, error = FAILED, None, str(e)
+            self._finish(job_id, status, result, error)
+        except Exception as e:
+            # The database refused the outcome; the lease runs out and the job is claimed again
+            print(f"[ERROR] Job {job_id} ({kind}) could not be recorded: {e}")
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._signalled = True
+                self._cond.notify_all()
+
+    def _finish(self, job_id, status, result=None, error=None, owner=True):
+        """Record a job's outcome, finish the submissions waiting on it, and send their webhooks."""
+        now = time.time()
+        result = json.dumps(result) if result is not None else None
+        with span('db', query='finish_job'), self.storage.transaction() as conn:
+            row = conn.execute('SELECT input_path FROM jobs WHERE id = ? AND status = ?' +
+                               (' AND owner = ?' if owner else ''),
+                               (job_id, RUNNING, self.owner) if owner else (job_id, RUNNING)).fetchone()
+            if row is None:
+                # Lease lost: another process claimed the job again and will record it
+                return
+            conn.execute('''UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL,
+                                            input_path = NULL WHERE id = ?''',
+                         (status, result, error, now, job_id))
+            followers = [r[0] for r in conn.execute('SELECT id FROM jobs WHERE duplicate_of = ? AND status = ?',
+                                                    (job_id, QUEUED))]
+            conn.execute('UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? '
+                         'WHERE duplicate_of = ? AND status = ?', (status, result, error, now, job_id, QUEUED))
+            hooks = [r[0] for r in conn.execute(
+                f"SELECT id FROM jobs WHERE id IN ({', '.join('?' * (len(followers) + 1))}) AND webhook_status = ?",
+                (job_id, *followers, 'pending'))]
+        with self._cond:
+            self._counters[status] += 1
+        self._remove_input(row[0])
+        self._deliver_webhooks(hooks)
+
+    def _renew_leases(self):
+        with self._cond:
+            if not self._active:
+                return
+        with self.storage.transaction() as conn:
+            conn.execute('UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = ?',
+                         (time.time() + self.LEASE_SECONDS, self.owner, RUNNING))
+
+    def _fail_abandoned(self):
+        # Jobs whose lease ran out on their last allowed attempt
+        with self.storage.connection() as conn:
+            abandoned = [r[0] for r in conn.execute(
+                'SELECT id FROM jobs WHERE status = ? AND lease_until < ? AND attempts >= ?',
+                (RUNNING, time.time(), self.MAX_ATTEMPTS))]
+        for job_id in abandoned:
+            self._finish(job_id, FAILED, error=f"Job abandoned after {self.MAX_ATTEMPTS} attempts", owner=False)
+
+    def _purge(self):
+        cutoff = time.time() - self.retention
+        with self.storage.transaction() as conn:
+            conn.execute('DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?', (SUCCEEDED, FAILED, cutoff))
+
+    def _resume_webhooks(self):
+        with self.storage.connection() as conn:
+            pending = [r[0] for r in conn.execute('SELECT id FROM jobs WHERE webhook_status = ? AND status IN (?, ?)',
+                                                  ('pending', SUCCEEDED, FAILED))]
+        self._deliver_webhooks(pending)
+
+    def _deliver_webhooks(self, job_ids):
+        for job_id in job_ids:
+            self._webhook_executor.submit(self._deliver, job_id)
+
+    def _deliver(self, job_id):
+        job = self.get(job_id)
+        if job is None or job['webhook'] is None:
+            return
+        url = job['webhook']['url']
+        del job['webhook']
+        body = json.dumps({'job': job}).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'X-Job-Id': job_id}
+        if self.webhook_secret:
+            headers['X-Signature'] = 'sha256=' + hmac.new(self.webhook_secret, body, hashlib.sha256).hexdigest()
+        try:
+            # Again at delivery: the host's DNS may have changed since submit
+            check_webhook_url(url, self.allow_private_webhooks)
+            self._post(url, body, headers)
+            outcome = 'delivered'
+        except Exception as e:
+            print(f"[WARN] Webhook for job {job_id} to {url} failed: {e}")
+            outcome = 'failed'
+        with self.storage.transaction() as conn:
+            conn.execute('UPDATE jobs SET webhook_status = ? WHERE id = ?', (outcome, job_id))
+        with self._cond:
+            self._counters[f'webhooks_{outcome}'] += 1
+
+    def _post(self, url, body, headers):
+        """POST with retries on connection errors, timeouts and 5xx; raises once they are used up."""
+        for attempt in range(self.WEBHOOK_ATTEMPTS):
+            try:
+                # A redirect could point anywhere, private addresses included
+                response = self._session.post(url, data=body, headers=headers, timeout=self.WEBHOOK_TIMEOUT,
+                                              allow_redirects=False)
+                if 300 <= response.status_code < 500 and response.status_code not in (408, 429):
+                    raise WebhookRejected(f"HTTP {response.status_code}")
+                response.raise_for_status()
+                return
+            except (requests.RequestException, WebhookRejected) as e:
+                if isinstance(e, WebhookRejected) or attempt + 1 == self.WEBHOOK_ATTEMPTS:
+                    raise
+            time.sleep(self.WEBHOOK_BACKOFF * 2 ** attempt)
@@ -0,0 +1,117 @@
+"""
+Offline language identification for source_lang='auto'.
+
+Detection runs locally with langdetect before the translation call, so auto
+requests can be sent with a concrete source instead of paying for a second
+remote round trip. Results are cached per text hash, and anything below the
+confidence threshold is reported as undetected so callers keep 'auto'.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    from .language_registry import normalize_language
+except Exception:
+    from language_registry import normalize_language
+
+try:
+    from langdetect import DetectorFactory, detect_langs
+    from langdetect.lang_detect_exception import LangDetectException
+    # langdetect is randomized unless seeded
+    DetectorFactory.seed = 0
+except ImportError:
+    detect_langs = None
+
+# langdetect loads its language profiles on first use, unsafely under concurrency
+_profiles_lock = threading.Lock()
+_profiles_loaded = False
+
+
+def load_profiles():
+    """Load langdetect's language profiles once per process, under a lock."""
+    global _profiles_loaded
+    if _profiles_loaded or detect_langs is None:
+        return
+    with _profiles_lock:
+        if not _profiles_loaded:
+            try:
+                detect_langs('warm up the language profiles')
+            except LangDetectException:
+                pass
+            _profiles_loaded = True
+
+
+class LanguageDetector:
+    def __init__(self, threshold=0.85, min_latin_chars=12, max_entries=4096):
+        """
+        Args:
+            threshold: Minimum probability to accept a detection
+            min_latin_chars: Latin-script texts with fewer letters than this
+                are not classified (langdetect is unreliable on them)
+            max_entries: Size of the per-text result cache
+        """
+        self.threshold = threshold
+        self.min_latin_chars = min_latin_chars
+        self.max_entries = max_entries
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'detected': 0, 'below_threshold': 0}
+        self.available = detect_langs is not None
+        # Profiles load on the first detection (about half a second), so
+        # workers that never see source_lang='auto' don't pay for them
+
+    def detect(self, text):
+        """
+        Identify the language of text
+
+        Returns:
+            str: A translator language code, or None when unsure
+        """
+        if not self.available or not text:
+            return None
+        key = hashlib.sha1(text.strip().encode('utf-8')).digest()
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self._counters['hits'] += 1
+                return self._results[key]
+            self._counters['misses'] += 1
+
+        code = self._classify(text)
+
+        with self._lock:
+            self._counters['detected' if code else 'below_threshold'] += 1
+            self._results[key] = code
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return code
+
+    def _classify(self, text):
+        letters = [ch for ch in text if ch.isalpha()]
+        if not letters:
+            return None
+        if all(ch.isascii() for ch in letters) and len(letters) < self.min_latin_chars:
+            return None
+        load_profiles()
+        try:
+            candidates = detect_langs(text)
+        except LangDetectException:
+            return None
+        if not candidates or candidates[0].prob < self.threshold:
+            return None
+        # langdetect's 'zh-cn' and 'he' are the translator's 'zh-CN' and 'iw'
+        return normalize_language(candidates[0].lang)
+
+    def load_profiles(self):
+        """Load the language profiles now instead of on the first detection."""
+        load_profiles()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._results)
+        stats['available'] = self.available
+        stats['threshold'] = self.threshold
+        return stats
@@ -0,0 +1,311 @@
+"""
+Language registry: one table for every language code format the backend sees.
+
+Clients, OCR and speech recognition each name languages differently: ISO
+639-1 ('en'), ISO 639-2/3 ('eng', 'fre'/'fra'), BCP-47 tags ('en-US',
+'zh-Hant-TW'), Tesseract models ('chi_sim') and display names. Everything is
+indexed once at import time, so normalizing to the translation provider's
+code is a dictionary lookup (plus at most a couple of retries with trailing
+subtags removed).
+
+The language catalog served by /api/languages is also built here once,
+serialized and gzip-compressed up front, with a strong ETag per encoding.
+catalog_response() negotiates it from the request headers for every app.
+"""
+
+import gzip
+import hashlib
+import json
+
+from deep_translator.constants import GOOGLE_LANGUAGES_TO_CODES
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+
+# provider code: (ISO 639-3, ISO 639-2/B where it differs, Tesseract model, default STT locale)
+_CODES = {
+    'af': ('afr', None, 'afr', 'af-ZA'),
+    'sq': ('sqi', 'alb', 'sqi', 'sq-AL'),
+    'am': ('amh', None, 'amh', 'am-ET'),
+    'ar': ('ara', None, 'ara', 'ar-SA'),
+    'hy': ('hye', 'arm', 'hye', 'hy-AM'),
+    'as': ('asm', None, 'asm', 'as-IN'),
+    'ay': ('aym', None, None, None),
+    'az': ('aze', None, 'aze', 'az-AZ'),
+    'bm': ('bam', None, None, None),
+    'eu': ('eus', 'baq', 'eus', 'eu-ES'),
+    'be': ('bel', None, 'bel', 'be-BY'),
+    'bn': ('ben', None, 'ben', 'bn-IN'),
+    'bho': ('bho', None, None, None),
+    'bs': ('bos', None, 'bos', 'bs-BA'),
+    'bg': ('bul', None, 'bul', 'bg-BG'),
+    'ca': ('cat', None, 'cat', 'ca-ES'),
+    'ceb': ('ceb', None, 'ceb', None),
+    'ny': ('nya', None, None, None),
+    'zh-CN': ('zho', 'chi', 'chi_sim', 'zh-CN'),
+    'zh-TW': (None, None, 'chi_tra', 'zh-TW'),
+    'co': ('cos', None, 'cos', None),
+    'hr': ('hrv', None, 'hrv', 'hr-HR'),
+    'cs': ('ces', 'cze', 'ces', 'cs-CZ'),
+    'da': ('dan', None, 'dan', 'da-DK'),
+    'dv': ('div', None, 'div', None),
+    'doi': ('doi', None, None, None),
+    'nl': ('nld', 'dut', 'nld', 'nl-NL'),
+    'en': ('eng', None, 'eng', 'en-US'),
+    'eo': ('epo', None, 'epo', None),
+    'et': ('est', None, 'est', 'et-EE'),
+    'ee': ('ewe', None, None, None),
+    'tl': ('tgl', None, 'tgl', 'fil-PH'),
+    'fi': ('fin', None, 'fin', 'fi-FI'),
+    'fr': ('fra', 'fre', 'fra', 'fr-FR'),
+    'fy': ('fry', None, 'fry', None),
+    'gl': ('glg', None, 'glg', 'gl-ES'),
+    'ka': ('kat', 'geo', 'kat', 'ka-GE'),
+    'de': ('deu', 'ger', 'deu', 'de-DE'),
+    'el': ('ell', 'gre', 'ell', 'el-GR'),
+    'gn': ('grn', None, None, None),
+    'gu': ('guj', None, 'guj', 'gu-IN'),
+    'ht': ('hat', None, 'hat', None),
+    'ha': ('hau', None, None, None),
+    'haw': ('haw', None, None, None),
+    'iw': ('heb', None, 'heb', 'he-IL'),
+    'hi': ('hin', None, 'hin', 'hi-IN'),
+    'hmn': ('hmn', None, None, None),
+    'hu': ('hun', None, 'hun', 'hu-HU'),
+    'is': ('isl', 'ice', 'isl', 'is-IS'),
+    'ig': ('ibo', None, None, None),
+    'ilo': ('ilo', None, None, None),
+    'id': ('ind', None, 'ind', 'id-ID'),
+    'ga': ('gle', None, 'gle', None),
+    'it': ('ita', None, 'ita', 'it-IT'),
+    'ja': ('jpn', None, 'jpn', 'ja-JP'),
+    'jw': ('jav', None, 'jav', 'jv-ID'),
+    'kn': ('kan', None, 'kan', 'kn-IN'),
+    'kk': ('kaz', None, 'kaz', 'kk-KZ'),
+    'km': ('khm', None, 'khm', 'km-KH'),
+    'rw': ('kin', None, None, 'rw-RW'),
+    'gom': ('gom', None, None, None),
+    'ko': ('kor', None, 'kor', 'ko-KR'),
+    'kri': ('kri', None, None, None),
+    'ku': ('kmr', 'kur', 'kmr', None),
+    'ckb': ('ckb', None, 'ckb', None),
+    'ky': ('kir', None, 'kir', None),
+    'lo': ('lao', None, 'lao', 'lo-LA'),
+    'la': ('lat', None, 'lat', None),
+    'lv': ('lav', None, 'lav', 'lv-LV'),
+    'ln': ('lin', None, None, None),
+    'lt': ('lit', None, 'lit', 'lt-LT'),
+    'lg': ('lug', None, None, None),
+    'lb': ('ltz', None, 'ltz', None),
+    'mk': ('mkd', 'mac', 'mkd', 'mk-MK'),
+    'mai': ('mai', None, None, None),
+    'mg': ('mlg', None, None, None),
+    'ms': ('msa', 'may', 'msa', 'ms-MY'),
+    'ml': ('mal', None, 'mal', 'ml-IN'),
+    'mt': ('mlt', None, 'mlt', None),
+    'mi': ('mri', 'mao', 'mri', None),
+    'mr': ('mar', None, 'mar', 'mr-IN'),
+    'mni-Mtei': ('mni', None, None, None),
+    'lus': ('lus', None, None, None),
+    'mn': ('mon', None, 'mon', 'mn-MN'),
+    'my': ('mya', 'bur', 'mya', 'my-MM'),
+    'ne': ('nep', None, 'nep', 'ne-NP'),
+    'no': ('nor', None, 'nor', 'no-NO'),
+    'or': ('ori', None, 'ori', None),
+    'om': ('orm', None, None, None),
+    'ps': ('pus', None, 'pus', None),
+    'fa': ('fas', 'per', 'fas', 'fa-IR'),
+    'pl': ('pol', None, 'pol', 'pl-PL'),
+    'pt': ('por', None, 'por', 'pt-BR'),
+    'pa': ('pan', None, 'pan', 'pa-IN'),
+    'qu': ('que', None, 'que', None),
+    'ro': ('ron', 'rum', 'ron', 'ro-RO'),
+    'ru': ('rus', None, 'rus', 'ru-RU'),
+    'sm': ('smo', None, None, None),
+    'sa': ('san', None, 'san', None),
+    'gd': ('gla', None, 'gla', None),
+    'nso': ('nso', None, None, None),
+    'sr': ('srp', None, 'srp', 'sr-RS'),
+    'st': ('sot', None, None, None),
+    'sn': ('sna', None, None, None),
+    'sd': ('snd', None, 'snd', None),
+    'si': ('sin', None, 'sin', 'si-LK'),
+    'sk': ('slk', 'slo', 'slk', 'sk-SK'),
+    'sl': ('slv', None, 'slv', 'sl-SI'),
+    'so': ('som', None, None, None),
+    'es': ('spa', None, 'spa', 'es-ES'),
+    'su': ('sun', None, 'sun', 'su-ID'),
+    'sw': ('swa', None, 'swa', 'sw-KE'),
+    'sv': ('swe', None, 'swe', 'sv-SE'),
+    'tg': ('tgk', None, 'tgk', None),
+    'ta': ('tam', None, 'tam', 'ta-IN'),
+    'tt': ('tat', None, 'tat', None),
+    'te': ('tel', None, 'tel', 'te-IN'),
+    'th': ('tha', None, 'tha', 'th-TH'),
+    'ti': ('tir', None, 'tir', None),
+    'ts': ('tso', None, None, None),
+    'tr': ('tur', None, 'tur', 'tr-TR'),
+    'tk': ('tuk', None, None, None),
+    'ak': ('aka', None, None, None),
+    'uk': ('ukr', None, 'ukr', 'uk-UA'),
+    'ur': ('urd', None, 'urd', 'ur-PK'),
+    'ug': ('uig', None, 'uig', None),
+    'uz': ('uzb', None, 'uzb', 'uz-UZ'),
+    'vi': ('vie', None, 'vie', 'vi-VN'),
+    'cy': ('cym', 'wel', 'cym', None),
+    'xh': ('xho', None, None, None),
+    'yi': ('yid', None, 'yid', None),
+    'yo': ('yor', None, 'yor', None),
+    'zu': ('zul', None, None, 'zu-ZA'),
+}
+
+# Codes other systems use where the provider's code differs
+_ALIASES = {
+    'zh': 'zh-CN', 'zh-hans': 'zh-CN', 'zh-sg': 'zh-CN', 'cmn': 'zh-CN',
+    'zh-hant': 'zh-TW', 'zh-hk': 'zh-TW', 'zh-mo': 'zh-TW',
+    'he': 'iw', 'jv': 'jw', 'fil': 'tl',
+    'nb': 'no', 'nob': 'no', 'nn': 'no', 'nno': 'no',
+    'mni': 'mni-Mtei', 'twi': 'ak', 'ory': 'or', 'kok': 'gom',
+}
+
+LANGUAGES_CACHE_CONTROL = 'public, max-age=3600'
+
+
+def _key(code):
+    return str(code).strip().replace('_', '-').lower()
+
+
+def _build():
+    names = {code: name for name, code in GOOGLE_LANGUAGES_TO_CODES.items()}
+    info = {}
+    index = {}
+    # Earlier sources win when two formats spell the same key
+    for code in names:
+        index[_key(code)] = code
+    for code, (iso3, iso2b, tesseract, locale) in _CODES.items():
+        if code not in names:
+            continue
+        info[code] = {'code': code, 'name': names[code].title(), 'iso639_3': iso3,
+                      'iso639_2b': iso2b or iso3, 'tesseract': tesseract, 'stt_locale': locale}
+        for alt in (iso3, iso2b, tesseract, locale):
+            if alt:
+                index.setdefault(_key(alt), code)
+    for code in names:
+        # Provider languages missing from the table above still normalize and list
+        info.setdefault(code, {'code': code, 'name': names[code].title(), 'iso639_3': None,
+                               'iso639_2b': None, 'tesseract': None, 'stt_locale': None})
+    for alias, code in _ALIASES.items():
+        index.setdefault(alias, code)
+    for code, name in names.items():
+        index.setdefault(_key(name), code)
+    return info, index
+
+
+_INFO, _INDEX = _build()
+
+# Catalog for clients, sorted by display name
+LANGUAGES = tuple(sorted(({'code': i['code'], 'name': i['name']} for i in _INFO.values()),
+                         key=lambda x: x['name']))
+
+
+def normalize_language(code):
+    """
+    Map any known spelling of a language to the translation provider's code
+
+    Examples:
+        'hin' -> 'hi', 'ENG' -> 'en', 'zh-Hant-TW' -> 'zh-TW', 'chi_sim' -> 'zh-CN',
+        'he' -> 'iw', 'pt-BR' -> 'pt', 'German' -> 'de', 'auto' -> 'auto'
+
+    Returns:
+        str: Provider code, or None if the language isn't known
+    """
+    if not code:
+        return None
+    key = _key(code)
+    if key == 'auto':
+        return 'auto'
+    while key:
+        found = _INDEX.get(key)
+        if found is not None:
+            return found
+        # Drop the last subtag: region, script or Tesseract variant
+        key = key.rpartition('-')[0]
+    return None
+
+
+def language_info(code):
+    """
+    Everything known about a language
+
+    Returns:
+        dict: 'code', 'name', 'iso639_3', 'iso639_2b', 'tesseract' and
+        'stt_locale' (None where unknown), or None for an unknown language
+    """
+    info = _INFO.get(normalize_language(code))
+    return dict(info) if info else None
+
+
+def stt_locale(code):
+    """
+    Locale to request from speech recognition
+
+    A tag that already names a region for a known language ('en-GB',
+    'es-MX') is kept; a bare language gets its default locale. Unknown
+    values are passed through unchanged.
+    """
+    normalized = normalize_language(code)
+    if normalized is None or normalized == 'auto':
+        return code
+    parts = str(code).strip().replace('_', '-').split('-')
+    if len(parts) == 2 and len(parts[1]) == 2 and parts[1].isalpha():
+        return f"{parts[0].lower()}-{parts[1].upper()}"
+    return _INFO[normalized]['stt_locale'] or normalized
+
+
+def tesseract_code(code):
+    """Tesseract model for a language, or None if there isn't one."""
+    info = _INFO.get(normalize_language(code))
+    return info['tesseract'] if info else None
+
+
+def _catalog_payloads():
+    body = json.dumps({'success': True, 'languages': list(LANGUAGES)}, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    return {False: (body, digest, None), True: (compressed, digest + '-gzip', 'gzip')}
+
+
+_CATALOG = _catalog_payloads()
+
+
+def catalog_payload(accept_gzip):
+    """
+    The /api/languages body, serialized once at import
+
+    Returns:
+        tuple: (body bytes, strong ETag value, Content-Encoding or None)
+    """
+    return _CATALOG[bool(accept_gzip)]
+
+
+def catalog_response(headers):
+    """
+    The /api/languages answer for a request's headers, for any of the apps
+
+    gzip is served when Accept-Encoding allows it, and a request whose
+    If-None-Match names the current ETag gets an empty 304.
+
+    Args:
+        headers: The request's headers (anything with .get())
+
+    Returns:
+        tuple: (status code, response headers dict, body bytes)
+    """
+    body, etag, encoding = catalog_payload(parse_accept_header(headers.get('Accept-Encoding'))['gzip'] > 0)
+    response_headers = {'Cache-Control': LANGUAGES_CACHE_CONTROL, 'Vary': 'Accept-Encoding',
+                        'ETag': quote_etag(etag)}
+    if etag in parse_etags(headers.get('If-None-Match')):
+        return 304, response_headers, b''
+    response_headers['Content-Type'] = 'application/json'
+    if encoding:
+        response_headers['Content-Encoding'] = encoding
+    return 200, response_headers, body
@@ -0,0 +1,347 @@
+"""
+Lightweight request and span instrumentation with a Prometheus exporter.
+
+Each route is timed as a request, and service calls inside it (translate,
+speech_to_text, text_to_speech, conversation queries, ...) as named spans.
+Durations go into fixed-bucket histograms, from which p50/p95/p99 are
+estimated like Prometheus' histogram_quantile. Errors are counted per span.
+Recording costs two clock reads, a bisect and a short lock, so it stays on
+in production. render() emits the Prometheus text format for /metrics,
+provider stats from upstream.health() included.
+
+The spans of the current request are also kept (up to MAX_TRACE_SPANS), so
+a slow request can be broken down. Setting METRICS_PROFILE_SLOW_MS turns on
+the opt-in profiler. A sampled share of requests (METRICS_PROFILE_SAMPLE,
+default all) has its thread's stack sampled every METRICS_PROFILE_INTERVAL_MS
+milliseconds. Requests slower than the threshold print their span breakdown
+and hottest stacks. Stacks are only sampled where a thread runs the whole
+request (the Flask app); the ASGI app still prints the span breakdown.
+"""
+
+import bisect
+import contextvars
+import functools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+try:
+    from .upstream import health as upstream_health
+except Exception:
+    from upstream import health as upstream_health
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+MAX_TRACE_SPANS = 256
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Frames kept per sampled stack, innermost last
+STACK_DEPTH = 12
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'sum', 'errors', '_lock')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if error:
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.sum, self.errors
+
+    @staticmethod
+    def quantile(counts, q):
+        """Estimate a quantile from bucket counts, interpolating linearly inside the bucket."""
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                lower = BUCKETS[index - 1] if index else 0.0
+                if index == len(BUCKETS):
+                    return lower
+                return lower + (BUCKETS[index] - lower) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}  # (family, sorted label pairs) -> Histogram
+        # Same histograms keyed by label pairs in call-site order, so a hit skips the sort
+        self._lookup = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, family, labels):
+        """
+        Args:
+            family: Metric name without the unit suffix
+            labels: Tuple of (name, value) pairs
+        """
+        histogram = self._lookup.get((family, labels))
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault((family, tuple(sorted(labels))), Histogram())
+                self._lookup[(family, labels)] = histogram
+        return histogram
+
+    def observe(self, family, labels, seconds, error=False):
+        self.histogram(family, labels).observe(seconds, error)
+
+    def summary(self):
+        """
+        Every histogram as plain numbers
+
+        Returns:
+            list: dicts with 'family', 'labels', 'count', 'errors', 'mean_ms' and 'p50_ms'/'p95_ms'/'p99_ms'
+        """
+        with self._lock:
+            items = list(self._histograms.items())
+        rows = []
+        for (family, labels), histogram in sorted(items):
+            counts, count, total, errors = histogram.snapshot()
+            row = {'family': family, 'labels': dict(labels), 'count': count, 'errors': errors,
+                   'mean_ms': round(total / count * 1000, 3) if count else 0.0}
+            for q in QUANTILES:
+                row[f'p{int(q * 100)}_ms'] = round(Histogram.quantile(counts, q) * 1000, 3)
+            rows.append(row)
+        return rows
+
+    def render(self):
+        """Prometheus text exposition of every histogram plus the upstream providers' state."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+        lines = []
+        families = {}
+        for (family, labels), histogram in items:
+            families.setdefault(family, []).append((labels, histogram))
+        for family, series in families.items():
+            lines.append(f'# TYPE {family}_seconds histogram')
+            quantile_lines = []
+            error_lines = []
+            for labels, histogram in series:
+                counts, count, total, errors = histogram.snapshot()
+                cumulative = 0
+                for bound, bucket_count in zip(BUCKETS + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{family}_seconds_bucket{_labels(labels, le=le)} {cumulative}')
+                lines.append(f'{family}_seconds_sum{_labels(labels)} {total:.6f}')
+                lines.append(f'{family}_seconds_count{_labels(labels)} {count}')
+                error_lines.append(f'{family}_errors_total{_labels(labels)} {errors}')
+                for q in QUANTILES:
+                    quantile_lines.append(f'{family}_quantile_seconds{_labels(labels, quantile=repr(q))} '
+                                          f'{Histogram.quantile(counts, q):.6f}')
+            lines.append(f'# TYPE {family}_errors_total counter')
+            lines.extend(error_lines)
+            lines.append(f'# TYPE {family}_quantile_seconds gauge')
+            lines.extend(quantile_lines)
+
+        upstreams = upstream_health()['upstreams']
+        if upstreams:
+            lines.append('# TYPE upstream_calls_total counter')
+            for name, stats in sorted(upstreams.items()):
+                for outcome in ('successes', 'failures', 'timeouts', 'rejected', 'retries', 'hedges'):
+                    lines.append(f'upstream_calls_total{_labels((("upstream", name), ("outcome", outcome)))} '
+                                 f'{stats[outcome]}')
+            lines.append('# TYPE upstream_circuit_open gauge')
+            for name, stats in sorted(upstreams.items()):
+                lines.append(f'upstream_circuit_open{_labels((("upstream", name),))} '
+                             f'{0 if stats["circuit"] == "closed" else 1}')
+            lines.append('# TYPE upstream_in_flight gauge')
+            for name, stats in sorted(upstreams.items()):
+                lines.append(f'upstream_in_flight{_labels((("upstream", name),))} {stats["in_flight"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(items, **extra):
+    pairs = list(items) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+REGISTRY = MetricsRegistry()
+ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+PROFILE_SLOW_MS = float(os.environ.get('METRICS_PROFILE_SLOW_MS', '0') or 0)
+PROFILE_SAMPLE = float(os.environ.get('METRICS_PROFILE_SAMPLE', '1.0'))
+PROFILE_INTERVAL_MS = float(os.environ.get('METRICS_PROFILE_INTERVAL_MS', '5'))
+
+_current_trace = contextvars.ContextVar('metrics_trace', default=None)
+
+
+class RequestTrace:
+    __slots__ = ('route', 'method', 'started', 'spans', 'thread_id', 'stacks')
+
+    def __init__(self, route, method):
+        self.route = route
+        self.method = method
+        self.started = time.perf_counter()
+        self.spans = []  # (name, seconds, error)
+        self.thread_id = None  # set while the profiler samples this request
+        self.stacks = None
+
+
+class span:
+    """
+    Time a block as a named span: `with span('translate'): ...`
+
+    Labels become Prometheus labels on span_duration_seconds; keep them to a
+    small fixed set of values.
+    """
+    __slots__ = ('name', 'labels', 'started')
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = (('span', name),) + tuple(labels.items()) if labels else (('span', name),)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not ENABLED:
+            return False
+        seconds = time.perf_counter() - self.started
+        error = exc_type is not None
+        REGISTRY.observe('span_duration', self.labels, seconds, error)
+        trace = _current_trace.get()
+        if trace is not None and len(trace.spans) < MAX_TRACE_SPANS:
+            trace.spans.append((self.name, seconds, error))
+        return False
+
+
+def timed(name):
+    """Decorator form of span() for service methods."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def begin_request(route, method, sample_stacks=True):
+    """
+    Start timing a request on the current thread or task
+
+    Args:
+        route: Route pattern, e.g. '/api/tts/<audio_key>'
+        method: HTTP method
+        sample_stacks: Let the profiler sample this thread's stack; off for
+            event-loop servers, where the thread is shared by every request
+
+    Returns:
+        The trace to pass to end_request, or None while metrics are off
+    """
+    if not ENABLED:
+        return None
+    trace = RequestTrace(route, method)
+    _current_trace.set(trace)
+    if sample_stacks and PROFILE_SLOW_MS and random.random() < PROFILE_SAMPLE:
+        _profiler.watch(trace)
+    return trace
+
+
+def end_request(trace, status):
+    if trace is None:
+        return
+    seconds = time.perf_counter() - trace.started
+    _current_trace.set(None)
+    _profiler.unwatch(trace)
+    REGISTRY.observe('http_request_duration', (('route', trace.route), ('method', trace.method), ('status', status)),
+                     seconds, status >= 500)
+    if PROFILE_SLOW_MS and seconds * 1000 >= PROFILE_SLOW_MS:
+        report_slow_request(trace, seconds, status)
+
+
+def report_slow_request(trace, seconds, status):
+    """Print where a slow request spent its time: spans by total time, then the hottest sampled stacks."""
+    totals = Counter()
+    calls = Counter()
+    for name, span_seconds, _ in trace.spans:
+        totals[name] += span_seconds
+        calls[name] += 1
+    lines = [f"[SLOW] {trace.method} {trace.route} -> {status} in {seconds * 1000:.1f} ms"]
+    for name, total in totals.most_common(10):
+        lines.append(f"  span {name}: {total * 1000:.1f} ms over {calls[name]} call(s)")
+    if trace.stacks:
+        samples = sum(trace.stacks.values())
+        for stack, count in trace.stacks.most_common(5):
+            lines.append(f"  {count}/{samples} samples: {stack}")
+    print('\n'.join(lines))
+
+
+class _StackSampler:
+    """Samples the stacks of watched request threads from one background thread."""
+
+    def __init__(self):
+        self._watched = {}  # id(trace) -> trace
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, trace):
+        trace.thread_id = threading.get_ident()
+        trace.stacks = Counter()
+        with self._lock:
+            self._watched[id(trace)] = trace
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='metrics-profiler', daemon=True)
+                self._thread.start()
+
+    def unwatch(self, trace):
+        if trace.thread_id is None:
+            return
+        with self._lock:
+            self._watched.pop(id(trace), None)
+
+    def _run(self):
+        interval = PROFILE_INTERVAL_MS / 1000.0
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                watched = list(self._watched.values())
+            if not watched:
+                continue
+            frames = sys._current_frames()
+            for trace in watched:
+                frame = frames.get(trace.thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+                    frame = frame.f_back
+                trace.stacks[' > '.join(reversed(stack))] += 1
+
+
+_profiler = _StackSampler()
+
+
+def render():
+    return REGISTRY.render()
+
+
+def summary():
+    return REGISTRY.summary()
@@ -8,10 +8,11 @@ Run: python backend/minimal_app.py
 Then open test_minimal.html
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import traceback
 from translation_service import TranslationService
+from language_registry import catalog_response
 from ocr_service import OCRService
 
 app = Flask(__name__)
@@ -79,12 +80,12 @@ def translate_image():
 @app.route('/api/languages', methods=['GET'])
 def get_languages():
     try:
-        # Get languages from Google Translate API
-        from deep_translator.constants import GOOGLE_LANGUAGES_TO_CODES
-        languages = [{'code': code, 'name': name.title()} for name, code in GOOGLE_LANGUAGES_TO_CODES.items()]
-        return jsonify({'success': True, 'languages': sorted(languages, key=lambda x: x['name'])})
+        # The catalog never changes at runtime: serve the pre-serialized body
+        status, headers, body = catalog_response(request.headers)
+        return Response(body, status=status, headers=headers)
     except Exception as e:
-        # Fallback to basic languages if API fails
+        # Fallback to basic languages if the catalog can't be served
+        print(f"Error: {e}")
         fallback_languages = [
             {'code': 'en', 'name': 'English'},
             {'code': 'es', 'name': 'Spanish'},
@@ -0,0 +1,181 @@
+"""
+Request handling shared by the WSGI (app.py) and ASGI (asgi_app.py) apps.
+
+Everything here depends only on the services and on request data the app
+has already read, never on Flask's or Quart's request object, so each app
+keeps just the adapter that reads its request (synchronously or with
+await) and turns the result into its Response. The functions that touch
+services block; the ASGI app runs them on its executor.
+
+Helpers answer in one of two shapes:
+  - (payload, status, headers), which either framework can return from a view
+  - (status, headers, body) for a non-JSON body, wrapped by the app in its
+    own Response, as language_registry.catalog_response() is
+"""
+
+import json
+
+from werkzeug.datastructures import FileStorage
+
+try:
+    from .audio_decode import AudioTooLong
+    from .audio_transfer import audio_headers, multipart_body, open_audio
+except Exception:
+    from audio_decode import AudioTooLong
+    from audio_transfer import audio_headers, multipart_body, open_audio
+
+# Upper bound on the per-request flashcard audio deadline, in seconds
+MAX_AUDIO_DEADLINE = 30.0
+# How long /api/tts/<key> waits for audio that's still being synthesized
+TTS_FETCH_WAIT = 10.0
+AUDIO_MAX_AGE = 7 * 24 * 3600
+JOB_URL_PREFIX = '/api/jobs/'
+# Raw bodies the keyword and flashcard routes take as the document itself
+DOCUMENT_TYPES = ('text/plain', 'application/pdf')
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+def flag(value):
+    return value is True or str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def async_requested(options, headers):
+    """Whether the client asked for a background job: `async=true` or `Prefer: respond-async`."""
+    return flag(options.get('async', False)) or 'respond-async' in headers.get('Prefer', '')
+
+
+def inline_audio_requested(options):
+    return options.get('inline_audio', 'true').lower() not in ('0', 'false', 'no')
+
+
+def too_large_message(e, max_content_length):
+    if isinstance(e, AudioTooLong):
+        return str(e)
+    return f"Upload is larger than {max_content_length / (1024 * 1024):g} MB"
+
+
+def audio_upload(files, form):
+    """The recording and options of a multipart upload: the 'audio' field, or None."""
+    return files.get('audio'), form
+
+
+def raw_audio_upload(stream, mimetype, args):
+    """A raw audio body as a FileStorage, with the options from the query string."""
+    return FileStorage(stream, name='audio', content_type=mimetype), args
+
+
+def document_source(upload, form, mimetype, raw_body, args, data):
+    """
+    The document and options for the keyword and flashcard routes
+
+    The document is an uploaded 'file' (plain text or PDF), a raw
+    text/plain or application/pdf body, or the JSON 'text' field.
+
+    Args:
+        upload: The multipart 'file' field, or None
+        form: The multipart form fields
+        mimetype: The request's mimetype
+        raw_body: Binary stream of the body; only read for DOCUMENT_TYPES
+        args: The query string
+        data: The parsed JSON body, or None
+
+    Returns:
+        tuple: (binary stream, or the JSON text; filename; content type; options mapping)
+    """
+    if upload:
+        return upload.stream, upload.filename, upload.mimetype, form
+    if mimetype in DOCUMENT_TYPES:
+        return raw_body, '', mimetype, args
+    data = data or {}
+    return data.get('text') or data.get('source_text') or '', '', 'text/plain', data
+
+
+def flashcard_options(options):
+    """
+    defer_audio and the audio deadline of a flashcard request
+
+    Raises:
+        ValueError: If audio_deadline isn't a number
+    """
+    deadline = options.get('audio_deadline')
+    if deadline is not None:
+        deadline = min(max(float(deadline), 0.0), MAX_AUDIO_DEADLINE)
+    return flag(options.get('defer_audio', False)), deadline
+
+
+def submit_job(services, kind, params, source, options, headers, remote_addr):
+    """
+    Queue a background job and answer 202 with it
+
+    The job is polled at its Location (GET /api/jobs/<id>), or POSTed to the
+    `webhook_url` option when it finishes. Jobs are scheduled fairly between
+    tenants, named by the X-Tenant-Id header or else the client address;
+    the `priority` option (-10 to 10) orders them.
+
+    Args:
+        services: The app's ServiceContainer
+        kind: Job kind (see job_handlers.py)
+        params: JSON-able parameters for the handler
+        source: Input bytes, text or binary stream, stored with the job
+        options: The request's options
+        headers: The request's headers
+        remote_addr: The client's address
+
+    Returns:
+        tuple: (payload, status, headers)
+    """
+    tenant = headers.get('X-Tenant-Id') or remote_addr or 'anonymous'
+    try:
+        job = services.jobs.submit(kind, params, source, tenant=tenant, priority=options.get('priority', 0),
+                                   webhook_url=options.get('webhook_url'))
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}, 400, {}
+    location = JOB_URL_PREFIX + job['id']
+    return {'success': True, 'job': job, 'status_url': location}, 202, {'Location': location}
+
+
+def job_status(services, job_id):
+    """
+    GET /api/jobs/<id>: unfinished jobs answer with Retry-After: 1 for pollers
+
+    Returns:
+        tuple: (payload, status, headers)
+    """
+    job = services.jobs.get(job_id)
+    if job is None:
+        return {'success': False, 'error': 'job not found'}, 404, {}
+    return {'success': True, 'job': job}, 200, {'Retry-After': '1'} if job['finished_at'] is None else {}
+
+
+def audio_answer(services, answer, metadata, audio):
+    """
+    'audio' or 'multipart' answer for /api/voice/translate
+
+    The MP3 is streamed from the audio cache's file when it's there, so the
+    clip's bytes aren't kept in memory while a slow client reads it.
+
+    Args:
+        services: The app's ServiceContainer
+        answer: 'audio' or 'multipart'
+        metadata: The JSON fields of the answer, 'audio_url' included
+        audio: The synthesized MP3, or None if synthesis failed
+
+    Returns:
+        tuple: (status, headers, body iterable)
+    """
+    body = None
+    if audio is not None:
+        path = services.voice.get_audio_path(metadata['audio_url'].rsplit('/', 1)[-1])
+        try:
+            body = open_audio(path=path) if path else open_audio(data=audio)
+        except OSError:
+            # Evicted from the cache since
+            body = open_audio(data=audio)
+    if answer == 'multipart':
+        parts, content_type, length = multipart_body(metadata, body)
+        return 200, {'Content-Type': content_type, 'Content-Length': str(length)}, parts
+    if body is None:
+        error = json.dumps({**metadata, 'success': False, 'error': 'Speech synthesis failed'})
+        return 502, {'Content-Type': 'application/json'}, error.encode('utf-8')
+    pieces, size = body
+    return 200, {'Content-Type': 'audio/mpeg', **audio_headers(metadata, size)}, pieces
@@ -0,0 +1,258 @@
+"""
+Lazily created, shared services for the app servers.
+
+Importing a service module pulls in its provider libraries
+(deep_translator, speech_recognition, gTTS, pydub), and app.py used to
+import and build every service up front, even in a worker that only serves
+/api/translate. The container imports and builds each service on first use,
+and every component gets the same instance. For example ConversationService
+and the voice routes share the app's TranslationService and its cache.
+
+APP_FEATURES (comma-separated, default all) picks the feature groups a
+worker serves, so deployments can run slim per-feature worker pools:
+  translate     /api/translate, /api/translate/stream, /api/translate/batch, /api/translate/cache
+  voice         /api/voice/translate, /api/voice/translate/stream, /api/tts/<key>
+  vocabulary    /api/keywords, /api/flashcards, /api/tts/<key> (flashcard audio)
+  conversation  /api/conversation/*
+  practice      /api/practice/analyze
+Routes of other groups answer 404, and their services are never imported.
+/api/languages, /api/health and /metrics are always served. APP_PRELOAD=1
+builds the enabled groups' services at startup instead of on the first
+request that needs them; a group whose provider libraries can't be
+imported is then logged and disabled, and its routes answer 404.
+
+The voice, vocabulary and practice groups also run their slow work as
+background jobs (job_queue.py); a worker runs the job kinds of its own groups.
+"""
+
+import functools
+import inspect
+import os
+import threading
+
+FEATURES = ('translate', 'voice', 'vocabulary', 'conversation', 'practice')
+
+# Services each feature group's routes use
+FEATURE_SERVICES = {
+    'translate': ('translation',),
+    'voice': ('voice', 'translation', 'jobs'),
+    'vocabulary': ('flashcards', 'jobs'),
+    'conversation': ('conversation',),
+    'practice': ('practice', 'jobs'),
+}
+
+# Background job kinds (job_handlers.py) and the feature group that runs each
+JOB_KINDS = {
+    'voice_translate': 'voice',
+    'flashcards': 'vocabulary',
+    'practice_analyze': 'practice',
+}
+
+
+def parse_features(value):
+    """
+    Feature groups named in a comma-separated string; None or 'all' means every group
+
+    Raises:
+        ValueError: On an unknown group name
+    """
+    if value is None or not value.strip() or value.strip().lower() == 'all':
+        return frozenset(FEATURES)
+    features = frozenset(part.strip().lower() for part in value.split(',') if part.strip())
+    unknown = features - set(FEATURES)
+    if unknown:
+        raise ValueError(f"Unknown feature group(s): {', '.join(sorted(unknown))}; "
+                         f"expected some of {', '.join(FEATURES)}")
+    return features
+
+
+class ServiceContainer:
+    def __init__(self, features=None):
+        """
+        Args:
+            features: Comma-separated feature groups to serve; defaults to
+                the APP_FEATURES env var, else all of them
+        """
+        self.features = parse_features(os.environ.get('APP_FEATURES') if features is None else features)
+        self._instances = {}
+        # Reentrant: a factory asks the container for the services it depends on
+        self._lock = threading.RLock()
+
+    def enabled(self, feature):
+        return feature in self.features
+
+    def disable(self, feature):
+        """Stop serving a feature group, e.g. because its provider isn't installed"""
+        self.features = self.features - {feature}
+
+    def get(self, name):
+        """The shared instance of a service, created on first use"""
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    factory = getattr(self, f'_create_{name}', None)
+                    if factory is None:
+                        raise Exception(f"Unknown service: {name}")
+                    instance = self._instances[name] = factory()
+        return instance
+
+    @property
+    def translation(self):
+        return self.get('translation')
+
+    @property
+    def voice(self):
+        return self.get('voice')
+
+    @property
+    def flashcards(self):
+        return self.get('flashcards')
+
+    @property
+    def conversation(self):
+        return self.get('conversation')
+
+    @property
+    def practice(self):
+        return self.get('practice')
+
+    @property
+    def jobs(self):
+        return self.get('jobs')
+
+    def loaded(self):
+        """Names of the services created so far"""
+        return sorted(self._instances)
+
+    def preload(self):
+        """
+        Create the services of every enabled feature group now, warmed up
+
+        A group whose service can't be imported is disabled rather than
+        failing startup, so one missing provider doesn't take down the rest.
+        The job queue is left to start_jobs(), so its handlers cover only
+        the groups left.
+        """
+        for feature in FEATURES:
+            if not self.enabled(feature):
+                continue
+            try:
+                for name in FEATURE_SERVICES[feature]:
+                    if name != 'jobs':
+                        self.get(name)
+            except ImportError as e:
+                print(f"[WARN] Feature group '{feature}' disabled: {e}")
+                self.disable(feature)
+        if 'translation' in self._instances:
+            # Otherwise loaded by the first source_lang='auto' request
+            self.translation.detector.load_profiles()
+
+    def start_jobs(self):
+        """
+        Start running background jobs, if this worker serves a group that has any
+
+        Called by the servers once they serve, not on import, so tools and
+        tests importing the app don't open the database or start threads.
+        Cheap after the first call.
+        """
+        if 'jobs' not in self._instances and any(self.enabled(feature) for feature in JOB_KINDS.values()):
+            self.get('jobs')
+
+    def requires(self, *features):
+        """
+        Route decorator: the view is served only when one of `features` is enabled
+
+        Checked on every request, since preload() may disable a group after
+        the routes are registered; a disabled route answers 404 without
+        touching services. Works for both sync and async views.
+        """
+        parse_features(','.join(features))
+
+        def serving():
+            return any(self.enabled(feature) for feature in features)
+
+        def disabled():
+            return {'success': False, 'error': f"'{features[0]}' is not enabled on this server"}, 404
+
+        def decorate(view):
+            if inspect.iscoroutinefunction(view):
+                @functools.wraps(view)
+                async def guarded(*args, **kwargs):
+                    if not serving():
+                        return disabled()
+                    return await view(*args, **kwargs)
+            else:
+                @functools.wraps(view)
+                def guarded(*args, **kwargs):
+                    if not serving():
+                        return disabled()
+                    return view(*args, **kwargs)
+            return guarded
+        return decorate
+
+    def _create_translation(self):
+        try:
+            from .translation_service import TranslationService
+        except Exception:
+            from translation_service import TranslationService
+        return TranslationService()
+
+    def _create_voice(self):
+        try:
+            from .voice_service import VoiceService
+        except Exception:
+            from voice_service import VoiceService
+        return VoiceService()
+
+    def _create_flashcards(self):
+        try:
+            from .flashcard_service import FlashcardService
+        except Exception:
+            from flashcard_service import FlashcardService
+        # Voice is built on the first card that needs audio, not for /api/keywords
+        return FlashcardService(functools.partial(self.get, 'voice'))
+
+    def _create_conversation(self):
+        try:
+            from .conversation_service import ConversationService
+        except Exception:
+            from conversation_service import ConversationService
+        return ConversationService(translation_service=self.translation)
+
+    def _create_practice(self):
+        try:
+            from .practice_service import PracticeService
+        except Exception:
+            from practice_service import PracticeService
+        return PracticeService()
+
+    def _create_jobs(self):
+        try:
+            from . import job_handlers
+            from .job_queue import JobQueue
+        except Exception:
+            import job_handlers
+            from job_queue import JobQueue
+        # Handlers build their services on first use, in the job's worker thread
+        handlers = {kind: functools.partial(getattr(job_handlers, kind), self)
+                    for kind, feature in JOB_KINDS.items() if self.enabled(feature)}
+        refreshers = {kind: functools.partial(getattr(job_handlers, 'refresh_' + kind), self)
+                      for kind in handlers if hasattr(job_handlers, 'refresh_' + kind)}
+        return JobQueue(handlers, refreshers=refreshers)
+
+
+_default_services = None
+_default_services_lock = threading.Lock()
+
+
+def get_default_services():
+    """Process-wide container for the app servers, configured from APP_FEATURES."""
+    global _default_services
+    with _default_services_lock:
+        if _default_services is None:
+            _default_services = ServiceContainer()
+            if os.environ.get('APP_PRELOAD', '').lower() in ('1', 'true', 'yes'):
+                _default_services.preload()
+        return _default_services
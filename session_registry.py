@@ -0,0 +1,97 @@
+"""
+In-memory registry of active conversation sessions.
+
+Holds each session's parsed (lang_a, lang_b) pair so the per-message path
+doesn't read and re-parse it from the database. Entries are kept in
+last-use order. Sessions idle for longer than `idle_ttl` are dropped, and
+the registry never holds more than `max_sessions`. A miss falls back to
+the database.
+
+Each process keeps its own registry. A session restarted with a new pair
+in another worker is picked up here when the entry idles out, or when
+this process handles that restart itself.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from .language_registry import normalize_language
+except Exception:
+    from language_registry import normalize_language
+
+
+def parse_language_pair(language_pair):
+    """
+    Split a stored pair like 'en-es' into its two codes
+
+    Codes may contain hyphens themselves ('zh-CN-en', 'en-zh-TW'), so every
+    hyphen is tried and a split whose sides are both known languages wins.
+
+    Returns:
+        tuple: (lang_a, lang_b) as written in the pair
+
+    Raises:
+        ValueError: If the pair has no usable split
+    """
+    pair = (language_pair or '').strip()
+    splits = [(pair[:i], pair[i + 1:]) for i, ch in enumerate(pair) if ch == '-']
+    splits = [(a, b) for a, b in splits if a and b]
+    if not splits:
+        raise ValueError(f"Invalid language pair: {language_pair!r}")
+    for a, b in splits:
+        if normalize_language(a) and normalize_language(b):
+            return a, b
+    # Unknown codes go on to the provider, which reports them
+    return splits[0]
+
+
+class SessionRegistry:
+    def __init__(self, max_sessions=10000, idle_ttl=1800):
+        """
+        Args:
+            max_sessions: Most sessions held at once
+            idle_ttl: Seconds since last use after which a session is dropped
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()  # session_id -> (last used, (lang_a, lang_b))
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, session_id):
+        """The session's language pair, or None if it isn't held."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or now - entry[0] > self.idle_ttl:
+                if entry is not None:
+                    del self._sessions[session_id]
+                    self._counters['evictions'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._sessions[session_id] = (now, entry[1])
+            self._sessions.move_to_end(session_id)
+            self._counters['hits'] += 1
+            return entry[1]
+
+    def put(self, session_id, languages):
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = (now, tuple(languages))
+            self._sessions.move_to_end(session_id)
+            # Least recently used first: drop idle sessions, then any overflow
+            while self._sessions:
+                oldest_id, (last_used, _) = next(iter(self._sessions.items()))
+                if now - last_used <= self.idle_ttl and len(self._sessions) <= self.max_sessions:
+                    break
+                del self._sessions[oldest_id]
+                self._counters['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['sessions'] = len(self._sessions)
+        stats['max_sessions'] = self.max_sessions
+        return stats
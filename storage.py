@@ -0,0 +1,213 @@
+"""
+Shared SQLite storage for translator.db.
+
+Connections are opened once with WAL journaling and tuned pragmas, then
+pooled: a thread checks one out for the duration of a read or a transaction
+and hands it back, instead of connecting and closing around every query.
+WAL lets readers proceed while a writer commits, and write transactions
+start with BEGIN IMMEDIATE so writers queue on busy_timeout rather than
+failing halfway through.
+
+The schema is created and migrated when the storage is opened, tracked with
+SQLite's user_version.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Applied once per connection
+PRAGMAS = (
+    'PRAGMA synchronous = NORMAL',  # durable at WAL checkpoints; no fsync per commit
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',  # KiB
+    'PRAGMA mmap_size = 67108864',
+    'PRAGMA foreign_keys = ON',
+)
+
+# MIGRATIONS[n] brings the schema from user_version n to n + 1. Append only.
+MIGRATIONS = [
+    # 1: tables the services have always assumed exist
+    (
+        '''CREATE TABLE IF NOT EXISTS conversations (
+            session_id TEXT PRIMARY KEY,
+            language_pair TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''CREATE TABLE IF NOT EXISTS conversation_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT NOT NULL,
+            message_text TEXT NOT NULL,
+            translated_text TEXT,
+            direction TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS translation_cache (
+            cache_key TEXT PRIMARY KEY,
+            source_lang TEXT NOT NULL,
+            target_lang TEXT NOT NULL,
+            translated_text TEXT NOT NULL,
+            source_language TEXT,
+            created_at REAL NOT NULL
+        )''',
+    ),
+    # 2: history is read per session in time order
+    (
+        '''CREATE INDEX IF NOT EXISTS idx_conversation_messages_session_time
+           ON conversation_messages (conversation_id, timestamp)''',
+    ),
+    # 3: background jobs (job_queue.py)
+    (
+        '''CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            tenant TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            params TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            input_path TEXT,
+            status TEXT NOT NULL,
+            duplicate_of TEXT,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            owner TEXT,
+            lease_until REAL,
+            webhook_url TEXT,
+            webhook_status TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_jobs_status_tenant
+           ON jobs (status, tenant, priority, created_at)''',
+        '''CREATE INDEX IF NOT EXISTS idx_jobs_content_hash ON jobs (content_hash)''',
+        '''CREATE INDEX IF NOT EXISTS idx_jobs_duplicate_of ON jobs (duplicate_of)''',
+    ),
+    # 4: history is paged by id, which follows commit order (timestamps don't)
+    (
+        '''CREATE INDEX IF NOT EXISTS idx_conversation_messages_session_id
+           ON conversation_messages (conversation_id, id)''',
+    ),
+    # 5: the translation cache is pruned oldest first
+    (
+        '''CREATE INDEX IF NOT EXISTS idx_translation_cache_created_at
+           ON translation_cache (created_at)''',
+    ),
+]
+
+
+class Storage:
+    def __init__(self, db_path='translator.db', max_idle=16, busy_timeout=5.0):
+        """
+        Args:
+            db_path: SQLite database file
+            max_idle: Connections kept open for reuse
+            busy_timeout: Seconds a writer waits for the database lock
+        """
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.busy_timeout = busy_timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._counters = {'opened': 0, 'reused': 0, 'closed': 0}
+        self.migrate()
+
+    @contextmanager
+    def connection(self):
+        """Check out a pooled connection in autocommit mode."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Check out a connection inside a write transaction
+
+        Commits when the block exits normally and rolls back if it raises.
+        Keep remote calls out of the block: the write lock is held throughout.
+        """
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def schema_version(self):
+        with self.connection() as conn:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def migrate(self):
+        """Bring the schema up to date; safe to run from several processes at once."""
+        with self.connection() as conn:
+            try:
+                conn.execute('PRAGMA journal_mode = WAL')
+            except sqlite3.Error as e:
+                # e.g. filesystems without shared memory support; rollback journal still works
+                print(f"Storage: WAL unavailable, using default journal: {e}")
+        with self.transaction() as conn:
+            # Read under the write lock so concurrent workers don't apply a step twice
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for step in range(version, len(MIGRATIONS)):
+                for statement in MIGRATIONS[step]:
+                    conn.execute(statement)
+            if version < len(MIGRATIONS):
+                conn.execute(f'PRAGMA user_version = {len(MIGRATIONS)}')
+                print(f"Storage: migrated {self.db_path} from schema {version} to {len(MIGRATIONS)}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['idle'] = len(self._idle)
+        return stats
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._counters['closed'] += len(idle)
+        for conn in idle:
+            conn.close()
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                self._counters['reused'] += 1
+                return self._idle.pop()
+            self._counters['opened'] += 1
+        # isolation_level=None: no implicit BEGIN, transactions are explicit
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None,
+                               check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+            self._counters['closed'] += 1
+        conn.close()
+
+
+_default_storages = {}
+_default_storages_lock = threading.Lock()
+
+
+def get_default_storage(db_path='translator.db'):
+    """Process-wide Storage per database file, shared by every service."""
+    key = os.path.abspath(db_path)
+    with _default_storages_lock:
+        storage = _default_storages.get(key)
+        if storage is None:
+            storage = _default_storages[key] = Storage(db_path)
+        return storage
@@ -0,0 +1,60 @@
+"""
+Both app servers start and answer with the default settings (APP_FEATURES unset).
+
+Run: python -m pytest test_app_startup.py
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from service_container import ServiceContainer
+
+
+class MissingPractice(ServiceContainer):
+    def _create_practice(self):
+        raise ModuleNotFoundError("No module named 'practice_service'")
+
+
+def test_preload_disables_group_with_missing_provider():
+    services = MissingPractice(features='practice')
+    view = services.requires('practice')(lambda: 'served')
+
+    services.preload()
+
+    assert not services.enabled('practice')
+    assert view()[1] == 404
+
+
+def test_requires_serves_enabled_sync_and_async_views():
+    services = ServiceContainer(features='translate')
+
+    async def async_view():
+        return 'served'
+
+    assert services.requires('translate')(lambda: 'served')() == 'served'
+    assert asyncio.run(services.requires('translate')(async_view)()) == 'served'
+    assert services.requires('conversation')(lambda: 'served')()[1] == 404
+
+
+def test_flask_app_starts():
+    import app
+
+    client = app.app.test_client()
+    assert client.get('/api/health').status_code == 200
+    assert client.get('/api/languages').status_code == 200
+
+
+def test_asgi_app_starts():
+    import asgi_app
+
+    async def serve():
+        async with asgi_app.app.test_app() as test_app:
+            client = test_app.test_client()
+            assert (await client.get('/api/health')).status_code == 200
+            assert (await client.get('/api/languages')).status_code == 200
+            # Startup disabled any group whose provider can't be imported; the rest are served
+            assert asgi_app.services.enabled('translate')
+
+    asyncio.run(serve())
@@ -0,0 +1,136 @@
+"""
+Audio container sniffing and in-memory WAV decoding.
+
+Run: python -m pytest test_audio_decode.py
+"""
+import io
+import os
+import shutil
+import subprocess
+import sys
+import wave
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import audio_decode
+from audio_decode import RECOGNIZER_RATE, AudioTooLong, decode_audio, sniff_format
+
+needs_ffmpeg = pytest.mark.skipif(not shutil.which('ffmpeg'), reason='ffmpeg is not installed')
+
+
+class Unseekable(io.RawIOBase):
+    """A request body: read once, front to back."""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        piece = self._data.read(len(buffer))
+        buffer[:len(piece)] = piece
+        return len(piece)
+
+
+def make_wav(samples, rate=16000, channels=1, width=2):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(width)
+        wav.setframerate(rate)
+        wav.writeframes(np.asarray(samples, dtype='<i2').tobytes())
+    return buffer.getvalue()
+
+
+def test_sniff_format_from_magic_bytes():
+    assert sniff_format(make_wav([0] * 10)) == 'wav'
+    assert sniff_format(b'\x1a\x45\xdf\xa3' + b'\0' * 8) == 'webm'
+    assert sniff_format(b'OggS' + b'\0' * 8) == 'ogg'
+    assert sniff_format(b'fLaC' + b'\0' * 8) == 'flac'
+    assert sniff_format(b'ID3\x04' + b'\0' * 8) == 'mp3'
+    assert sniff_format(b'\0\0\0\x20ftypM4A ') == 'mp4'
+    assert sniff_format(b'plain text') is None
+
+
+def test_mono_wav_decodes_from_bytes_and_stream():
+    samples = np.arange(-800, 800, dtype='<i2')
+    data = make_wav(samples)
+
+    pcm, rate = decode_audio(data)
+    assert rate == 16000
+    assert np.array_equal(np.frombuffer(pcm, dtype='<i2'), samples)
+
+    pcm, rate = decode_audio(io.BytesIO(data))
+    assert np.array_equal(np.frombuffer(pcm, dtype='<i2'), samples)
+
+
+def test_stereo_wav_is_mixed_down():
+    left = np.full(100, 1000, dtype='<i2')
+    right = np.full(100, 3000, dtype='<i2')
+    interleaved = np.column_stack((left, right)).ravel()
+    pcm, rate = decode_audio(make_wav(interleaved, channels=2))
+    assert np.all(np.frombuffer(pcm, dtype='<i2') == 2000)
+
+
+def test_out_of_range_rate_is_resampled():
+    pcm, rate = decode_audio(make_wav(np.zeros(96000 // 10), rate=96000))
+    assert rate == RECOGNIZER_RATE
+    assert len(np.frombuffer(pcm, dtype='<i2')) == RECOGNIZER_RATE // 10
+
+
+def test_recording_past_the_limit_is_refused():
+    data = make_wav(np.zeros(16000 * 2))
+    with pytest.raises(AudioTooLong):
+        decode_audio(data, max_seconds=1)
+    with pytest.raises(AudioTooLong):
+        decode_audio(io.BytesIO(data), max_seconds=1)
+    assert decode_audio(data, max_seconds=2)[1] == 16000
+
+
+def test_empty_upload_is_refused():
+    with pytest.raises(Exception, match='empty upload'):
+        decode_audio(b'')
+    with pytest.raises(Exception, match='empty upload'):
+        decode_audio(io.BytesIO(b''))
+
+
+@needs_ffmpeg
+def test_mp4_with_index_at_the_end_decodes(tmp_path):
+    # The mp4 muxer writes the moov atom after the audio unless told to move it
+    path = str(tmp_path / 'late.m4a')
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'sine=frequency=440:duration=30',
+                    '-c:a', 'aac', path], check=True)
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert sniff_format(data) == 'mp4'
+
+    for source in (data, io.BytesIO(data), Unseekable(data)):
+        pcm, rate = decode_audio(source)
+        assert rate == RECOGNIZER_RATE
+        assert abs(len(pcm) // 2 - 30 * RECOGNIZER_RATE) < RECOGNIZER_RATE // 10
+
+
+def test_failed_pipe_decode_is_retried_from_a_file(monkeypatch):
+    runs = []
+
+    def run_ffmpeg(source, fmt, max_seconds, path=None):
+        runs.append(path)
+        if path is None:
+            raise audio_decode._DecodeFailed('Unable to decode audio file - invalid format or corrupted data')
+        with open(path, 'rb') as f:
+            return f.read(), RECOGNIZER_RATE
+
+    monkeypatch.setattr(audio_decode, '_run_ffmpeg', run_ffmpeg)
+    data = b'OggS' + b'\0' * 100
+
+    assert decode_audio(data) == (data, RECOGNIZER_RATE)
+    assert decode_audio(io.BytesIO(data)) == (data, RECOGNIZER_RATE)
+    assert runs[0] is None and runs[1] is not None and not os.path.exists(runs[1])
+
+    # A body that can't be read twice gets no second try
+    with pytest.raises(Exception, match='invalid format'):
+        decode_audio(Unseekable(data))
@@ -0,0 +1,68 @@
+"""
+Conversation history keyset cursors and paging, against a stand-in provider.
+
+Run: python -m pytest test_conversation_service.py
+"""
+import base64
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conversation_service import ConversationService, decode_cursor, encode_cursor
+from corpus_index import CorpusIndex
+from storage import Storage
+from test_translation_service import FakePool, make_service
+
+
+def make_conversation(tmp_path, write_behind=False):
+    return ConversationService(storage=Storage(str(tmp_path / 'conversation.db')), write_behind=write_behind,
+                               corpus=CorpusIndex(), translation_service=make_service(FakePool()))
+
+
+def test_cursor_round_trip_and_legacy_format():
+    for message_id in (1, 42, 10 ** 12):
+        assert decode_cursor(encode_cursor(message_id)) == message_id
+    legacy = base64.urlsafe_b64encode(b'2024-01-01T00:00:00|17').decode('ascii')
+    assert decode_cursor(legacy) == 17
+    for bad in ('!!!', encode_cursor('abc'), ''):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+@pytest.mark.parametrize('write_behind', [False, True])
+def test_history_pages_follow_insert_order(tmp_path, write_behind):
+    service = make_conversation(tmp_path, write_behind)
+    service.start_conversation('s1', 'en-es')
+    service.start_conversation('s2', 'en-es')
+    for i in range(5):
+        service.add_message('s1', f'message {i}', 'a_to_b')
+        service.add_message('s2', f'other {i}', 'a_to_b')
+
+    seen = []
+    cursor = None
+    while True:
+        page = service.get_history_page('s1', after=cursor, limit=2)
+        seen.extend(message['original'] for message in page['messages'])
+        cursor = page['next_cursor']
+        if not page['has_more']:
+            break
+    assert seen == [f'message {i}' for i in range(5)]
+    assert cursor == service.latest_cursor('s1')
+
+    # Nothing new past the last cursor; the cursor is handed back unchanged
+    page = service.get_history_page('s1', after=cursor, limit=2)
+    assert page == {'messages': [], 'next_cursor': cursor, 'has_more': False}
+
+    service.add_message('s1', 'late', 'b_to_a')
+    page = service.get_history_page('s1', after=cursor)
+    assert [message['original'] for message in page['messages']] == ['late']
+    assert page['messages'][0]['translated'] == '[en] late'
+
+
+def test_invalid_cursor_is_a_value_error(tmp_path):
+    service = make_conversation(tmp_path)
+    with pytest.raises(ValueError):
+        service.get_history_page('s1', after='not-a-cursor')
@@ -0,0 +1,46 @@
+"""
+Webhook URL checks for background jobs.
+
+Run: python -m pytest test_job_queue.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from job_queue import check_webhook_url
+
+
+@pytest.mark.parametrize('url', [
+    'http://127.0.0.1/hook',
+    'http://localhost:8080/hook',
+    'http://10.1.2.3/hook',
+    'https://192.168.0.10/hook',
+    'http://169.254.169.254/latest/meta-data',
+    'http://[::1]/hook',
+    'http://0.0.0.0/hook',
+])
+def test_private_addresses_are_refused(url):
+    with pytest.raises(ValueError, match='public address'):
+        check_webhook_url(url)
+
+
+@pytest.mark.parametrize('url', ['ftp://8.8.8.8/hook', 'file:///etc/passwd', 'http:///hook', 'not a url'])
+def test_non_http_urls_are_refused(url):
+    with pytest.raises(ValueError, match='http or https'):
+        check_webhook_url(url)
+    with pytest.raises(ValueError):
+        check_webhook_url(url, allow_private=True)
+
+
+def test_unresolvable_host_is_refused():
+    with pytest.raises(ValueError, match="can't be resolved"):
+        check_webhook_url('http://host.invalid/hook')
+
+
+def test_public_and_allowed_private_addresses_pass():
+    check_webhook_url('https://8.8.8.8/hook')
+    check_webhook_url('http://[2001:4860:4860::8888]:8443/hook')
+    check_webhook_url('http://127.0.0.1/hook', allow_private=True)
@@ -0,0 +1,70 @@
+"""
+Language code normalization and the /api/languages conditional response.
+
+Run: python -m pytest test_language_registry.py
+"""
+import gzip
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from language_registry import catalog_response, normalize_language, stt_locale, tesseract_code
+
+
+def test_normalize_language_accepts_every_format():
+    assert normalize_language('hin') == 'hi'
+    assert normalize_language('ENG') == 'en'
+    assert normalize_language('zh-Hant-TW') == 'zh-TW'
+    assert normalize_language('chi_sim') == 'zh-CN'
+    assert normalize_language('he') == 'iw'
+    assert normalize_language('pt-BR') == 'pt'
+    assert normalize_language('German') == 'de'
+    assert normalize_language('auto') == 'auto'
+    assert normalize_language('xx-unknown') is None
+
+
+def test_stt_locale_and_tesseract_code():
+    assert stt_locale('en-gb') == 'en-GB'
+    assert stt_locale('hi') == 'hi-IN'
+    assert stt_locale('klingon') == 'klingon'
+    assert tesseract_code('ja') == 'jpn'
+
+
+def test_catalog_response_plain_and_gzip():
+    status, headers, body = catalog_response({})
+    assert status == 200
+    assert 'Content-Encoding' not in headers
+    languages = json.loads(body)['languages']
+    assert {'code': 'en', 'name': 'English'} in languages
+
+    status, gz_headers, gz_body = catalog_response({'Accept-Encoding': 'gzip, deflate'})
+    assert gz_headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(gz_body) == body
+    assert gz_headers['ETag'] != headers['ETag']
+
+
+def test_catalog_response_not_modified():
+    _, headers, _ = catalog_response({})
+    status, not_modified, body = catalog_response({'If-None-Match': headers['ETag']})
+    assert (status, body) == (304, b'')
+    assert not_modified['ETag'] == headers['ETag']
+    assert catalog_response({'If-None-Match': '"stale"'})[0] == 200
+
+
+def test_apps_serve_the_same_catalog():
+    import app
+    import asyncio
+    import asgi_app
+
+    flask_response = app.app.test_client().get('/api/languages', headers={'Accept-Encoding': 'gzip'})
+
+    async def get():
+        response = await asgi_app.app.test_client().get('/api/languages', headers={'Accept-Encoding': 'gzip'})
+        return response.status_code, response.headers, await response.get_data()
+
+    status, headers, body = asyncio.run(get())
+    assert flask_response.status_code == status == 200
+    assert flask_response.headers['ETag'] == headers['ETag']
+    assert flask_response.data == body
@@ -0,0 +1,111 @@
+"""
+Request handling shared by app.py and asgi_app.py, with stand-in services.
+
+Run: python -m pytest test_route_helpers.py
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from route_helpers import (async_requested, audio_answer, document_source, flashcard_options, job_status,
+                           submit_job)
+
+
+class FakeJobs:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, kind, params, source, tenant='default', priority=0, webhook_url=None):
+        if webhook_url == 'http://127.0.0.1/':
+            raise ValueError('webhook_url must point to a public address')
+        self.submitted.append((kind, tenant, priority))
+        return {'id': 'abc', 'finished_at': None}
+
+    def get(self, job_id):
+        return {'id': job_id, 'finished_at': None} if job_id == 'abc' else None
+
+
+class FakeVoice:
+    def get_audio_path(self, key, timeout=None):
+        return None
+
+
+def fake_services():
+    return types.SimpleNamespace(jobs=FakeJobs(), voice=FakeVoice())
+
+
+def test_async_requested_by_option_or_prefer_header():
+    assert async_requested({'async': 'true'}, {})
+    assert async_requested({}, {'Prefer': 'respond-async, wait=5'})
+    assert not async_requested({'async': '0'}, {})
+
+
+def test_document_source_picks_upload_then_raw_body_then_json():
+    upload = types.SimpleNamespace(stream=io.BytesIO(b'text'), filename='a.txt', mimetype='text/plain')
+    assert document_source(upload, {'language': 'de'}, 'multipart/form-data', None, {}, None)[1:] == \
+        ('a.txt', 'text/plain', {'language': 'de'})
+    body = io.BytesIO(b'raw')
+    assert document_source(None, {}, 'text/plain', body, {'language': 'fr'}, None) == \
+        (body, '', 'text/plain', {'language': 'fr'})
+    assert document_source(None, {}, 'application/json', None, {}, {'source_text': 'hi'})[0] == 'hi'
+    assert document_source(None, {}, 'application/json', None, {}, None)[0] == ''
+
+
+def test_flashcard_options_clamp_deadline():
+    assert flashcard_options({}) == (False, None)
+    assert flashcard_options({'defer_audio': 'yes', 'audio_deadline': '999'}) == (True, 30.0)
+    assert flashcard_options({'audio_deadline': -1}) == (False, 0.0)
+
+
+def test_submit_job_answers_202_with_location():
+    services = fake_services()
+    payload, status, headers = submit_job(services, 'flashcards', {}, 'text', {'priority': 3},
+                                          {'X-Tenant-Id': 'team-a'}, '10.0.0.1')
+    assert status == 202
+    assert headers == {'Location': '/api/jobs/abc'}
+    assert payload['status_url'] == '/api/jobs/abc'
+    assert services.jobs.submitted == [('flashcards', 'team-a', 3)]
+
+    payload, status, _ = submit_job(services, 'flashcards', {}, 'text', {'webhook_url': 'http://127.0.0.1/'},
+                                    {}, '10.0.0.1')
+    assert status == 400 and not payload['success']
+
+
+def test_job_status_asks_pollers_to_retry():
+    services = fake_services()
+    assert job_status(services, 'abc')[1:] == (200, {'Retry-After': '1'})
+    assert job_status(services, 'missing')[1] == 404
+
+
+def test_audio_answer_streams_audio_or_reports_failed_synthesis():
+    services = fake_services()
+    metadata = {'success': True, 'source_text': 'hola', 'translated_text': 'hello', 'audio_url': '/api/tts/k'}
+    status, headers, body = audio_answer(services, 'audio', metadata, b'mp3-bytes')
+    assert status == 200 and headers['Content-Type'] == 'audio/mpeg'
+    assert b''.join(body) == b'mp3-bytes'
+    assert headers['X-Translated-Text'] == 'hello'
+
+    status, headers, body = audio_answer(services, 'audio', {**metadata, 'audio_url': None}, None)
+    assert status == 502 and json.loads(body)['error'] == 'Speech synthesis failed'
+
+    status, headers, body = audio_answer(services, 'multipart', metadata, b'mp3-bytes')
+    assert headers['Content-Type'].startswith('multipart/mixed')
+    assert int(headers['Content-Length']) == len(b''.join(body))
+
+
+def test_both_apps_answer_unknown_job_alike():
+    import app
+    import asgi_app
+
+    flask_response = app.app.test_client().get('/api/jobs/unknown')
+
+    async def get():
+        response = await asgi_app.app.test_client().get('/api/jobs/unknown')
+        return response.status_code, await response.get_json()
+
+    assert (flask_response.status_code, flask_response.get_json()) == asyncio.run(get())
@@ -0,0 +1,84 @@
+"""
+SingleFlight: concurrent callers of one key share a single execution.
+
+Run: python -m pytest test_single_flight.py
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from single_flight import SingleFlight
+
+WAITERS = 4
+
+
+def run_collapsed(flight, fn):
+    """Call flight.do('key', fn) from WAITERS + 1 threads while fn holds the leader; returns the outcomes."""
+    release = threading.Event()
+    outcomes = []
+    lock = threading.Lock()
+
+    def leader_fn():
+        release.wait()
+        return fn()
+
+    def call(target):
+        try:
+            outcome = flight.do('key', target)
+        except Exception as e:
+            outcome = e
+        with lock:
+            outcomes.append(outcome)
+
+    leader = threading.Thread(target=call, args=(leader_fn,))
+    leader.start()
+    while flight.stats()['in_flight'] == 0:
+        threading.Event().wait(0.001)
+    followers = [threading.Thread(target=call, args=(fn,)) for _ in range(WAITERS)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()['collapsed'] < WAITERS:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+    return outcomes
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    executions = []
+
+    def fn():
+        executions.append(1)
+        return 'result'
+
+    assert run_collapsed(flight, fn) == ['result'] * (WAITERS + 1)
+    assert len(executions) == 1
+    stats = flight.stats()
+    assert (stats['calls'], stats['executions'], stats['collapsed'], stats['in_flight']) == (WAITERS + 1, 1, WAITERS, 0)
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+
+    def fn():
+        raise ValueError('provider failed')
+
+    outcomes = run_collapsed(flight, fn)
+    assert len(outcomes) == WAITERS + 1
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert flight.stats()['errors'] == 1
+
+
+def test_sequential_calls_each_execute():
+    flight = SingleFlight()
+    assert flight.do('key', lambda: 1) == 1
+    assert flight.do('key', lambda: 2) == 2
+    with pytest.raises(KeyError):
+        flight.do('key', lambda: {}['missing'])
+    assert flight.stats()['executions'] == 3
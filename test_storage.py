@@ -0,0 +1,58 @@
+"""
+Storage schema migrations and the pooled transaction helpers.
+
+Run: python -m pytest test_storage.py
+"""
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from storage import MIGRATIONS, Storage
+
+
+def index_names(storage):
+    with storage.connection() as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_fresh_database_reaches_latest_schema(tmp_path):
+    storage = Storage(str(tmp_path / 'fresh.db'))
+    assert storage.schema_version() == len(MIGRATIONS)
+    assert {'idx_conversation_messages_session_id', 'idx_translation_cache_created_at',
+            'idx_jobs_status_tenant'} <= index_names(storage)
+
+
+def test_partially_migrated_database_is_upgraded(tmp_path):
+    db_path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(db_path)
+    for step in MIGRATIONS[:2]:
+        for statement in step:
+            conn.execute(statement)
+    conn.execute("INSERT INTO conversations (session_id, language_pair) VALUES ('s1', 'en-es')")
+    conn.execute('PRAGMA user_version = 2')
+    conn.commit()
+    conn.close()
+
+    storage = Storage(db_path)
+    assert storage.schema_version() == len(MIGRATIONS)
+    assert 'idx_jobs_content_hash' in index_names(storage)
+    with storage.connection() as conn:
+        assert conn.execute('SELECT language_pair FROM conversations').fetchall() == [('en-es',)]
+
+    # Reopening applies nothing twice
+    assert Storage(db_path).schema_version() == len(MIGRATIONS)
+
+
+def test_transaction_rolls_back_on_error(tmp_path):
+    storage = Storage(str(tmp_path / 'tx.db'))
+    with pytest.raises(RuntimeError):
+        with storage.transaction() as conn:
+            conn.execute("INSERT INTO conversations (session_id, language_pair) VALUES ('s1', 'en-es')")
+            raise RuntimeError('abort')
+    with storage.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM conversations').fetchone()[0] == 0
+    assert storage.stats()['reused'] >= 1
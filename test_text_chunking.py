@@ -0,0 +1,56 @@
+"""
+Document splitting: pieces stay under the limit and rejoin to the original text.
+
+Run: python -m pytest test_text_chunking.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from text_chunking import split_document, split_line
+
+DOCUMENT = (
+    "# Heading\n"
+    "\n"
+    "First sentence here. Second sentence follows! A third one?\n"
+    "  - bullet item one\n"
+    "  - bullet item two\n"
+    "\n\n"
+    "    indented paragraph with a verylongunbrokenwordthatexceedsthelimit inside\n"
+    "----\n"
+)
+
+
+def rejoin(paragraphs):
+    return ''.join(text for parts in paragraphs for _, text in parts)
+
+
+def test_document_rejoins_exactly():
+    for max_chars in (8, 20, 5000):
+        assert rejoin(split_document(DOCUMENT, max_chars)) == DOCUMENT
+
+
+def test_translatable_pieces_fit_the_limit():
+    paragraphs = split_document(DOCUMENT, 20)
+    pieces = [text for parts in paragraphs for translate, text in parts if translate]
+    assert pieces
+    assert all(len(piece) <= 20 for piece in pieces)
+
+
+def test_layout_is_kept_out_of_translation():
+    paragraphs = split_document(DOCUMENT, 5000)
+    verbatim = [text for parts in paragraphs for translate, text in parts if not translate]
+    assert '# ' in verbatim
+    assert '- ' in verbatim
+    assert '----' in verbatim
+    translated = [text for parts in paragraphs for translate, text in parts if translate]
+    assert 'Heading' in translated
+    assert 'bullet item one' in translated
+
+
+def test_split_line_prefers_sentence_ends():
+    pieces = split_line('One two three. Four five six.', 16)
+    assert pieces[0::2] == ['One two three.', 'Four five six.']
+    assert ''.join(pieces) == 'One two three. Four five six.'
+    assert split_line('abcdefghij', 4)[0::2] == ['abcd', 'efgh', 'ij']
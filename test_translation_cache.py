@@ -0,0 +1,77 @@
+"""
+TranslationCache: the memory tier, the SQLite tier behind it, and pruning.
+
+Run: python -m pytest test_translation_cache.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import translation_cache
+from translation_cache import TranslationCache
+
+RESULT = {'translated_text': 'hola', 'source_language': 'en', 'target_language': 'es'}
+
+
+def test_memory_tier_normalizes_keys_and_returns_copies():
+    cache = TranslationCache(db_path=None)
+    cache.set('  hello ', 'en', 'es', RESULT)
+
+    value = cache.get('hello', 'en', 'es')
+    assert value == RESULT
+    value['translated_text'] = 'changed'
+    assert cache.get('hello', 'en', 'es') == RESULT
+    assert cache.get('hello', 'en', 'fr') is None
+    assert cache.stats()['memory_hits'] == 2
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = TranslationCache(max_entries=2, db_path=None)
+    cache.set('a', 'en', 'es', RESULT)
+    cache.set('b', 'en', 'es', RESULT)
+    cache.get('a', 'en', 'es')
+    cache.set('c', 'en', 'es', RESULT)
+
+    assert cache.get('b', 'en', 'es') is None
+    assert cache.get('a', 'en', 'es') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_expired_memory_entry_is_a_miss():
+    cache = TranslationCache(ttl=-1, db_path=None)
+    cache.set('hello', 'en', 'es', RESULT)
+
+    assert cache.get('hello', 'en', 'es') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_disk_tier_survives_a_new_cache_and_is_promoted(tmp_path):
+    db_path = str(tmp_path / 'cache.db')
+    TranslationCache(db_path=db_path).set('hello', 'en', 'es', RESULT)
+
+    cache = TranslationCache(db_path=db_path)
+    assert cache.get('hello', 'en', 'es') == RESULT
+    assert cache.get('hello', 'en', 'es') == RESULT
+    stats = cache.stats()
+    assert (stats['disk_hits'], stats['memory_hits']) == (1, 1)
+
+
+def test_prune_drops_expired_rows_then_the_oldest_past_the_cap(tmp_path, monkeypatch):
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(translation_cache.time, 'time', lambda: next(clock))
+    cache = TranslationCache(db_path=str(tmp_path / 'cache.db'), db_ttl=100, db_max_entries=2)
+    for text in ('one', 'two', 'three', 'four'):
+        cache.set(text, 'en', 'es', RESULT)
+
+    assert cache.prune(1010) == 2
+    cache._entries.clear()
+    assert cache.get('one', 'en', 'es') is None
+    assert cache.get('two', 'en', 'es') is None
+    assert cache.get('four', 'en', 'es') == RESULT
+
+    # 'three' was stored at 1002 and is past db_ttl by now; 'four' is not
+    assert cache.prune(1102.5) == 1
+    cache._entries.clear()
+    assert cache.get('three', 'en', 'es') is None
+    assert cache.get('four', 'en', 'es') == RESULT
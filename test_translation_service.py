@@ -0,0 +1,62 @@
+"""
+TranslationService batching and document translation, against a stand-in provider.
+
+Run: python -m pytest test_translation_service.py
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from translation_cache import TranslationCache
+from translation_service import TranslationService
+from upstream import Upstream
+
+
+class FakePool:
+    """Prefixes every line with the target language; fails the first `failures` calls."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def translate(self, text, source, target):
+        with self._lock:
+            self.calls += 1
+            if self.calls <= self.failures:
+                raise ConnectionError('provider unavailable')
+        return '\n'.join(f'[{target}] {line}' for line in text.split('\n'))
+
+
+def make_service(pool, attempts=3):
+    upstream = Upstream('test', deadline=5.0, attempts=attempts, backoff=0.001, hedge=False)
+    return TranslationService(cache=TranslationCache(db_path=None), pool=pool, upstream=upstream)
+
+
+def test_document_piece_is_tried_only_upstream_attempts_times():
+    pool = FakePool(failures=100)
+    service = make_service(pool, attempts=3)
+    with pytest.raises(Exception):
+        service.translate_document('A single paragraph that never translates.', 'en', 'de')
+    assert pool.calls == 3
+
+
+def test_document_recovers_within_upstream_retries():
+    pool = FakePool(failures=1)
+    service = make_service(pool)
+    result = service.translate_document('First paragraph.\n\nSecond paragraph.', 'en', 'de')
+    assert result['translated_text'] == '[de] First paragraph.\n\n[de] Second paragraph.'
+
+
+def test_translate_many_realigns_packed_lines():
+    pool = FakePool()
+    service = make_service(pool)
+    texts = ['one', 'two', 'one', 'three', {'text': 'four', 'target_lang': 'fr'}]
+    results = service.translate_many(texts, 'en', 'de')
+    assert [r['translated_text'] for r in results] == ['[de] one', '[de] two', '[de] one', '[de] three', '[fr] four']
+    # One pack per language pair, duplicates sent once
+    assert pool.calls == 2
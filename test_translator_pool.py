@@ -0,0 +1,67 @@
+"""
+TranslatorPool clients against a stand-in HTTP session.
+
+Run: python -m pytest test_translator_pool.py
+"""
+import html
+import os
+import sys
+import types
+
+import deep_translator.google
+import pytest
+import requests
+from deep_translator.exceptions import TooManyRequests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from translator_pool import PooledGoogleTranslator, TranslatorPool
+
+
+class FakeSession:
+    """Answers like translate.google.com/m, prefixing the text with the target language."""
+
+    def __init__(self, status=200, echo=False):
+        self.status = status
+        self.echo = echo
+        self.requests = []
+
+    def get(self, url, params=None, proxies=None, timeout=None):
+        self.requests.append((url, dict(params), timeout))
+        text = params['q'] if self.echo else f"[{params['tl']}] {params['q']}"
+        body = f'<html><body><div class="result-container">{html.escape(text)}</div></body></html>'
+        return types.SimpleNamespace(status_code=self.status, text=body, close=lambda: None)
+
+
+def test_requests_go_through_the_given_session():
+    session = FakeSession()
+    client = PooledGoogleTranslator(session, source='en', target='de', base_url='http://stub/m', timeout=3)
+    assert client.translate(' hello ') == '[de] hello'
+    assert session.requests == [('http://stub/m', {'tl': 'de', 'sl': 'en', 'q': 'hello'}, 3)]
+    # Nothing about the call is left on the client, so it can be reused for the next one
+    assert client._url_params == {}
+    assert deep_translator.google.requests is requests
+
+
+def test_hl_is_dropped_once_when_the_text_is_echoed():
+    session = FakeSession(echo=True)
+    client = PooledGoogleTranslator(session, source='en', target='de')
+    client._url_params['hl'] = 'en'
+    assert client.translate('Berlin') == 'Berlin'
+    assert ['hl' in params for _, params, _ in session.requests] == [True, False]
+    assert client._url_params == {'hl': 'en'}
+
+
+def test_rate_limited_answer_raises():
+    client = PooledGoogleTranslator(FakeSession(status=429), source='en', target='de')
+    with pytest.raises(TooManyRequests):
+        client.translate('hello')
+
+
+def test_pool_reuses_clients_per_language_pair():
+    pool = TranslatorPool(base_url='http://stub/m')
+    pool.session = FakeSession()
+    assert pool.translate('hello', 'en', 'de') == '[de] hello'
+    assert pool.translate('bye', 'en', 'de') == '[de] bye'
+    assert pool.translate('hello', 'en', 'fr') == '[fr] hello'
+    assert pool.stats() == {'clients_created': 2, 'clients_reused': 1}
@@ -0,0 +1,85 @@
+"""
+Upstream retries, permanent errors and the circuit breaker.
+
+Run: python -m pytest test_upstream.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from upstream import CircuitBreaker, CircuitOpenError, Upstream
+
+
+class Flaky:
+    """Raises `error` for the first `failures` calls, then answers 'ok'."""
+
+    def __init__(self, failures, error=ConnectionError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error('provider failed')
+        return 'ok'
+
+
+def make_upstream(**kwargs):
+    options = {'deadline': 5.0, 'attempts': 3, 'backoff': 0.001, 'hedge': False}
+    options.update(kwargs)
+    return Upstream('test', **options)
+
+
+def test_transient_errors_are_retried():
+    fn = Flaky(failures=2)
+    upstream = make_upstream()
+    assert upstream.call(fn) == 'ok'
+    assert fn.calls == 3
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_last_error_is_raised_once_attempts_run_out():
+    fn = Flaky(failures=10)
+    with pytest.raises(ConnectionError):
+        make_upstream().call(fn)
+    assert fn.calls == 3
+
+
+def test_permanent_errors_are_not_retried_or_counted():
+    fn = Flaky(failures=10, error=ValueError)
+    upstream = make_upstream(permanent=(ValueError,), failure_threshold=1)
+    with pytest.raises(ValueError):
+        upstream.call(fn)
+    assert fn.calls == 1
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_after_threshold_failed_calls():
+    fn = Flaky(failures=100)
+    upstream = make_upstream(attempts=2, failure_threshold=2, reset_timeout=60.0)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            upstream.call(fn)
+    # Each failed call counts once, however many attempts it made
+    assert upstream.breaker.state == CircuitBreaker.OPEN
+    assert fn.calls == 4
+
+    with pytest.raises(CircuitOpenError):
+        upstream.call(fn)
+    assert fn.calls == 4
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,68 @@
+"""
+Voice activity detection and chunking for the recognizer.
+
+Run: python -m pytest test_vad.py
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vad import PAD_MS, detect_speech, split_for_recognition
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=8000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * RATE), dtype=np.int16)
+
+
+def test_digital_silence_has_no_speech():
+    assert detect_speech(silence(2), RATE) == []
+
+
+def test_speech_is_trimmed_to_its_span_with_padding():
+    samples = np.concatenate((silence(1), tone(1), silence(1)))
+    [(start, end)] = detect_speech(samples, RATE)
+    pad = RATE * PAD_MS // 1000
+    assert RATE - pad - RATE // 100 <= start <= RATE - pad + RATE // 100
+    assert 2 * RATE + pad - RATE // 100 <= end <= 2 * RATE + pad + RATE // 100
+
+
+def test_separate_utterances_stay_separate_and_short_pauses_are_bridged():
+    apart = np.concatenate((tone(0.5), silence(1.5), tone(0.5)))
+    assert len(detect_speech(apart, RATE)) == 2
+    bridged = np.concatenate((tone(0.5), silence(0.1), tone(0.5)))
+    assert len(detect_speech(bridged, RATE)) == 1
+
+
+def test_clicks_are_dropped():
+    samples = np.concatenate((silence(1), tone(0.03), silence(1)))
+    assert detect_speech(samples, RATE) == []
+
+
+def test_clip_without_speech_is_still_sent_whole():
+    assert split_for_recognition(silence(1), RATE) == [(0, RATE)]
+    short = silence(0.01)
+    assert split_for_recognition(short, RATE) == [(0, len(short))]
+    assert split_for_recognition(np.zeros(0, dtype=np.int16), RATE) == []
+
+
+def test_long_recordings_are_chunked_under_the_limit():
+    samples = np.concatenate([np.concatenate((tone(1.5), silence(0.5))) for _ in range(5)])
+    chunks = split_for_recognition(samples, RATE, max_chunk_seconds=4)
+    assert len(chunks) > 1
+    assert all(end - start <= 4 * RATE for start, end in chunks)
+    assert all(a[1] <= b[0] for a, b in zip(chunks, chunks[1:]))
+
+    unbroken = tone(10)
+    chunks = split_for_recognition(unbroken, RATE, max_chunk_seconds=4)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(unbroken)
+    assert all(end - start <= 4 * RATE for start, end in chunks)
@@ -0,0 +1,309 @@
+"""
+Single-pass text analysis for keyword and flashcard extraction.
+
+A document is read as a stream of text chunks and split into sentences on
+the fly. Each sentence is tokenized once, and the pass builds word counts
+plus an inverted index of word -> sentences containing it. Lookups are
+then dictionary reads instead of rescans. Matching is by whole word, so
+"cat" no longer matches "category".
+
+Plain text is decoded incrementally from any binary stream. PDFs are read
+page by page with PyMuPDF. Only the sentences and the index are held in
+memory, not the raw text, its lowercased copy and a word list alongside it.
+"""
+
+import codecs
+import itertools
+import re
+from collections import Counter
+
+import numpy as np
+
+try:
+    from .language_registry import normalize_language
+except Exception:
+    from language_registry import normalize_language
+
+WORD = re.compile(r"\w+")
+_SEPARATOR = '\x00'
+TOKEN_OR_SEPARATOR = re.compile(r"\w+|\x00")
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+# Text without sentence punctuation is cut at whitespace past this length
+MAX_SENTENCE_CHARS = 2000
+READ_SIZE = 64 * 1024
+
+_STOPWORDS = {
+    'en': '''
+        a an and are as at be been but by can did do does for from had has have he her his how i if in
+        into is it its me my no not of on or our she so than that the their them then there these they
+        this those to was we were what when where which who will with would you your
+    ''',
+    'es': '''
+        a al con como de del el ella ellos en era es esa ese esta este fue ha hay la las le les lo los
+        más me mi muy no o para pero por que se si sin sobre son su sus también te tu un una y ya yo
+    ''',
+    'fr': '''
+        a au aux avec ce ces dans de des du elle en est et il ils je la le les leur lui mais me mon ne
+        nous on ou par pas pour qu que qui sa se ses son sur ta te tu un une vous y été être
+    ''',
+    'de': '''
+        als am an auch auf aus bei bin bis das dass dem den der des die du ein eine einen einem einer
+        er es für hat ich ihr im in ist ja mit nach nicht noch nur oder sein sich sie sind so und uns
+        von war was wie wir zu zum zur
+    ''',
+    'it': '''
+        a al alla anche che chi ci come con da dal del della di e era gli ha ho i il in io la le lo ma
+        mi ne nel non per più se si sono su sua suo tra un una uno
+    ''',
+    'pt': '''
+        a ao aos as com como da das de do dos e ela ele em era está eu foi isso já mais mas me meu na
+        não nas no nos o os ou para pela pelo por que se sem seu sua são também um uma você é
+    ''',
+    'nl': '''
+        aan al als bij dan dat de die dit door een en er het hij hoe in is je maar met na naar niet nog
+        of om ook op te tot uit van voor was wat we wel wie zijn ze zo
+    ''',
+}
+STOPWORDS = {code: frozenset(words.split()) for code, words in _STOPWORDS.items()}
+
+
+def stopwords_for(language):
+    """
+    Stopword set for a language code
+
+    Languages without a list fall back to English, which keeps English
+    function words out of mixed-language documents.
+    """
+    return STOPWORDS.get(normalize_language(language) or '', STOPWORDS['en'])
+
+
+def iter_text(stream, encoding='utf-8', read_size=READ_SIZE):
+    """
+    Decode a binary stream in fixed-size reads
+
+    Multi-byte characters split across reads are carried over by the
+    incremental decoder; undecodable bytes become U+FFFD.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    while True:
+        data = stream.read(read_size)
+        if not data:
+            break
+        text = decoder.decode(data)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_pdf_text(stream):
+    """
+    Extract text from a PDF one page at a time
+
+    PyMuPDF needs the whole file to open it, so the upload is read once;
+    page text is produced and dropped page by page.
+    """
+    # Imported on first use: PyMuPDF takes longer to import than the rest of the app's text handling
+    try:
+        import pymupdf
+    except ImportError:
+        try:
+            import fitz as pymupdf
+        except ImportError:
+            raise Exception("PDF support requires PyMuPDF (pip install PyMuPDF)")
+    document = pymupdf.open(stream=stream.read(), filetype='pdf')
+    try:
+        for page in document:
+            yield page.get_text()
+    finally:
+        document.close()
+
+
+def iter_document(stream, filename='', content_type=''):
+    """
+    Text chunks of an uploaded document: PDF or plain text
+
+    Args:
+        stream: Binary file-like object
+        filename: Upload filename, used to recognize PDFs
+        content_type: Upload content type, used to recognize PDFs
+
+    Returns:
+        iterator: Text chunks
+    """
+    if content_type == 'application/pdf' or (filename or '').lower().endswith('.pdf'):
+        return iter_pdf_text(stream)
+    return iter_text(stream)
+
+
+def iter_sentences(chunks):
+    """
+    Split streamed text into sentences at '.', '!' or '?' followed by whitespace
+
+    Yields:
+        str: Stripped, non-empty sentences
+    """
+    pending = ''
+    for chunk in chunks:
+        pieces = SENTENCE_END.split(pending + chunk)
+        # The last piece may continue in the next chunk
+        pending = pieces.pop()
+        for piece in pieces:
+            piece = piece.strip()
+            if piece:
+                yield piece
+        while len(pending) > MAX_SENTENCE_CHARS:
+            cut = pending.rfind(' ', 0, MAX_SENTENCE_CHARS)
+            cut = cut if cut > 0 else MAX_SENTENCE_CHARS
+            piece = pending[:cut].strip()
+            if piece:
+                yield piece
+            pending = pending[cut:]
+    pending = pending.strip()
+    if pending:
+        yield pending
+
+
+class DocumentIndex:
+    # Sentences tokenized per batch before their postings are converted to arrays
+    BATCH_SENTENCES = 1024
+
+    def __init__(self, language='en', min_length=3):
+        """
+        Args:
+            language: Language whose stopwords are skipped by top_words
+            min_length: Shortest word top_words returns by default
+        """
+        self.stopwords = stopwords_for(language)
+        self.min_length = min_length
+        self.sentences = []
+        self.vocabulary = {}  # word -> term id, in order of first appearance
+        self.words = []  # term id -> word
+        self.word_count = 0
+        self._terms = []  # per batch: term id of every token
+        self._sentence_ids = []  # per batch: sentence number of every token
+        self._counts = None
+        self._postings = None
+        self._offsets = None
+
+    def add_sentences(self, sentences):
+        """Tokenize and index a batch of sentences."""
+        if not sentences:
+            return
+        first = len(self.sentences)
+        self.sentences.extend(sentences)
+        # One regex pass over the whole batch; NUL separators mark where each sentence ends
+        joined = _SEPARATOR.join(sentences)
+        if joined.count(_SEPARATOR) != len(sentences) - 1:
+            joined = _SEPARATOR.join(s.replace(_SEPARATOR, ' ') for s in sentences)
+        tokens = TOKEN_OR_SEPARATOR.findall(joined.lower())
+        vocabulary = self.vocabulary
+        new = [w for w in dict.fromkeys(tokens) if w not in vocabulary and w != _SEPARATOR]
+        vocabulary.update(zip(new, range(len(self.words), len(self.words) + len(new))))
+        self.words.extend(new)
+        ids = np.fromiter(map(vocabulary.get, tokens, itertools.repeat(-1)), dtype=np.int32, count=len(tokens))
+        separators = ids < 0
+        words = ~separators
+        self._terms.append(ids[words])
+        self._sentence_ids.append((first + np.cumsum(separators, dtype=np.int32))[words])
+        self.word_count += len(tokens) - (len(sentences) - 1)
+        self._counts = None
+
+    def _build(self):
+        """Collapse the batches into counts and term-sorted postings."""
+        if self._counts is not None:
+            return
+        if len(self._terms) > 1:
+            self._terms = [np.concatenate(self._terms)]
+            self._sentence_ids = [np.concatenate(self._sentence_ids)]
+        terms = self._terms[0] if self._terms else np.zeros(0, dtype=np.int32)
+        sentence_ids = self._sentence_ids[0] if self._sentence_ids else np.zeros(0, dtype=np.int32)
+        self._counts = np.bincount(terms, minlength=len(self.words))
+        # Tokens arrive in sentence order, so a stable sort by term leaves each
+        # term's sentences ascending; repeats within a sentence are then adjacent
+        order = np.argsort(terms, kind='stable')
+        terms, sentence_ids = terms[order], sentence_ids[order]
+        first = np.ones(len(terms), dtype=bool)
+        first[1:] = (terms[1:] != terms[:-1]) | (sentence_ids[1:] != sentence_ids[:-1])
+        self._postings = sentence_ids[first]
+        self._offsets = np.zeros(len(self.words) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms[first], minlength=len(self.words)), out=self._offsets[1:])
+
+    @property
+    def counts(self):
+        """Occurrences of each word, as a Counter"""
+        self._build()
+        return Counter(dict(zip(self.words, self._counts.tolist())))
+
+    def term_counts(self):
+        """Occurrences of each word, as an array aligned with `words`"""
+        self._build()
+        return self._counts
+
+    def count(self, word):
+        self._build()
+        term = self.vocabulary.get(word.lower())
+        return int(self._counts[term]) if term is not None else 0
+
+    def top_words(self, limit, min_length=None, weights=None):
+        """
+        Highest-ranked words, skipping stopwords and short words; ties in order of first appearance
+
+        Args:
+            limit: Number of words to return
+            min_length: Skip words shorter than this (defaults to the index's)
+            weights: Score per word aligned with `words`, e.g. CorpusIndex.bm25
+                (defaults to the word counts)
+        """
+        self._build()
+        min_length = min_length or self.min_length
+        eligible = np.fromiter((len(w) >= min_length and w not in self.stopwords for w in self.words),
+                               dtype=bool, count=len(self.words))
+        scores = np.where(eligible, self._counts if weights is None else weights, -1)
+        # Stable sort keeps first-appearance order among equal scores
+        ranked = np.argsort(-scores, kind='stable')[:limit]
+        return [self.words[t] for t in ranked.tolist() if scores[t] > 0]
+
+    def sentences_with(self, word):
+        """Numbers of the sentences containing `word` as a whole word, ascending"""
+        self._build()
+        term = self.vocabulary.get(word.lower())
+        if term is None:
+            return np.zeros(0, dtype=np.int32)
+        return self._postings[self._offsets[term]:self._offsets[term + 1]]
+
+    def first_sentence(self, word):
+        """The first sentence containing `word`, or None"""
+        numbers = self.sentences_with(word)
+        return self.sentences[int(numbers[0])] if len(numbers) else None
+
+
+def index_document(source, language='en', min_length=3):
+    """
+    Tokenize and index a document in one pass
+
+    Args:
+        source: A string, or an iterable of text chunks (see iter_document)
+        language: Language whose stopwords are skipped
+        min_length: Shortest word top_words returns by default
+
+    Returns:
+        DocumentIndex: The populated index
+    """
+    if isinstance(source, str):
+        source = (source,)
+    index = DocumentIndex(language=language, min_length=min_length)
+    batch = []
+    for sentence in iter_sentences(source):
+        batch.append(sentence)
+        if len(batch) >= index.BATCH_SENTENCES:
+            index.add_sentences(batch)
+            batch = []
+    index.add_sentences(batch)
+    return index
+
+
+def cloze(sentence, word, blank='____'):
+    """Blank out whole-word occurrences of `word`, ignoring case"""
+    return re.sub(r'(?<!\w)' + re.escape(word) + r'(?!\w)', blank, sentence, flags=re.IGNORECASE)
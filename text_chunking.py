@@ -0,0 +1,123 @@
+"""
+Splitting long documents into provider-sized pieces without losing layout.
+
+A document is cut into paragraphs at blank lines, and each paragraph into
+lines. Only the text of a line is sent for translation. Newlines,
+indentation, the whitespace between paragraphs and leading markup such as
+list bullets, quote markers and Markdown headings are kept verbatim and put
+back around the translations. A line longer than the limit is split at
+sentence ends, then at whitespace, and only as a last resort mid-word.
+"""
+
+import re
+
+# Runs of whitespace containing a blank line end a paragraph
+PARAGRAPH_BREAK = re.compile(r'(\n[ \t]*(?:\n\s*)+)')
+LINE_BREAK = re.compile(r'(\s*\n\s*)')
+# Leading markup kept out of the translated text: bullets, quotes, headings, numbering
+LINE_MARKUP = re.compile(r'^(?:[-*+>•]|#{1,6}|\d{1,3}[.)])\s+')
+SENTENCE_BREAK = re.compile(r'(?<=[.!?。！？])(\s+)')
+WHITESPACE = re.compile(r'(\s+)')
+# Tried in order on a line that is over the limit
+_SPLIT_PATTERNS = (SENTENCE_BREAK, WHITESPACE)
+
+
+def _split_at(text, pattern, max_chars):
+    """
+    Pack the pieces `pattern` splits `text` into, so each is at most `max_chars`
+
+    Returns:
+        list: Alternating pieces and the separators between them
+    """
+    parts = pattern.split(text)
+    pieces = [parts[0]]
+    for separator, piece in zip(parts[1::2], parts[2::2]):
+        if len(pieces[-1]) + len(separator) + len(piece) <= max_chars:
+            pieces[-1] += separator + piece
+        else:
+            pieces.extend((separator, piece))
+    return pieces
+
+
+def split_line(text, max_chars, level=0):
+    """
+    Split one line into pieces of at most `max_chars`
+
+    Returns:
+        list: Alternating translatable pieces and the whitespace between them,
+            starting and ending with a piece
+    """
+    if len(text) <= max_chars:
+        return [text]
+    if level == len(_SPLIT_PATTERNS):
+        # A single unbroken run longer than the limit
+        pieces = []
+        for start in range(0, len(text), max_chars):
+            if start:
+                pieces.append('')
+            pieces.append(text[start:start + max_chars])
+        return pieces
+    result = []
+    for i, piece in enumerate(_split_at(text, _SPLIT_PATTERNS[level], max_chars)):
+        if i % 2:
+            result.append(piece)
+        else:
+            result.extend(split_line(piece, max_chars, level + 1))
+    return result
+
+
+def split_paragraph(paragraph, max_chars):
+    """
+    Parts of a paragraph, translatable or kept verbatim
+
+    Returns:
+        list: (translate, text) pairs that concatenate back to the paragraph
+    """
+    parts = []
+    for i, chunk in enumerate(LINE_BREAK.split(paragraph)):
+        if i % 2:
+            parts.append((False, chunk))
+            continue
+        markup = LINE_MARKUP.match(chunk)
+        if markup:
+            parts.append((False, markup.group(0)))
+            chunk = chunk[markup.end():]
+        body = chunk.strip()
+        if not body:
+            if chunk:
+                parts.append((False, chunk))
+            continue
+        leading = chunk[:len(chunk) - len(chunk.lstrip())]
+        trailing = chunk[len(chunk.rstrip()):]
+        if leading:
+            parts.append((False, leading))
+        for j, piece in enumerate(split_line(body, max_chars)):
+            # Pieces with no letters or digits (rules, bare punctuation) aren't sent
+            parts.append((j % 2 == 0 and any(ch.isalnum() for ch in piece), piece))
+        if trailing:
+            parts.append((False, trailing))
+    return parts
+
+
+def split_document(text, max_chars):
+    """
+    Split a document into paragraphs of translatable and verbatim parts
+
+    Args:
+        text: Document text
+        max_chars: Longest translatable part
+
+    Returns:
+        list: One list of (translate, text) pairs per paragraph; the blank
+            lines after a paragraph are a verbatim part at its end, so the
+            concatenation of every part is the original text
+    """
+    chunks = PARAGRAPH_BREAK.split(text)
+    paragraphs = []
+    for i in range(0, len(chunks), 2):
+        parts = split_paragraph(chunks[i], max_chars)
+        if i + 1 < len(chunks):
+            parts.append((False, chunks[i + 1]))
+        if parts:
+            paragraphs.append(parts)
+    return paragraphs
@@ -0,0 +1,208 @@
+"""
+Two-tier cache for translation results.
+
+The first tier is an in-process LRU bounded by entry count and TTL. The second
+tier is a SQLite table that survives restarts, accessed through the shared
+pooled storage. Lookups fall through from memory to disk, and disk hits are
+promoted back into memory. Every PRUNE_EVERY stores, rows older than `db_ttl`
+are deleted and the oldest rows past `db_max_entries` are trimmed, so the
+table stays bounded.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+try:
+    from .storage import get_default_storage
+except Exception:
+    from storage import get_default_storage
+
+
+class TranslationCache:
+    # Stores to the persistent tier between two prunes of it
+    PRUNE_EVERY = 256
+
+    def __init__(self, max_entries=2048, ttl=3600, db_path='translator.db', db_ttl=7 * 24 * 3600,
+                 db_max_entries=100000):
+        """
+        Args:
+            max_entries: Maximum number of entries held in memory
+            ttl: Seconds an entry stays valid in memory
+            db_path: SQLite file for the persistent tier, or None to disable it
+            db_ttl: Seconds an entry stays valid on disk; older rows are deleted
+            db_max_entries: Rows kept on disk; the oldest are deleted past this
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.db_ttl = db_ttl
+        self.db_max_entries = db_max_entries
+        self.storage = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stores_since_prune = 0
+        self._counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'disk_pruned': 0,
+        }
+        if self.db_path:
+            self._init_db()
+
+    @staticmethod
+    def normalize_text(text):
+        """Normalize text so trivially different inputs share an entry."""
+        return unicodedata.normalize('NFC', text or '').strip()
+
+    def make_key(self, text, src_lang, dest_lang):
+        return (self.normalize_text(text), (src_lang or 'auto'), (dest_lang or 'en'))
+
+    def get(self, text, src_lang, dest_lang):
+        """
+        Look up a cached translation
+
+        Returns:
+            dict: A copy of the cached result, or None on a miss
+        """
+        key = self.make_key(text, src_lang, dest_lang)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return dict(value)
+                del self._entries[key]
+                self._counters['expirations'] += 1
+
+        value = self._db_get(key, now)
+        with self._lock:
+            if value is None:
+                self._counters['misses'] += 1
+                return None
+            self._counters['disk_hits'] += 1
+            self._remember(key, value, now)
+        return dict(value)
+
+    def set(self, text, src_lang, dest_lang, value):
+        """Store a successful translation result in both tiers."""
+        key = self.make_key(text, src_lang, dest_lang)
+        value = dict(value)
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._counters['stores'] += 1
+            self._stores_since_prune += 1
+            prune = self._stores_since_prune >= self.PRUNE_EVERY
+            if prune:
+                self._stores_since_prune = 0
+        self._db_set(key, value, now)
+        if prune:
+            self.prune(now)
+
+    def prune(self, now=None):
+        """
+        Delete disk rows past `db_ttl`, then the oldest past `db_max_entries`
+
+        Returns:
+            int: Rows deleted
+        """
+        if not self.db_path:
+            return 0
+        now = time.time() if now is None else now
+        try:
+            with self.storage.transaction() as conn:
+                deleted = conn.execute('DELETE FROM translation_cache WHERE created_at < ?',
+                                       (now - self.db_ttl,)).rowcount
+                excess = conn.execute('SELECT COUNT(*) FROM translation_cache').fetchone()[0] - self.db_max_entries
+                if excess > 0:
+                    deleted += conn.execute('''
+                        DELETE FROM translation_cache WHERE cache_key IN (
+                            SELECT cache_key FROM translation_cache ORDER BY created_at LIMIT ?)
+                    ''', (excess,)).rowcount
+        except sqlite3.Error as e:
+            print(f"Translation cache prune error: {e}")
+            return 0
+        with self._lock:
+            self._counters['disk_pruned'] += deleted
+        return deleted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            try:
+                with self.storage.transaction() as conn:
+                    conn.execute('DELETE FROM translation_cache')
+            except sqlite3.Error as e:
+                print(f"Translation cache clear error: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        stats['db_max_entries'] = self.db_max_entries
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key, value, now):
+        # Caller holds self._lock
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.sha256('\x1f'.join(key).encode('utf-8')).hexdigest()
+
+    def _init_db(self):
+        # The translation_cache table is created by the storage migrations
+        try:
+            self.storage = get_default_storage(self.db_path)
+        except sqlite3.Error as e:
+            print(f"Translation cache disabled persistent tier: {e}")
+            self.db_path = None
+
+    def _db_get(self, key, now):
+        if not self.db_path:
+            return None
+        try:
+            with self.storage.connection() as conn:
+                row = conn.execute('''
+                    SELECT translated_text, source_language, target_lang
+                    FROM translation_cache
+                    WHERE cache_key = ? AND created_at >= ?
+                ''', (self._digest(key), now - self.db_ttl)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Translation cache read error: {e}")
+            return None
+        if not row:
+            return None
+        return {'translated_text': row[0], 'source_language': row[1], 'target_language': row[2]}
+
+    def _db_set(self, key, value, now):
+        if not self.db_path:
+            return
+        try:
+            with self.storage.transaction() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO translation_cache
+                    (cache_key, source_lang, target_lang, translated_text, source_language, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (self._digest(key), key[1], key[2], value['translated_text'],
+                      value.get('source_language'), now))
+        except sqlite3.Error as e:
+            print(f"Translation cache write error: {e}")
@@ -1,82 +1,323 @@
-from deep_translator import GoogleTranslator
-from deep_translator.constants import GOOGLE_LANGUAGES_TO_CODES
+from concurrent.futures import ThreadPoolExecutor
+
+from deep_translator.exceptions import (InvalidSourceOrTargetLanguage, LanguageNotSupportedException,
+                                        NotValidLength, NotValidPayload)
+
+try:
+    from .language_registry import LANGUAGES, normalize_language
+    from .translation_cache import TranslationCache
+    from .translator_pool import get_default_pool
+    from .single_flight import SingleFlight
+    from .language_detector import LanguageDetector
+    from .text_chunking import split_document
+    from .upstream import UpstreamError, get_upstream
+    from .metrics import span, timed
+except Exception:
+    from language_registry import LANGUAGES, normalize_language
+    from translation_cache import TranslationCache
+    from translator_pool import get_default_pool
+    from single_flight import SingleFlight
+    from language_detector import LanguageDetector
+    from text_chunking import split_document
+    from upstream import UpstreamError, get_upstream
+    from metrics import span, timed
+
+# Provider errors caused by the request itself: not retried, and they don't trip the circuit breaker
+CLIENT_ERRORS = (InvalidSourceOrTargetLanguage, LanguageNotSupportedException, NotValidLength, NotValidPayload)
 
 
 class TranslationService:
+    # The provider rejects payloads of 5000 characters or more
+    MAX_BATCH_CHARS = 4500
+    BATCH_SEPARATOR = '\n'
+
+    def __init__(self, cache=None, pool=None, detector=None, upstream=None):
+        self.cache = cache if cache is not None else TranslationCache()
+        self.pool = pool if pool is not None else get_default_pool()
+        self.detector = detector if detector is not None else LanguageDetector()
+        self.inflight = SingleFlight()
+        # Deadlines, retries, hedging and the circuit breaker for provider calls
+        self.upstream = upstream if upstream is not None else get_upstream('translate', permanent=CLIENT_ERRORS)
+
     def _normalize_code(self, code):
-        """Normalize various language code formats to two-letter codes.
+        """Normalize any known language code format to the provider's code.
 
         Examples:
-          'hin' -> 'hi', 'kan' -> 'kn', 'eng' -> 'en', 'HI' -> 'hi'
+          'hin' -> 'hi', 'kan' -> 'kn', 'eng' -> 'en', 'HI' -> 'hi', 'zh-Hans' -> 'zh-CN'
+
+        Unknown codes are passed through for the provider to reject.
         """
         if not code:
             return code
-        c = str(code).lower()
-        mapping = {
-            'hin': 'hi', 'hi': 'hi',
-            'kan': 'kn', 'kn': 'kn',
-            'eng': 'en', 'en': 'en'
-        }
-        if c in mapping:
-            return mapping[c]
-        # If already a 2-letter code, return it
-        if len(c) == 2:
-            return c
-        # If a 3-letter tesseract-style code, try to map first two chars
-        return c[:2]
+        return normalize_language(code) or str(code).strip()
 
+    def _normalize_pair(self, src_lang, dest_lang):
+        # Normalize language codes to translator-friendly two-letter codes
+        src_norm = 'auto' if (src_lang or 'auto').lower() == 'auto' else self._normalize_code(src_lang)
+        dest_norm = self._normalize_code(dest_lang) if dest_lang else 'en'
+        return src_norm, dest_norm
+
+    def _resolve_source(self, text, src_norm):
+        """Replace 'auto' with a locally detected source when detection is confident."""
+        if src_norm != 'auto':
+            return src_norm
+        return self.detector.detect(text) or 'auto'
+
+    @timed('translate')
     def translate(self, text, src_lang='auto', dest_lang='en'):
+        if text and len(text) > self.MAX_BATCH_CHARS:
+            # Over the provider's payload limit: translate it in pieces
+            return self.translate_document(text, src_lang, dest_lang)
         try:
-            # Normalize language codes to translator-friendly two-letter codes
-            src_norm = 'auto' if (src_lang or '').lower() == 'auto' else self._normalize_code(src_lang)
-            dest_norm = self._normalize_code(dest_lang) if dest_lang else 'en'
+            src_norm, dest_norm = self._normalize_pair(src_lang, dest_lang)
+            src_norm = self._resolve_source(text, src_norm)
 
-            # Try translation with resilient fallbacks
-            translated_text = None
-            try:
-                if src_norm == 'auto':
-                    # Some versions of deep_translator accept omitting source
-                    try:
-                        translated_text = GoogleTranslator(source='auto', target=dest_norm).translate(text)
-                    except Exception:
-                        translated_text = GoogleTranslator(target=dest_norm).translate(text)
-                else:
-                    translated_text = GoogleTranslator(source=src_norm, target=dest_norm).translate(text)
-            except Exception as primary_err:
-                # Fallback: try translating by only specifying the target
-                try:
-                    translated_text = GoogleTranslator(target=dest_norm).translate(text)
-                except Exception as fallback_err:
-                    print(f"Translation error primary: {primary_err}; fallback: {fallback_err}")
-                    raise Exception("Translation failed. The language pair may not be supported.")
-
-            # Detect language when source was 'auto'
-            detected_lang = src_norm
-            if src_norm == 'auto':
-                # deep_translator's detect API is not always present; attempt safely
-                try:
-                    detector = GoogleTranslator()
-                    if hasattr(detector, 'detect'):
-                        det = detector.detect(text)
-                        if isinstance(det, (list, tuple)) and det:
-                            detected = det[0]
-                        else:
-                            detected = det
-                        detected_lang = self._normalize_code(detected)
-                    else:
-                        detected_lang = 'unknown'
-                except Exception:
-                    detected_lang = 'unknown'
-
-            return {
-                'translated_text': translated_text,
-                'source_language': detected_lang,
-                'target_language': dest_norm,
-            }
+            cached = self.cache.get(text, src_norm, dest_norm)
+            if cached is not None:
+                return cached
+
+            # Concurrent identical requests share one upstream call
+            key = self.cache.make_key(text, src_norm, dest_norm)
+            return dict(self.inflight.do(key, self._translate_uncached, text, src_norm, dest_norm))
+        except UpstreamError:
+            # Provider down or too slow: say so rather than blaming the input
+            raise
         except Exception as e:
             print(f"CRITICAL TRANSLATION ERROR: {e}")
             raise Exception("Translation failed. The input text may be too short for auto-detection or the language pair may not be supported.")
 
+    def _translate_uncached(self, text, src_norm, dest_norm):
+        # Transient failures are retried inside the upstream call, within its deadline
+        translated_text = None
+        used_fallback = False
+        try:
+            with span('translate_provider'):
+                translated_text = self.upstream.call(self.pool.translate, text, src_norm, dest_norm)
+        except CLIENT_ERRORS as primary_err:
+            if src_norm == 'auto':
+                raise
+            # Fallback: the provider rejected the source, so try only specifying the target
+            try:
+                translated_text = self.upstream.call(self.pool.translate, text, 'auto', dest_norm)
+                used_fallback = True
+            except CLIENT_ERRORS as fallback_err:
+                print(f"Translation error primary: {primary_err}; fallback: {fallback_err}")
+                raise Exception("Translation failed. The language pair may not be supported.")
+
+        # The source was detected locally before the call; 'auto' here means
+        # detection wasn't confident enough to name one
+        detected_lang = 'unknown' if src_norm == 'auto' else src_norm
+
+        result = {
+            'translated_text': translated_text,
+            'source_language': detected_lang,
+            'target_language': dest_norm,
+        }
+        if translated_text is not None:
+            if used_fallback and src_norm != 'auto':
+                # The fallback ignored the requested source, so the result
+                # is only valid for an auto-detected lookup
+                self.cache.set(text, 'auto', dest_norm, dict(result, source_language='unknown'))
+            else:
+                self.cache.set(text, src_norm, dest_norm, result)
+        return result
+
+    @timed('translate_many')
+    def translate_many(self, items, src_lang='auto', dest_lang='en', max_workers=4):
+        """
+        Translate many texts with as few upstream calls as possible
+
+        Identical inputs are translated once, cached results are reused, and
+        the rest are grouped by language pair and packed into newline-joined
+        payloads under the provider's size limit. Packs run concurrently on at
+        most `max_workers` threads.
+
+        Args:
+            items: List of strings, or dicts with 'text' and optional
+                'source_lang'/'target_lang' overriding the defaults
+            src_lang: Default source language
+            dest_lang: Default target language
+            max_workers: Upper bound on concurrent upstream calls
+
+        Returns:
+            list: One dict per input, in input order, with 'success' plus either
+                the translate() fields or an 'error' message
+        """
+        results = [None] * len(items)
+        pending = {}  # cache key -> input positions
+        for i, item in enumerate(items):
+            if isinstance(item, dict):
+                text = item.get('text') or item.get('source_text') or ''
+                src, dest = self._normalize_pair(item.get('source_lang', src_lang), item.get('target_lang', dest_lang))
+            else:
+                text = item if isinstance(item, str) else ''
+                src, dest = self._normalize_pair(src_lang, dest_lang)
+            if not text.strip():
+                results[i] = {'success': False, 'error': 'text is required'}
+                continue
+            src = self._resolve_source(text, src)
+            pending.setdefault(self.cache.make_key(text, src, dest), []).append(i)
+
+        groups = {}
+        for key in pending:
+            cached = self.cache.get(*key)
+            if cached is not None:
+                self._fill_batch_results(results, pending[key], {'success': True, **cached})
+            else:
+                groups.setdefault(key[1:], []).append(key[0])
+
+        packs = []
+        for (src, dest), texts in groups.items():
+            for pack in self._pack_texts(texts):
+                packs.append((pack, src, dest))
+
+        def run(pack):
+            texts, src, dest = pack
+            return pack, self._translate_pack(texts, src, dest)
+
+        if packs:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(packs)))) as executor:
+                for (texts, src, dest), outcomes in executor.map(run, packs):
+                    for text, outcome in zip(texts, outcomes):
+                        self._fill_batch_results(results, pending[(text, src, dest)], outcome)
+        return results
+
+    def _pack_texts(self, texts):
+        """Split texts into packs whose joined length stays under MAX_BATCH_CHARS."""
+        pack, size = [], 0
+        for text in texts:
+            # Texts that contain the separator or fill a payload on their own go alone
+            if self.BATCH_SEPARATOR in text or len(text) >= self.MAX_BATCH_CHARS:
+                yield [text]
+                continue
+            if pack and size + len(self.BATCH_SEPARATOR) + len(text) > self.MAX_BATCH_CHARS:
+                yield pack
+                pack, size = [], 0
+            size += len(text) + (len(self.BATCH_SEPARATOR) if pack else 0)
+            pack.append(text)
+        if pack:
+            yield pack
+
+    def _translate_pack(self, texts, src, dest):
+        """Translate one pack, falling back to per-text calls if the pack can't be split back."""
+        if len(texts) > 1:
+            try:
+                joined = self.upstream.call(self.pool.translate, self.BATCH_SEPARATOR.join(texts), src, dest)
+                parts = joined.split(self.BATCH_SEPARATOR) if joined else []
+                if len(parts) == len(texts):
+                    outcomes = []
+                    for text, part in zip(texts, parts):
+                        result = {
+                            'translated_text': part.strip(),
+                            'source_language': 'unknown' if src == 'auto' else src,
+                            'target_language': dest,
+                        }
+                        self.cache.set(text, src, dest, result)
+                        outcomes.append({'success': True, **result})
+                    return outcomes
+            except UpstreamError as e:
+                # Per-item calls would only fail fast too
+                return [{'success': False, 'error': str(e)} for _ in texts]
+            except Exception as e:
+                print(f"Batch translation pack failed, retrying per item: {e}")
+
+        outcomes = []
+        for text in texts:
+            try:
+                outcomes.append({'success': True, **self.translate(text, src, dest)})
+            except Exception as e:
+                outcomes.append({'success': False, 'error': str(e)})
+        return outcomes
+
+    @timed('translate_document')
+    def translate_document(self, text, src_lang='auto', dest_lang='en', max_workers=4):
+        """
+        Translate text of any length, keeping its paragraphs, newlines and line markup
+
+        Args:
+            text: Source text
+            src_lang: Source language, or 'auto'
+            dest_lang: Target language
+            max_workers: Upper bound on concurrent upstream calls
+
+        Returns:
+            dict: 'translated_text', 'source_language' and 'target_language', as translate()
+        """
+        paragraphs = []
+        result = {'source_language': None, 'target_language': None}
+        for paragraph in self.iter_translate_document(text, src_lang, dest_lang, max_workers=max_workers):
+            paragraphs.append(paragraph['translated_text'])
+            result = paragraph
+        return {'translated_text': ''.join(paragraphs), 'source_language': result['source_language'],
+                'target_language': result['target_language']}
+
+    def iter_translate_document(self, text, src_lang='auto', dest_lang='en', max_workers=4):
+        """
+        Translate a long text, yielding each paragraph as soon as it and those before it are done
+
+        The text is split at paragraphs, lines and (for overlong lines)
+        sentences into pieces under the provider's limit; see text_chunking.
+        Pieces are packed into payloads like translate_many and translated
+        concurrently. Failed provider calls are retried by the upstream
+        layer, within its deadline, and not again per piece.
+
+        Yields:
+            dict: 'index', 'translated_text' (with the paragraph's original
+                whitespace and markup), 'source_language' and 'target_language'
+        """
+        src, dest = self._normalize_pair(src_lang, dest_lang)
+        # One detection for the whole document keeps every piece on the same source
+        src = self._resolve_source(text[:self.MAX_BATCH_CHARS], src)
+        paragraphs = split_document(text, self.MAX_BATCH_CHARS)
+        packs = list(self._pack_texts([piece for parts in paragraphs for translate, piece in parts if translate]))
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(packs))))
+        try:
+            futures = [executor.submit(self._translate_document_pack, pack, src, dest) for pack in packs]
+            translations = (translated for future in futures for translated in future.result())
+            for index, parts in enumerate(paragraphs):
+                yield {
+                    'index': index,
+                    'translated_text': ''.join(next(translations) if translate else piece
+                                               for translate, piece in parts),
+                    'source_language': 'unknown' if src == 'auto' else src,
+                    'target_language': dest,
+                }
+        finally:
+            # A consumer that stops early doesn't pay for the rest of the document
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _translate_document_pack(self, texts, src, dest):
+        """
+        Translate one pack of document pieces
+
+        Raises:
+            Exception: If any piece failed after the upstream layer's retries
+        """
+        outcomes = self._translate_pack(texts, src, dest)
+        failed = [outcome for outcome in outcomes if not outcome['success']]
+        if failed:
+            raise Exception(f"Translation failed for {len(failed)} of {len(texts)} document pieces: "
+                            f"{failed[0]['error']}")
+        return [outcome['translated_text'] for outcome in outcomes]
+
+    @staticmethod
+    def _fill_batch_results(results, positions, outcome):
+        for i in positions:
+            results[i] = dict(outcome)
+
     def get_supported_languages(self):
-        languages = [{'code': code, 'name': name.title()} for name, code in GOOGLE_LANGUAGES_TO_CODES.items()]
-        return sorted(languages, key=lambda x: x['name'])
\ No newline at end of file
+        # Built and sorted once by the language registry
+        return [dict(language) for language in LANGUAGES]
+
+    def cache_stats(self):
+        return self.cache.stats()
+
+    def inflight_stats(self):
+        return self.inflight.stats()
+
+    def detector_stats(self):
+        return self.detector.stats()
+
+    def upstream_stats(self):
+        return self.upstream.stats()
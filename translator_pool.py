@@ -0,0 +1,137 @@
+"""
+Pooled translator clients.
+
+deep_translator's GoogleTranslator sends every request through a throwaway
+``requests.get`` call (a fresh HTTP session each time) and mutates its own URL
+parameters while translating, so one instance can't be shared across threads.
+TranslatorPool keeps idle clients per (source, target), shared by all
+threads: a call checks one out, translates, and puts it back. Every client
+sends its requests through a single keep-alive ``requests.Session``, passed
+to it explicitly; nothing in deep_translator is patched.
+"""
+
+import os
+import threading
+
+import requests
+from bs4 import BeautifulSoup
+from deep_translator import GoogleTranslator
+from deep_translator.exceptions import RequestError, TooManyRequests, TranslationNotFound
+from deep_translator.validate import is_empty, is_input_valid, request_failed
+from requests.adapters import HTTPAdapter
+
+
+class PooledGoogleTranslator(GoogleTranslator):
+    """
+    GoogleTranslator that sends its requests through the session it is given
+
+    translate() follows the library's own, its 'hl' retry included, but
+    builds the URL parameters per call instead of editing the instance's.
+    """
+
+    def __init__(self, session, source='auto', target='en', base_url=None, timeout=None):
+        super().__init__(source=source, target=target)
+        self.session = session
+        self.timeout = timeout
+        if base_url:
+            self._base_url = base_url
+
+    def translate(self, text, **kwargs):
+        if not is_input_valid(text, max_chars=5000):
+            return None
+        text = text.strip()
+        if self._same_source_target() or is_empty(text):
+            return text
+        params = dict(self._url_params, tl=self._target, sl=self._source)
+        params[self.payload_key] = text
+        while True:
+            response = self.session.get(self._base_url, params=params, proxies=self.proxies, timeout=self.timeout)
+            if response.status_code == 429:
+                raise TooManyRequests()
+            if request_failed(status_code=response.status_code):
+                raise RequestError()
+            soup = BeautifulSoup(response.text, 'html.parser')
+            response.close()
+            element = (soup.find(self._element_tag, self._element_query)
+                       or soup.find(self._element_tag, self._alt_element_query))
+            if not element:
+                raise TranslationNotFound(text)
+            translated = element.get_text(strip=True)
+            if translated != text:
+                return translated
+            # Echoed back unchanged: ask once more without the interface language
+            if not any(ch.isalnum() for ch in text):
+                return None
+            if 'hl' not in params:
+                return text
+            del params['hl']
+
+
+class TranslatorPool:
+    def __init__(self, base_url=None, pool_maxsize=32, timeout=10, max_idle_per_pair=8):
+        """
+        Args:
+            base_url: Override for the translate endpoint (used by local stubs)
+            pool_maxsize: Keep-alive connections held per host
+            timeout: Per-request timeout in seconds
+            max_idle_per_pair: Idle clients kept per language pair
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_idle_per_pair = max_idle_per_pair
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._idle = {}  # (source, target) -> idle clients
+        self._lock = threading.Lock()
+        self._counters = {'clients_created': 0, 'clients_reused': 0}
+
+    def _checkout(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self._counters['clients_reused'] += 1
+                return idle.pop()
+            self._counters['clients_created'] += 1
+        return PooledGoogleTranslator(self.session, source=key[0], target=key[1],
+                                      base_url=self.base_url, timeout=self.timeout)
+
+    def _checkin(self, key, client):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_pair:
+                idle.append(client)
+
+    def translate(self, text, source='auto', target='en'):
+        """Translate with an idle client for the pair, returned to the pool afterwards."""
+        key = (source or 'auto', target or 'en')
+        client = self._checkout(key)
+        try:
+            return client.translate(text)
+        finally:
+            self._checkin(key, client)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def close(self):
+        self.session.close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    """Process-wide pool shared by every TranslationService instance.
+
+    TRANSLATOR_BASE_URL overrides the translate endpoint, e.g. to point a
+    server at a local stub.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = TranslatorPool(base_url=os.environ.get('TRANSLATOR_BASE_URL') or None)
+        return _default_pool
@@ -0,0 +1,298 @@
+"""
+Resilient calls to remote providers (translation, speech recognition, TTS).
+
+Every call to a provider goes through its Upstream, which adds:
+  - a deadline: the caller stops waiting once it passes, even if the
+    provider never answers, so a brownout can't pin request threads;
+  - retries with exponential backoff and full jitter, within the deadline;
+  - hedging: once a call has run longer than the provider's recent p95, an
+    identical second request is sent and the first answer wins (capped at
+    a share of calls, so a slow provider doesn't see double load);
+  - a circuit breaker: after `failure_threshold` consecutive failed calls
+    (a call fails once its retries are used up) calls fail fast for
+    `reset_timeout` seconds, then one probe call is let through to test
+    recovery.
+
+Errors listed as `permanent` (bad input, unsupported language) are
+re-raised at once. They are not retried and don't count against the
+provider. Attempts run on the upstream's own bounded thread pool.
+Abandoned attempts finish in the background; that pool, not the callers,
+absorbs them.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class UpstreamError(Exception):
+    """A provider call failed fast: circuit open or deadline passed."""
+
+
+class CircuitOpenError(UpstreamError):
+    pass
+
+
+class DeadlineExceeded(UpstreamError):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go out now; in half-open state only one probe at a time does."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class Upstream:
+    # Successful attempt latencies kept for the hedge threshold
+    LATENCY_WINDOW = 256
+    # Samples needed before hedging starts
+    MIN_HEDGE_SAMPLES = 32
+
+    def __init__(self, name, deadline=10.0, attempts=3, backoff=0.2, max_backoff=2.0, hedge=True,
+                 hedge_ratio=0.1, min_hedge_delay=0.05, max_concurrency=32, failure_threshold=5,
+                 reset_timeout=30.0, permanent=()):
+        """
+        Args:
+            name: Provider name shown in health output
+            deadline: Default seconds a call may take, retries included
+            attempts: Most tries per call
+            backoff: Upper bound of the first retry's jittered delay, doubled per retry
+            max_backoff: Cap on any single retry delay
+            hedge: Send a second request when the first is slower than the recent p95
+            hedge_ratio: Most hedged requests as a share of calls
+            min_hedge_delay: Never hedge sooner than this many seconds
+            max_concurrency: Threads running attempts against this provider
+            failure_threshold: Consecutive calls failing after all their retries that open the circuit
+            reset_timeout: Seconds the circuit stays open before probing
+            permanent: Exception types that are the caller's fault: raised
+                immediately, never retried or counted as provider failures
+        """
+        self.name = name
+        self.deadline = deadline
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_ratio = hedge_ratio
+        self.min_hedge_delay = min_hedge_delay
+        self.max_concurrency = max_concurrency
+        self.permanent = tuple(permanent)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f'upstream-{name}')
+        self._latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = {'calls': 0, 'successes': 0, 'failures': 0, 'retries': 0, 'hedges': 0,
+                          'hedge_wins': 0, 'timeouts': 0, 'rejected': 0}
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Call fn(*args, **kwargs) against the provider
+
+        Pass `deadline=<seconds>` to override the default deadline.
+
+        Returns:
+            The first successful result
+
+        Raises:
+            CircuitOpenError: The provider is failing and the circuit is open
+            DeadlineExceeded: No answer within the deadline
+            Exception: The last attempt's error once attempts run out, or a
+                permanent error straight away
+        """
+        deadline = kwargs.pop('deadline', None) or self.deadline
+        deadline_at = time.monotonic() + deadline
+        self._count('calls')
+        last_error = None
+        # The breaker admits and judges whole calls: retries run inside the one
+        # admission, and a call that fails after all of them counts once
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open after repeated failures)")
+        for attempt in range(self.attempts):
+            if attempt:
+                if self.breaker.state == CircuitBreaker.OPEN:
+                    # Other calls opened the circuit meanwhile; don't add to the load
+                    break
+                self._count('retries')
+            try:
+                result = self._attempt(fn, args, kwargs, deadline_at)
+            except self.permanent:
+                # The provider answered; the request itself was bad
+                self.breaker.record_success()
+                raise
+            except DeadlineExceeded:
+                self.breaker.record_failure()
+                self._count('timeouts')
+                self._count('failures')
+                raise
+            except Exception as e:
+                last_error = e
+            else:
+                self.breaker.record_success()
+                self._count('successes')
+                return result
+            # Full jitter spreads out retries from callers that failed together
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            if attempt + 1 == self.attempts or time.monotonic() + delay >= deadline_at:
+                break
+            time.sleep(delay)
+        self.breaker.record_failure()
+        self._count('failures')
+        raise last_error
+
+    def _attempt(self, fn, args, kwargs, deadline_at):
+        """One try, hedged if it runs long; raises DeadlineExceeded if nothing answers in time."""
+        started = time.monotonic()
+        futures = [self._submit(fn, args, kwargs)]
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None and started + hedge_delay < deadline_at:
+            done, _ = wait(futures, timeout=hedge_delay)
+            if not done and self._take_hedge():
+                futures.append(self._submit(fn, args, kwargs))
+        error = None
+        pending = set(futures)
+        while pending:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not futures[0]:
+                        self._count('hedge_wins')
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                # Permanent errors win over transient ones: retrying can't fix them
+                if error is None or isinstance(future.exception(), self.permanent):
+                    error = future.exception()
+        if error is not None and not pending:
+            raise error
+        for future in pending:
+            future.cancel()
+        raise DeadlineExceeded(f"{self.name} did not answer within the deadline")
+
+    def _submit(self, fn, args, kwargs):
+        with self._lock:
+            self._in_flight += 1
+
+        def run():
+            started = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+            with self._lock:
+                self._latencies.append(time.monotonic() - started)
+            return result
+
+        return self.executor.submit(run)
+
+    def _hedge_delay(self):
+        if not self.hedge:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.MIN_HEDGE_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        return max(self.min_hedge_delay, ordered[int(0.95 * (len(ordered) - 1))])
+
+    def _take_hedge(self):
+        with self._lock:
+            if self._counters['hedges'] >= self.hedge_ratio * self._counters['calls']:
+                return False
+            self._counters['hedges'] += 1
+            return True
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self):
+        hedge_delay = self._hedge_delay()
+        with self._lock:
+            stats = dict(self._counters)
+            stats['in_flight'] = self._in_flight
+            ordered = sorted(self._latencies)
+        if ordered:
+            stats['p50_ms'] = round(ordered[len(ordered) // 2] * 1000, 1)
+            stats['p95_ms'] = round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 1)
+        stats['hedge_after_ms'] = round(hedge_delay * 1000, 1) if hedge_delay is not None else None
+        stats['circuit'] = self.breaker.state
+        stats['consecutive_failures'] = self.breaker.consecutive_failures
+        return stats
+
+
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+
+
+def get_upstream(name, **options):
+    """Process-wide Upstream per provider name; options apply when it is first created."""
+    with _upstreams_lock:
+        upstream = _upstreams.get(name)
+        if upstream is None:
+            upstream = _upstreams[name] = Upstream(name, **options)
+        return upstream
+
+
+def health():
+    """
+    State of every provider
+
+    Returns:
+        dict: 'status' ('ok', or 'degraded' while any circuit isn't closed)
+            and 'upstreams' (name -> stats)
+    """
+    with _upstreams_lock:
+        upstreams = dict(_upstreams)
+    stats = {name: upstream.stats() for name, upstream in upstreams.items()}
+    degraded = any(s['circuit'] != CircuitBreaker.CLOSED for s in stats.values())
+    return {'status': 'degraded' if degraded else 'ok', 'upstreams': stats}
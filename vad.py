@@ -0,0 +1,137 @@
+"""
+Energy-based voice activity detection for speech recognition.
+
+Recordings are scored in short frames by RMS energy against a threshold
+derived from the recording's own noise floor, so quiet recordings are judged
+by their own level. Leading and trailing silence is trimmed, and long
+recordings are split at pauses into chunks that stay under the recognizer's
+length limit, so they can be recognized concurrently. VAD only ever saves
+work: when it finds no speech (or the clip is shorter than one frame), the
+whole clip still goes to the recognizer, which has the final say.
+"""
+
+import numpy as np
+
+FRAME_MS = 30
+# A frame is speech when its energy is this many times the noise floor
+NOISE_RATIO = 3.0
+# ... capped at this fraction of the loud (95th percentile) level, so a
+# recording that is speech almost throughout doesn't mistake speech for noise
+PEAK_FRACTION = 0.1
+# ... and always above this RMS (int16 scale): below one step, so only digital silence falls under it
+SILENCE_RMS = 0.5
+# Pauses shorter than this stay inside a speech segment
+MIN_SILENCE_MS = 300
+# Segments shorter than this are treated as clicks and dropped
+MIN_SPEECH_MS = 120
+# Context kept around each segment so word edges aren't clipped
+PAD_MS = 150
+# Longest chunk sent to the recognizer in one request
+MAX_CHUNK_SECONDS = 30.0
+# Frames converted to float at a time when scoring, so long recordings need no float copy of the whole
+ENERGY_BLOCK_FRAMES = 256
+
+
+def frame_energy(samples, rate, frame_ms=FRAME_MS):
+    """
+    RMS energy of consecutive frames
+
+    Args:
+        samples: int16 numpy array of mono PCM
+        rate: Sample rate in Hz
+        frame_ms: Frame length in milliseconds
+
+    Returns:
+        tuple: (numpy array of per-frame RMS, samples per frame)
+    """
+    frame_len = max(1, int(rate * frame_ms / 1000))
+    count = len(samples) // frame_len
+    if count == 0:
+        return np.zeros(0, dtype=np.float32), frame_len
+    frames = samples[:count * frame_len].reshape(count, frame_len)
+    energy = np.empty(count, dtype=np.float32)
+    for start in range(0, count, ENERGY_BLOCK_FRAMES):
+        block = frames[start:start + ENERGY_BLOCK_FRAMES].astype(np.float32)
+        energy[start:start + ENERGY_BLOCK_FRAMES] = np.einsum('ij,ij->i', block, block)
+    return np.sqrt(energy / frame_len), frame_len
+
+
+def detect_speech(samples, rate, frame_ms=FRAME_MS):
+    """
+    Find the spans of a recording that contain speech
+
+    Args:
+        samples: int16 numpy array of mono PCM
+        rate: Sample rate in Hz
+
+    Returns:
+        list: (start, end) sample offsets of speech segments, padded and in order
+    """
+    energy, frame_len = frame_energy(samples, rate, frame_ms)
+    if len(energy) == 0:
+        return []
+    noise_floor, loud = np.percentile(energy, [10, 95])
+    threshold = max(min(noise_floor * NOISE_RATIO, loud * PEAK_FRACTION), SILENCE_RMS)
+    voiced = energy > threshold
+    if not voiced.any():
+        return []
+
+    # Rising/falling edges of the voiced mask give frame-level segments
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.view(np.int8), [0]))))
+    segments = list(zip(edges[0::2], edges[1::2]))
+
+    # Bridge short pauses, then drop what's left that is too short to be speech
+    max_gap = MIN_SILENCE_MS // frame_ms
+    merged = [list(segments[0])]
+    for start, end in segments[1:]:
+        if start - merged[-1][1] < max_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    min_frames = max(1, MIN_SPEECH_MS // frame_ms)
+    pad = int(rate * PAD_MS / 1000)
+    spans = []
+    for start, end in merged:
+        if end - start < min_frames:
+            continue
+        lo = max(0, int(start) * frame_len - pad)
+        hi = min(len(samples), int(end) * frame_len + pad)
+        if spans and lo <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], hi)
+        else:
+            spans.append((lo, hi))
+    return spans
+
+
+def split_for_recognition(samples, rate, max_chunk_seconds=MAX_CHUNK_SECONDS):
+    """
+    Group speech segments into chunks of at most max_chunk_seconds
+
+    Chunks break at pauses between segments. A single segment longer than
+    the limit is cut at its quietest frame in the second half of the window.
+    When no speech is detected, the whole clip is chunked instead.
+
+    Returns:
+        list: (start, end) sample offsets of each chunk, in order; empty only for an empty clip
+    """
+    max_len = int(max_chunk_seconds * rate)
+    # Falls back to the whole clip rather than dropping it: the recognizer decides
+    segments = detect_speech(samples, rate) or ([(0, len(samples))] if len(samples) else [])
+    chunks = []
+    for start, end in segments:
+        if chunks and end - chunks[-1][0] <= max_len:
+            chunks[-1] = (chunks[-1][0], end)
+            continue
+        while end - start > max_len:
+            cut = _quietest_cut(samples, rate, start + max_len // 2, start + max_len)
+            chunks.append((start, cut))
+            start = cut
+        chunks.append((start, end))
+    return chunks
+
+
+def _quietest_cut(samples, rate, lo, hi):
+    energy, frame_len = frame_energy(samples[lo:hi], rate)
+    if len(energy) == 0:
+        return hi
+    return lo + int(np.argmin(energy)) * frame_len
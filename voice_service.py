@@ -1,69 +1,208 @@
 import speech_recognition as sr
 from gtts import gTTS
-from pydub import AudioSegment
+import hashlib
 import io
 import os
-import tempfile
-import traceback
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+try:
+    from .audio_cache import AudioCache
+    from .audio_decode import decode_audio
+    from .vad import split_for_recognition
+    from .language_registry import stt_locale
+    from .upstream import UpstreamError, get_upstream
+    from .metrics import span, timed
+except Exception:
+    from audio_cache import AudioCache
+    from audio_decode import decode_audio
+    from vad import split_for_recognition
+    from language_registry import stt_locale
+    from upstream import UpstreamError, get_upstream
+    from metrics import span, timed
 
 class VoiceService:
-    def __init__(self):
+    # Concurrent gTTS calls shared by all requests
+    TTS_WORKERS = 8
+    # Clips tracked in memory while synthesizing, or if the disk cache can't hold them
+    MAX_PENDING_AUDIO = 256
+    # Concurrent recognizer calls for the chunks of long recordings
+    STT_WORKERS = 4
+
+    def __init__(self, audio_cache=None, stt_upstream=None, tts_upstream=None, stt_endpoint=None):
+        """
+        Args:
+            stt_endpoint: Speech recognition URL; defaults to SPEECH_RECOGNITION_ENDPOINT,
+                e.g. to point a server at a local stub, else Google's
+        """
         self.recognizer = sr.Recognizer()
+        self.stt_endpoint = stt_endpoint or os.environ.get('SPEECH_RECOGNITION_ENDPOINT') or None
+        self.audio_cache = audio_cache if audio_cache is not None else AudioCache()
+        # Deadlines, retries, hedging and circuit breakers for the two providers
+        self.stt_upstream = stt_upstream if stt_upstream is not None else get_upstream('stt', deadline=30.0)
+        # gTTS raises ValueError for unsupported languages and AssertionError for empty text
+        self.tts_upstream = tts_upstream if tts_upstream is not None else get_upstream(
+            'tts', deadline=15.0, permanent=(ValueError, AssertionError))
+        self.tts_executor = ThreadPoolExecutor(max_workers=self.TTS_WORKERS, thread_name_prefix='tts')
+        self.stt_executor = ThreadPoolExecutor(max_workers=self.STT_WORKERS, thread_name_prefix='stt')
+        self._pending_audio = OrderedDict()
+        self._pending_lock = threading.Lock()
         print("[INFO] VoiceService initialized with SpeechRecognition library.")
     
+    @timed('speech_to_text')
     def speech_to_text(self, audio_file, language='en'):
-        temp_audio_path = None
-        temp_wav_path = None
+        """
+        Transcribe an uploaded recording
+
+        Silence is trimmed before recognition, and long recordings are split
+        at pauses and recognized chunk by chunk in parallel.
+
+        Args:
+            audio_file: Recording as bytes, or a file object (an upload or the
+                request body) that is streamed into the decoder
+            language: Spoken language code
+
+        Returns:
+            dict: 'text', 'language' and 'vad' (audio seconds in, recognized
+            and saved, plus per-chunk latency)
+        """
+        # One decode, straight from the upload: no temp files, no copy of the encoded recording
+        with span('stt_decode'):
+            pcm, sample_rate = decode_audio(audio_file)
+            samples = np.frombuffer(pcm, dtype='<i2')
+            chunks = split_for_recognition(samples, sample_rate)
+
+        api_lang_code = stt_locale(language)
+
+        total_seconds = len(samples) / float(sample_rate)
+        speech_seconds = sum(end - start for start, end in chunks) / float(sample_rate)
+        vad = {'input_seconds': round(total_seconds, 3), 'speech_seconds': round(speech_seconds, 3),
+               'seconds_saved': round(total_seconds - speech_seconds, 3), 'chunks': len(chunks)}
+        if not chunks:
+            vad['chunk_latency_ms'] = []
+            return {'text': '', 'language': language, 'error': 'No speech detected in audio', 'vad': vad}
+
+        try:
+            with span('stt_recognize'):
+                if len(chunks) == 1:
+                    results = [self._recognize_chunk(samples, chunks[0], sample_rate, api_lang_code)]
+                else:
+                    results = list(self.stt_executor.map(
+                        lambda chunk: self._recognize_chunk(samples, chunk, sample_rate, api_lang_code), chunks))
+        except (sr.RequestError, UpstreamError) as e:
+            raise Exception(f"Speech recognition service unavailable: {e}")
+        except Exception as e:
+            raise Exception(f"Speech recognition failed: {e}")
+
+        vad['chunk_latency_ms'] = [round(latency * 1000, 1) for _, latency in results]
+        text = ' '.join(t for t, _ in results if t)
+        if not text:
+            return {'text': '', 'language': language, 'error': 'No speech detected in audio', 'vad': vad}
+        return {'text': text, 'language': language, 'vad': vad}
+
+    def _recognize_chunk(self, samples, chunk, sample_rate, api_lang_code):
+        # Returns (text, seconds taken); a chunk with no words yields ''
+        # The chunk's PCM is copied out only while it is being sent, not for all chunks up front
+        started = time.perf_counter()
+        start, end = chunk
+        audio_data = sr.AudioData(samples[start:end].tobytes(), sample_rate, 2)
+        text = self.stt_upstream.call(self._recognize, audio_data, api_lang_code)
+        return text, time.perf_counter() - started
+
+    def _recognize(self, audio_data, api_lang_code):
         try:
-            # Save the uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".tmp") as tmp_file:
-                audio_file.save(tmp_file.name)
-                temp_audio_path = tmp_file.name
-
-            # Try to load audio - try WAV first (most common), then webm
-            audio_segment = None
-            try:
-                audio_segment = AudioSegment.from_file(temp_audio_path, format="wav")
-            except Exception:
-                try:
-                    audio_segment = AudioSegment.from_file(temp_audio_path, format="webm")
-                except Exception:
-                    # Try auto-detection
-                    try:
-                        audio_segment = AudioSegment.from_file(temp_audio_path)
-                    except Exception:
-                        raise Exception("Unable to decode audio file - invalid format or corrupted data")
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as wav_file:
-                audio_segment.export(wav_file.name, format="wav")
-                temp_wav_path = wav_file.name
-
-            with sr.AudioFile(temp_wav_path) as source:
-                audio_data = self.recognizer.record(source)
-            
-            lang_code_map = {'en': 'en-US', 'es': 'es-ES', 'hi': 'hi-IN', 'kn': 'kn-IN'}
-            api_lang_code = lang_code_map.get(language, language)
-
-            try:
-                text = self.recognizer.recognize_google(audio_data, language=api_lang_code)
-                return {'text': text, 'language': language}
-            except sr.UnknownValueError:
-                return {'text': '', 'language': language, 'error': 'No speech detected in audio'}
-            except sr.RequestError as e:
-                raise Exception(f"Speech recognition service unavailable: {e}")
-            except Exception as e:
-                raise Exception(f"Speech recognition failed: {e}")
-        
-        finally:
-            if temp_audio_path and os.path.exists(temp_audio_path): os.remove(temp_audio_path)
-            if temp_wav_path and os.path.exists(temp_wav_path): os.remove(temp_wav_path)
-
-    def text_to_speech(self, text, language='en'):
+            if self.stt_endpoint:
+                return self.recognizer.recognize_google(audio_data, language=api_lang_code, endpoint=self.stt_endpoint)
+            return self.recognizer.recognize_google(audio_data, language=api_lang_code)
+        except sr.UnknownValueError:
+            # The provider answered: there were no words
+            return ''
+
+    @timed('text_to_speech')
+    def text_to_speech(self, text, language='en', slow=False):
+        key = self.audio_key(text, language, slow)
+        cached = self.audio_cache.get(key)
+        if cached is not None:
+            return cached
         try:
-            tts = gTTS(text=text, lang=language, slow=False)
-            audio_buffer = io.BytesIO()
-            tts.write_to_fp(audio_buffer)
-            audio_buffer.seek(0)
-            return audio_buffer.read()
+            with span('tts_synthesize'):
+                audio = self.tts_upstream.call(self._synthesize, text, language, slow)
         except Exception as e:
             raise Exception(f"Text-to-speech error: {e}")
+        self.audio_cache.put(key, audio)
+        return audio
+
+    def _synthesize(self, text, language, slow):
+        tts = gTTS(text=text, lang=language, slow=slow)
+        audio_buffer = io.BytesIO()
+        tts.write_to_fp(audio_buffer)
+        audio_buffer.seek(0)
+        return audio_buffer.read()
+
+    @staticmethod
+    def audio_key(text, language='en', slow=False):
+        """Content address for synthesized audio: hash of (text, language, slow)."""
+        return hashlib.sha256(f"{language}\x1f{int(bool(slow))}\x1f{text}".encode('utf-8')).hexdigest()
+
+    def text_to_speech_async(self, text, language='en'):
+        """
+        Start synthesizing on the shared TTS pool
+
+        Identical requests share one synthesis, and the result stays
+        retrievable through get_audio() from the audio cache.
+
+        Returns:
+            tuple: (audio key, Future resolving to MP3 bytes)
+        """
+        key = self.audio_key(text, language)
+        with self._pending_lock:
+            future = self._pending_audio.get(key)
+            created = future is None or (future.done() and future.exception() is not None)
+            if created:
+                future = self.tts_executor.submit(self.text_to_speech, text, language=language)
+                self._pending_audio[key] = future
+            self._pending_audio.move_to_end(key)
+            while len(self._pending_audio) > self.MAX_PENDING_AUDIO:
+                self._pending_audio.popitem(last=False)
+        if created:
+            # Outside the lock: the callback runs inline if the future already finished
+            future.add_done_callback(lambda f, key=key: self._settle_pending(key, f))
+        return key, future
+
+    def _settle_pending(self, key, future):
+        # Once a clip is on disk, the cache serves it and memory can let go
+        if future.exception() is None and self.audio_cache.contains(key):
+            with self._pending_lock:
+                if self._pending_audio.get(key) is future:
+                    del self._pending_audio[key]
+
+    def get_audio(self, key, timeout=None):
+        """
+        Fetch audio by key, from the cache or a synthesis still in progress
+
+        Returns:
+            bytes: MP3 audio, or None if the key is unknown
+
+        Raises:
+            concurrent.futures.TimeoutError: If synthesis is still running after `timeout` seconds
+        """
+        with self._pending_lock:
+            future = self._pending_audio.get(key)
+        if future is not None:
+            return future.result(timeout=timeout)
+        return self.audio_cache.get(key)
+
+    def get_audio_path(self, key, timeout=None):
+        """
+        Like get_audio, but returns the cached file's path so it can be streamed
+
+        Returns:
+            str: Path to the MP3 file, or None if it isn't on disk
+        """
+        with self._pending_lock:
+            future = self._pending_audio.get(key)
+        if future is not None:
+            future.result(timeout=timeout)
+        return self.audio_cache.get_path(key)
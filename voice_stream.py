@@ -0,0 +1,102 @@
+"""
+Pipelined voice translation (speech recognition -> translation -> TTS).
+
+Instead of returning one response after all three stages finish, the
+pipeline reports events as they become ready: the transcript, then each
+sentence's translation, then each sentence's audio. Sentence audio is
+synthesized on the voice service's TTS pool, so translating sentence N
+overlaps with synthesizing sentence N-1.
+"""
+
+import base64
+import json
+import re
+from collections import deque
+
+# Sentence ends, including CJK and Devanagari full stops
+_SENTENCE_RE = re.compile(r'(?<=[.!?。！？।])\s*')
+# Recognized speech often comes back unpunctuated; long runs are split by word count
+MAX_SEGMENT_WORDS = 20
+
+
+def split_sentences(text, max_words=MAX_SEGMENT_WORDS):
+    """
+    Split text into sentences, breaking long unpunctuated runs every max_words words
+
+    Returns:
+        list: Non-empty sentence strings, in order
+    """
+    segments = []
+    for sentence in _SENTENCE_RE.split(text or ''):
+        words = sentence.split()
+        for i in range(0, len(words), max_words):
+            segments.append(' '.join(words[i:i + max_words]))
+    return segments
+
+
+def format_sse(event, payload):
+    """Encode one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def stream_voice_translation(voice_service, translation_service, audio, source_lang='auto',
+                             target_lang='en', inline_audio=True):
+    """
+    Run the voice translation pipeline, yielding results as they are ready
+
+    Events, in order:
+        'transcript': {'text', 'speech_stats'[, 'error']}
+        'translation': {'index', 'source_text', 'translated_text'}, per sentence
+        'audio': {'index', 'audio_url', 'audio_base64'} per sentence, or 'error' if synthesis failed
+        'done': {'source_text', 'translated_text', 'sentences'}
+    'translation' and 'audio' events interleave; audio always arrives in sentence order.
+
+    Args:
+        voice_service: VoiceService used for recognition and synthesis
+        translation_service: TranslationService used per sentence
+        audio: Uploaded recording (bytes or a file-like object)
+        source_lang: Spoken language, or 'auto'
+        target_lang: Language to translate and speak in
+        inline_audio: Include base64 MP3 in 'audio' events, not just 'audio_url'
+
+    Yields:
+        tuple: (event name, payload dict)
+    """
+    speech_res = voice_service.speech_to_text(audio, language=source_lang)
+    source_text = speech_res.get('text') or ''
+    transcript = {'text': source_text, 'speech_stats': speech_res.get('vad')}
+    if speech_res.get('error'):
+        transcript['error'] = speech_res['error']
+    yield 'transcript', transcript
+
+    sentences = split_sentences(source_text)
+    translated = []
+    pending = deque()  # (index, audio key, future) in sentence order
+    for index, sentence in enumerate(sentences):
+        # Audio for earlier sentences keeps synthesizing on the TTS pool meanwhile
+        res = translation_service.translate(text=sentence, src_lang=source_lang, dest_lang=target_lang)
+        translated_text = res.get('translated_text', '')
+        translated.append(translated_text)
+        if translated_text.strip():
+            # Start synthesis before handing the translation to the client
+            key, future = voice_service.text_to_speech_async(translated_text, language=target_lang)
+            pending.append((index, key, future))
+        yield 'translation', {'index': index, 'source_text': sentence, 'translated_text': translated_text}
+
+        while pending and pending[0][2].done():
+            yield 'audio', _audio_event(*pending.popleft(), inline_audio=inline_audio)
+
+    while pending:
+        yield 'audio', _audio_event(*pending.popleft(), inline_audio=inline_audio)
+
+    yield 'done', {'source_text': source_text, 'translated_text': ' '.join(t for t in translated if t),
+                   'sentences': len(sentences)}
+
+
+def _audio_event(index, key, future, inline_audio=True):
+    try:
+        audio = future.result()
+    except Exception as e:
+        return {'index': index, 'audio_url': None, 'audio_base64': None, 'error': str(e)}
+    return {'index': index, 'audio_url': '/api/tts/' + key,
+            'audio_base64': base64.b64encode(audio).decode('utf-8') if inline_audio else None}
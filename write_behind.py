@@ -0,0 +1,174 @@
+"""
+Write-behind batching for high-volume inserts.
+
+Rows are acknowledged as soon as they are queued. A background thread writes
+them with executemany in one transaction per batch, flushing when
+`max_batch` rows are waiting or `flush_interval` seconds have passed. Rows
+are tagged with a key (for conversation messages, the session id) so readers
+can flush before reading a key that still has queued rows, which keeps
+reads consistent with the caller's own writes.
+
+If the database fails, a batch goes back on the queue and is retried. sync()
+keeps retrying for up to `sync_timeout` seconds and then raises, so a reader
+never silently misses its own writes. enqueue() refuses rows once
+`max_pending` are queued and can't be flushed, so an outage can't grow the
+queue without bound.
+
+Queued rows are written at interpreter exit through atexit, and by close().
+A process killed without running exit handlers (e.g. SIGKILL) loses up to
+one flush interval of rows.
+"""
+
+import atexit
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+
+class WriteBehindWriter:
+    # Pause between sync() retries while the database is failing, in seconds
+    SYNC_RETRY_DELAY = 0.05
+
+    def __init__(self, storage, statement, flush_interval=0.05, max_batch=500, max_pending=20000,
+                 sync_timeout=5.0):
+        """
+        Args:
+            storage: Storage the rows are written to
+            statement: Parameterized INSERT run once per row
+            flush_interval: Longest a row waits before being written, in seconds
+            max_batch: Queue size that triggers a flush without waiting for the interval
+            max_pending: Queue size at which enqueue() flushes in the caller's
+                thread, and refuses the row if that flush fails
+            sync_timeout: Longest sync() retries a failing database before raising
+        """
+        self.storage = storage
+        self.statement = statement
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.sync_timeout = sync_timeout
+        self._rows = []  # (key, params) in arrival order
+        self._unwritten = Counter()  # key -> rows queued or being written
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._counters = {'enqueued': 0, 'written': 0, 'flushes': 0, 'errors': 0, 'refused': 0}
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, key, params):
+        """
+        Queue one row for writing; returns without touching the database
+
+        With `max_pending` rows already queued, the caller flushes them first.
+
+        Raises:
+            Exception: If the writer is closed, or the queue is full and the
+                database can't take its rows
+        """
+        with self._lock:
+            if self._closed:
+                raise Exception("Write-behind writer is closed")
+            full = len(self._rows) >= self.max_pending
+        if full:
+            # The writer thread is falling behind: push back on the producer
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                with self._lock:
+                    self._counters['refused'] += 1
+                raise Exception(f"Write-behind queue is full and can't be written: {e}")
+        with self._lock:
+            self._rows.append((key, params))
+            self._unwritten[key] += 1
+            self._counters['enqueued'] += 1
+            queued = len(self._rows)
+        if queued >= self.max_batch:
+            self._wakeup.set()
+
+    def has_pending(self, key):
+        with self._lock:
+            return self._unwritten[key] > 0
+
+    def sync(self, key):
+        """
+        Make every row queued for `key` so far visible to readers
+
+        Raises:
+            Exception: If the rows still aren't written after `sync_timeout` seconds
+        """
+        deadline = time.monotonic() + self.sync_timeout
+        while self.has_pending(key):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                if time.monotonic() >= deadline:
+                    raise Exception(f"Queued rows could not be written: {e}")
+                time.sleep(self.SYNC_RETRY_DELAY)
+
+    def flush(self):
+        """
+        Write everything queued so far and wait for it to commit
+
+        Raises:
+            sqlite3.Error: If the write failed; the rows are back on the queue
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._rows = self._rows, []
+            if not batch:
+                return
+            try:
+                with self.storage.transaction() as conn:
+                    conn.executemany(self.statement, [params for _, params in batch])
+            except sqlite3.Error as e:
+                print(f"Write-behind flush error, will retry {len(batch)} rows: {e}")
+                with self._lock:
+                    self._rows[:0] = batch
+                    self._counters['errors'] += 1
+                raise
+            with self._lock:
+                self._unwritten.subtract(key for key, _ in batch)
+                self._unwritten += Counter()  # drop keys that reached zero
+                self._counters['written'] += len(batch)
+                self._counters['flushes'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['queued'] = len(self._rows)
+        return stats
+
+    def close(self):
+        """Stop the background thread and write whatever is still queued."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=10)
+        try:
+            self.flush()
+        except sqlite3.Error:
+            pass  # reported by flush(); counted as lost below
+        with self._lock:
+            lost = len(self._rows)
+        if lost:
+            print(f"Write-behind writer closed with {lost} unwritten rows")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # reported by flush(); the rows are retried next round
+            except Exception as e:
+                print(f"Write-behind flush error: {e}")
+            with self._lock:
+                if self._closed:
+                    return